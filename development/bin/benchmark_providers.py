@@ -0,0 +1,153 @@
+"""Micro-benchmarks for the secrets providers.
+
+Each benchmark resolves the same secret repeatedly against a local stand-in for the real backend and reports the
+per-lookup latency with and without the provider's client reuse, so that the effect of a change can be measured
+without access to a real secrets backend. Where no stand-in exists (1Password), the SDK client is replaced by a stub
+with a fixed latency per call.
+
+It is intended to be run inside the development environment, where `NAUTOBOT_CONFIG` points at a valid configuration:
+
+Example:
+    $ python development/bin/benchmark_providers.py aws --iterations 200
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import nautobot
+
+
+def measure(func, iterations, before_each=None):
+    """Call `func` `iterations` times and return the individual latencies in milliseconds."""
+    timings = []
+    for _ in range(iterations):
+        if before_each is not None:
+            before_each()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    """Print a one-line summary of the given latencies."""
+    print(
+        f"{label:<48} mean {statistics.mean(timings):8.3f} ms  "
+        f"median {statistics.median(timings):8.3f} ms  "
+        f"max {max(timings):8.3f} ms  (n={len(timings)})"
+    )
+
+
+def benchmark_aws(iterations):
+    """Compare pooled and per-lookup boto3 clients for both AWS providers using moto."""
+    import boto3  # pylint: disable=import-outside-toplevel
+    from moto import mock_secretsmanager, mock_ssm  # pylint: disable=import-outside-toplevel
+
+    from nautobot_secrets_providers.providers import (  # pylint: disable=import-outside-toplevel
+        AWSSecretsManagerSecretsProvider,
+        AWSSystemsManagerParameterStore,
+        aws,  # pylint: disable=import-outside-toplevel
+    )
+    from nautobot_secrets_providers.tests.utils import stub_secret  # pylint: disable=import-outside-toplevel
+
+    def clear_pools():
+        aws._clients.clear()  # pylint: disable=protected-access
+        aws._sessions.clear()  # pylint: disable=protected-access
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    region = "us-east-1"
+    secret = stub_secret(name="benchmark", region=region, key="password")
+
+    with mock_secretsmanager(), mock_ssm():
+        boto3.client("secretsmanager", region_name=region).create_secret(
+            Name="benchmark", SecretString='{"password": "hunter2"}'
+        )
+        boto3.client("ssm", region_name=region).put_parameter(
+            Name="benchmark", Type="SecureString", Value='{"password": "hunter2"}'
+        )
+
+        for provider in (AWSSecretsManagerSecretsProvider, AWSSystemsManagerParameterStore):
+            lookup = lambda provider=provider: provider.get_value_for_secret(secret)  # noqa: E731
+            report(f"{provider.slug} (new client per lookup)", measure(lookup, iterations, before_each=clear_pools))
+            clear_pools()
+            report(f"{provider.slug} (pooled client)", measure(lookup, iterations))
+
+
+def benchmark_onepassword(iterations):
+    """Compare per-lookup authentication with the shared 1Password client, using a stub SDK client."""
+    import asyncio  # pylint: disable=import-outside-toplevel
+    from unittest.mock import patch  # pylint: disable=import-outside-toplevel
+
+    from asgiref.sync import async_to_sync  # pylint: disable=import-outside-toplevel
+
+    from nautobot_secrets_providers.providers import one_password  # pylint: disable=import-outside-toplevel
+
+    authenticate_latency, resolve_latency = 0.2, 0.02
+
+    class StubSecrets:  # pylint: disable=too-few-public-methods
+        """Stand-in for `onepassword.secrets.Secrets`."""
+
+        async def resolve(self, reference):
+            """Pretend to resolve `reference`."""
+            await asyncio.sleep(resolve_latency)
+            return reference
+
+    class StubClient:  # pylint: disable=too-few-public-methods
+        """Stand-in for `onepassword.client.Client`."""
+
+        secrets = StubSecrets()
+
+        @classmethod
+        async def authenticate(cls, **kwargs):
+            """Pretend to initialize the SDK core and authenticate the service account."""
+            await asyncio.sleep(authenticate_latency)
+            return cls()
+
+    reference = one_password.get_reference("v", "i", "f")
+
+    @async_to_sync
+    async def authenticate_per_lookup(token):
+        client = await StubClient.authenticate(auth=token)
+        return await client.secrets.resolve(reference)
+
+    def shared_client(token):
+        return one_password.OnePasswordSecretsProvider.event_loop.run(one_password.resolve_secrets([reference], token))
+
+    print(
+        f"(stub client: {authenticate_latency * 1000:.0f} ms per authentication, {resolve_latency * 1000:.0f} ms per resolve)"
+    )
+    with patch.object(one_password.onepassword_client, "Client", StubClient):
+        for count in (1, iterations):
+            one_password._clients.clear()  # pylint: disable=protected-access
+            before = measure(lambda: [authenticate_per_lookup("t") for _ in range(count)], 1)
+            after = measure(lambda: [shared_client("t") for _ in range(count)], 1)
+            report(f"one-password {count} resolve(s), authenticate each", before)
+            report(f"one-password {count} resolve(s), shared client", after)
+
+
+BENCHMARKS = {
+    "aws": benchmark_aws,
+    "onepassword": benchmark_onepassword,
+}
+
+
+def main():
+    """Run the requested benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK", help=f"One of {', '.join(BENCHMARKS)}.")
+    parser.add_argument("--iterations", type=int, default=100, help="Number of lookups per measurement.")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+
+    nautobot.setup()
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](args.iterations)
+
+
+if __name__ == "__main__":
+    main()
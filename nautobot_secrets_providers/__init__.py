@@ -25,5 +25,15 @@ class NautobotSecretsProvidersConfig(NautobotAppConfig):
     # URL reverse lookup names
     home_view_name = "plugins:nautobot_secrets_providers:home"
 
+    def ready(self):
+        """Parse and validate the configuration of the published providers once, failing early if it is invalid."""
+        super().ready()
+
+        # pylint: disable-next=import-outside-toplevel
+        from nautobot_secrets_providers.providers.config import load_provider_configs
+        from nautobot_secrets_providers.secrets import secrets_providers  # pylint: disable=import-outside-toplevel
+
+        load_provider_configs(secrets_providers)
+
 
 config = NautobotSecretsProvidersConfig  # pylint:disable=invalid-name
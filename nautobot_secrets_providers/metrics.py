@@ -0,0 +1,23 @@
+"""Prometheus metrics exported by the app through Nautobot's `/metrics` endpoint."""
+
+from prometheus_client.core import CounterMetricFamily
+
+from nautobot_secrets_providers.providers.cache import get_stale_counts
+
+
+def metric_stale_values():
+    """Yield the number of stale cached secret values served by this process, per provider and reason.
+
+    See `nautobot_secrets_providers.providers.cache.get_stale_counts`.
+    """
+    counter = CounterMetricFamily(
+        "nautobot_secrets_providers_stale_values",
+        "Number of stale cached secret values served",
+        labels=["provider", "reason"],
+    )
+    for (slug, reason), count in sorted(get_stale_counts().items()):
+        counter.add_metric([slug, reason], count)
+    yield counter
+
+
+metrics = [metric_stale_values]
@@ -1,10 +1,20 @@
-"""Nautobot Secrets Providers."""
+"""Nautobot Secrets Providers.
 
-from .aws import AWSSecretsManagerSecretsProvider, AWSSystemsManagerParameterStore
-from .azure import AzureKeyVaultSecretsProvider
-from .delinea import DelineaSecretServerSecretsProviderId, DelineaSecretServerSecretsProviderPath
-from .hashicorp import HashiCorpVaultSecretsProvider
-from .one_password import OnePasswordSecretsProvider
+Provider classes are imported from their module on first access, so that only the providers actually used are loaded.
+"""
+
+import importlib
+
+# Module and class name of each provider, keyed on its slug.
+PROVIDERS = {
+    "aws-secrets-manager": ("aws", "AWSSecretsManagerSecretsProvider"),
+    "aws-sm-parameter-store": ("aws", "AWSSystemsManagerParameterStore"),
+    "azure-key-vault": ("azure", "AzureKeyVaultSecretsProvider"),
+    "delinea-tss-id": ("delinea", "DelineaSecretServerSecretsProviderId"),
+    "delinea-tss-path": ("delinea", "DelineaSecretServerSecretsProviderPath"),
+    "hashicorp-vault": ("hashicorp", "HashiCorpVaultSecretsProvider"),
+    "one-password": ("one_password", "OnePasswordSecretsProvider"),
+}
 
 __all__ = (
     "AWSSecretsManagerSecretsProvider",
@@ -15,3 +25,21 @@ __all__ = (
     "HashiCorpVaultSecretsProvider",
     "OnePasswordSecretsProvider",
 )
+
+# Module of each provider class, keyed on the class name.
+_provider_modules = {class_name: module_name for module_name, class_name in PROVIDERS.values()}
+
+
+def __getattr__(name):
+    """Import the module of the provider class `name` on first access."""
+    try:
+        module_name = _provider_modules[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    provider = globals()[name] = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    return provider
+
+
+def __dir__():
+    """List the provider classes along with the module attributes."""
+    return sorted({*globals(), *__all__})
@@ -2,26 +2,144 @@
 
 import base64
 import json
-
-try:
-    import boto3
-    from botocore.exceptions import ClientError
-except (ImportError, ModuleNotFoundError):
-    boto3 = None
+import os
+import threading
+import time
 
 from django import forms
 from nautobot.core.forms import BootstrapMixin
 from nautobot.extras.secrets import SecretsProvider, exceptions
 
+from .batch import BatchSecretsProviderMixin, as_secret_error, chunked
+from .cache import (
+    cache_secret_value,
+    cache_secret_values,
+    get_cache_settings,
+    get_cache_ttl,
+    get_document,
+    set_document,
+)
+from .circuitbreaker import circuit_breaker
+from .ratelimit import get_backoff, get_rate_limit_settings, get_token_bucket
+from .utils import ClientCache, LazyModule
+
 __all__ = ("AWSSecretsManagerSecretsProvider", "AWSSystemsManagerParameterStore")
 
+# The AWS SDK is only imported by the first lookup, as it takes a while to load.
+boto3 = LazyModule("boto3")
+botocore_exceptions = LazyModule("botocore.exceptions")
+
+# Process-wide pools shared by both AWS providers. Building a session loads the botocore service models and resolves
+# credentials, so we only want to pay that cost once per process rather than once per lookup. Sessions are stored
+# along with a lock, as a boto3 session isn't thread-safe and may only create one client at a time.
+_sessions = ClientCache()
+_clients = ClientCache()
+
+# Error codes of throttled requests, which are retried rather than failing the lookup.
+THROTTLING_ERROR_CODES = frozenset(
+    ("RequestLimitExceeded", "Throttling", "ThrottlingException", "TooManyRequestsException")
+)
+
+# Error codes of BatchGetSecretValue calls that the credentials aren't allowed to make, as roles granted
+# `secretsmanager:GetSecretValue` may lack `secretsmanager:BatchGetSecretValue`, or that the endpoint doesn't support.
+# The secrets are then retrieved one by one instead.
+BATCH_UNAVAILABLE_ERROR_CODES = frozenset(("AccessDeniedException", "UnknownOperationException"))
+
+
+def get_profile_name():
+    """Return the AWS profile in effect, from the `AWS_PROFILE` environment variable."""
+    return os.getenv("AWS_PROFILE") or None
+
+
+def get_client(service_name, region_name=None):
+    """Return a pooled boto3 client for the given service and region.
+
+    Clients are keyed on `(service_name, region_name, profile_name)` where the profile is taken from the `AWS_PROFILE`
+    environment variable, so that a change of profile never hands out a client holding the wrong credentials.
+
+    Args:
+        service_name (str): AWS service name, e.g. "secretsmanager" or "ssm".
+        region_name (str, optional): AWS region name.
+
+    Returns:
+        (botocore.client.BaseClient): A thread-safe boto3 client.
+    """
+    profile_name = get_profile_name()
+
+    def create_client():
+        session, lock = _sessions.get_or_create(
+            profile_name, lambda: (boto3.session.Session(profile_name=profile_name), threading.Lock())
+        )
+        with lock:
+            return session.client(service_name=service_name, region_name=region_name)
+
+    return _clients.get_or_create((service_name, region_name, profile_name), create_client)
+
+
+def call_api(client, operation, **kwargs):
+    """Call an `operation` of a pooled `client` through the rate limiter of its service, region and profile.
+
+    Requests to a service are spread over time by a token bucket per `(service_name, region_name, profile_name)` (see
+    the `ratelimit` module), the profile standing for the AWS account. Throttled requests slow the bucket down and are
+    retried with an exponential backoff.
+
+    Raises:
+        (ClientError): If the request fails, or is still throttled after the configured number of retries.
+    """
+    service_name = client.meta.service_model.service_name
+    bucket = get_token_bucket(service_name, (service_name, client.meta.region_name, get_profile_name()))
+    if bucket is None:
+        return getattr(client, operation)(**kwargs)
+
+    rate_limit_settings = get_rate_limit_settings()
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            response = getattr(client, operation)(**kwargs)
+        except botocore_exceptions.ClientError as err:
+            if err.response["Error"]["Code"] not in THROTTLING_ERROR_CODES:
+                raise
+            bucket.throttled()
+            if attempt >= rate_limit_settings["max_retries"]:
+                raise
+            time.sleep(get_backoff(attempt, rate_limit_settings["max_backoff"]))
+            attempt += 1
+            continue
+        bucket.succeeded()
+        return response
+
+
+def group_requests(requests, errors, unbatched=None):
+    """Group `(secret, obj)` requests by region, then by the name of the AWS secret or parameter they reference.
 
-class AWSSecretsManagerSecretsProvider(SecretsProvider):
+    Returns:
+        (dict): `{region: {name: [(index, secret, key), ...]}}` where `index` is the position of the request. Requests
+            whose parameters can't be rendered are added to `errors` instead. If an `unbatched` list is given, the
+            indexes of requests pinning a `version_id`, which the batch APIs don't support, are appended to it instead.
+    """
+    regions = {}
+    for index, (secret, obj) in enumerate(requests):
+        try:
+            parameters = secret.rendered_parameters(obj=obj)
+        except exceptions.SecretError as err:
+            errors[index] = err
+            continue
+        if unbatched is not None and parameters.get("version_id"):
+            unbatched.append(index)
+            continue
+        names = regions.setdefault(parameters.get("region"), {})
+        names.setdefault(parameters.get("name"), []).append((index, secret, parameters.get("key")))
+    return regions
+
+
+class AWSSecretsManagerSecretsProvider(BatchSecretsProviderMixin, SecretsProvider):
     """A secrets provider for AWS Secrets Manager."""
 
     slug = "aws-secrets-manager"
     name = "AWS Secrets Manager"
-    is_available = boto3 is not None
+    is_available = boto3.is_installed
+    version_parameter = "version_id"
 
     # TBD: Remove after pylint-nautobot bump
     # pylint: disable-next=nb-incorrect-base-class
@@ -40,8 +158,20 @@ class AWSSecretsManagerSecretsProvider(SecretsProvider):
             required=True,
             help_text="The key of the AWS Secrets Manager secret",
         )
+        version_id = forms.CharField(
+            required=False,
+            help_text="The version ID of the AWS Secrets Manager secret, to pin a version rather than use the current one",
+            label="Version ID",
+        )
 
     @classmethod
+    def get_circuit_key(cls, parameters):
+        """Return the key of the circuit breaker of the Secrets Manager region of a secret (see `circuit_breaker`)."""
+        return ("secretsmanager", parameters.get("region"))
+
+    @classmethod
+    @cache_secret_value
+    @circuit_breaker
     def get_value_for_secret(cls, secret, obj=None, **kwargs):
         """Return the secret value by name and region."""
         # Extract the parameters from the Secret.
@@ -50,52 +180,149 @@ class AWSSecretsManagerSecretsProvider(SecretsProvider):
         secret_name = parameters.get("name")
         secret_key = parameters.get("key")
         region_name = parameters.get("region")
+        version_id = parameters.get("version_id") or None
 
-        # Create a Secrets Manager client.
-        session = boto3.session.Session()
-        client = session.client(service_name="secretsmanager", region_name=region_name)
+        # Get a pooled Secrets Manager client.
+        client = get_client("secretsmanager", region_name)
 
         # This is based on sample code to only handle the specific exceptions for the 'GetSecretValue' API.
         # See https://docs.aws.amazon.com/secretsmanager/latest/apireference/API_GetSecretValue.html
         # We rethrow the exception by default.
         try:
-            get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-        except ClientError as err:
-            if err.response["Error"]["Code"] == "DecryptionFailureException":  # pylint: disable=no-else-raise
-                # Secrets Manager can't decrypt the protected secret text using the provided KMS key.
-                # Deal with the exception here, and/or rethrow at your discretion.
-                raise exceptions.SecretProviderError(secret, cls, str(err))
-            elif err.response["Error"]["Code"] == "InternalServiceErrorException":
-                # An error occurred on the server side.
-                # Deal with the exception here, and/or rethrow at your discretion.
-                raise exceptions.SecretProviderError(secret, cls, str(err))
-            elif err.response["Error"]["Code"] == "InvalidParameterException":
-                # You provided an invalid value for a parameter.
-                # Deal with the exception here, and/or rethrow at your discretion.
-                raise exceptions.SecretParametersError(secret, cls, str(err))
-            elif err.response["Error"]["Code"] == "InvalidRequestException":
-                # You provided a parameter value that is not valid for the current state of the resource.
-                # Deal with the exception here, and/or rethrow at your discretion.
-                raise exceptions.SecretProviderError(secret, cls, str(err))
-            elif err.response["Error"]["Code"] == "ResourceNotFoundException":
-                # We can't find the resource that you asked for.
-                # Deal with the exception here, and/or rethrow at your discretion.
-                raise exceptions.SecretValueNotFoundError(secret, cls, str(err))
+            _, data = cls.get_secret_document(
+                client,
+                region_name,
+                secret_name,
+                version_id=version_id,
+                is_stale=lambda document: secret_key not in document[1],
+            )
+        except botocore_exceptions.ClientError as err:
+            raise cls.get_error(secret, err.response["Error"]["Code"], str(err))
+
+        return cls.get_value_from_data(secret, data, secret_key)
+
+    @classmethod
+    def get_secret_document(  # pylint: disable=too-many-arguments
+        cls, client, region_name, secret_name, version_id=None, is_stale=None
+    ):
+        """Return the `VersionId` and the parsed JSON value of a version of an AWS secret, by default the current one.
+
+        Secrets usually hold several keys, each referenced by its own Nautobot secret, so the parsed value is cached as
+        a document (see `get_document`) keyed on `(profile_name, region_name, secret_name, version_id)`. The version is
+        None for the current version of the secret, whose `VersionId` isn't known until it is retrieved. Pinned
+        versions never change, so they are cached without expiry.
+
+        Raises:
+            (ClientError): If the secret can't be retrieved.
+        """
+
+        def fetch():
+            if version_id:
+                response = call_api(client, "get_secret_value", SecretId=secret_name, VersionId=version_id)
             else:
-                # We got an error that isn't defined above
-                raise exceptions.SecretProviderError(secret, cls, str(err))
+                response = call_api(client, "get_secret_value", SecretId=secret_name)
+            return response.get("VersionId"), cls.parse_secret_value(response)
+
+        key = (get_profile_name(), region_name, secret_name, version_id)
+        return get_document(cls.slug, key, fetch, is_stale=is_stale, pinned=bool(version_id))
+
+    @classmethod
+    @cache_secret_values
+    def get_values_for_secrets(cls, requests):
+        """Return the values of many secrets, using as few `BatchGetSecretValue` calls as possible.
+
+        Secrets are grouped by region and retrieved 20 per call, and each AWS secret is only retrieved once however
+        many of its keys are requested. Secrets pinned to a version, and those of regions where `BatchGetSecretValue`
+        is denied or unsupported, are retrieved one by one. See `BatchSecretsProviderMixin.get_values_for_secrets`.
+        """
+        requests = list(requests)
+        values, errors, unbatched = {}, {}, []
+        for region_name, names in group_requests(requests, errors, unbatched).items():
+            client = get_client("secretsmanager", region_name)
+            if not hasattr(client, "batch_get_secret_value"):
+                # botocore releases older than 1.33 predate BatchGetSecretValue.
+                unbatched.extend(index for lookups in names.values() for index, _, _ in lookups)
+                continue
+
+            chunks = list(chunked(names, 20))
+            for position, chunk in enumerate(chunks):
+                try:
+                    response = call_api(client, "batch_get_secret_value", SecretIdList=chunk)
+                except botocore_exceptions.ClientError as err:
+                    if err.response["Error"]["Code"] in BATCH_UNAVAILABLE_ERROR_CODES:
+                        unbatched.extend(
+                            index for rest in chunks[position:] for name in rest for index, _, _ in names[name]
+                        )
+                        break
+                    for name in chunk:
+                        for index, secret, _ in names[name]:
+                            errors[index] = cls.get_error(secret, err.response["Error"]["Code"], str(err))
+                    continue
+
+                found = {}
+                for secret_value in response["SecretValues"]:
+                    found[secret_value["Name"]] = found[secret_value["ARN"]] = secret_value
+                failed = {error["SecretId"]: error for error in response.get("Errors", [])}
+                for name in chunk:
+                    for index, secret, secret_key in names[name]:
+                        try:
+                            if name in found:
+                                data = cls.parse_secret_value(found[name])
+                                values[index] = cls.get_value_from_data(secret, data, secret_key)
+                            elif name in failed:
+                                raise cls.get_error(secret, failed[name]["ErrorCode"], failed[name]["ErrorMessage"])
+                            else:
+                                raise exceptions.SecretValueNotFoundError(
+                                    secret, cls, f"Secret {name} was not returned"
+                                )
+                        except Exception as err:  # pylint: disable=broad-exception-caught
+                            errors[index] = as_secret_error(err, secret, cls)
+
+        if unbatched:
+            unbatched.sort()
+            unbatched_values, unbatched_errors = super().get_values_for_secrets([requests[i] for i in unbatched])
+            values.update((unbatched[position], value) for position, value in unbatched_values.items())
+            errors.update((unbatched[position], err) for position, err in unbatched_errors.items())
+        return values, errors
+
+    @classmethod
+    def get_error(cls, secret, code, message):
+        """Return the `SecretError` to raise for an AWS Secrets Manager error `code`."""
+        if code == "DecryptionFailureException":
+            # Secrets Manager can't decrypt the protected secret text using the provided KMS key.
+            return exceptions.SecretProviderError(secret, cls, message)
+        if code == "InternalServiceErrorException":
+            # An error occurred on the server side.
+            return exceptions.SecretProviderError(secret, cls, message)
+        if code == "InvalidParameterException":
+            # You provided an invalid value for a parameter.
+            return exceptions.SecretParametersError(secret, cls, message)
+        if code == "InvalidRequestException":
+            # You provided a parameter value that is not valid for the current state of the resource.
+            return exceptions.SecretProviderError(secret, cls, message)
+        if code == "ResourceNotFoundException":
+            # We can't find the resource that you asked for.
+            return exceptions.SecretValueNotFoundError(secret, cls, message)
+        # We got an error that isn't defined above
+        return exceptions.SecretProviderError(secret, cls, message)
+
+    @staticmethod
+    def parse_secret_value(response):
+        """Return the parsed JSON value of a secret value returned by the Secrets Manager API."""
+        # Decrypts secret using the associated KMS CMK.
+        # Depending on whether the secret is a string or binary, one of these fields will be populated.
+        if "SecretString" in response:
+            secret_value = response["SecretString"]
         else:
-            # Decrypts secret using the associated KMS CMK.
-            # Depending on whether the secret is a string or binary, one of these fields will be populated.
-            if "SecretString" in get_secret_value_response:
-                secret_value = get_secret_value_response["SecretString"]
-            else:
-                # TODO(jathan): Do we care about this? Let's figure out what to do about a binary value?
-                secret_value = base64.b64decode(get_secret_value_response["SecretBinary"])  # noqa
+            # TODO(jathan): Do we care about this? Let's figure out what to do about a binary value?
+            secret_value = base64.b64decode(response["SecretBinary"])  # noqa
 
         # If we get this far it should be valid JSON.
-        data = json.loads(secret_value)
+        return json.loads(secret_value)
 
+    @classmethod
+    def get_value_from_data(cls, secret, data, secret_key):
+        """Return the value of `secret_key` in the parsed JSON value of a secret."""
         # Retrieve the value using the key or complain loudly.
         try:
             return data[secret_key]
@@ -104,7 +331,7 @@ class AWSSecretsManagerSecretsProvider(SecretsProvider):
             raise exceptions.SecretValueNotFoundError(secret, cls, msg) from err
 
 
-class AWSSystemsManagerParameterStore(SecretsProvider):
+class AWSSystemsManagerParameterStore(BatchSecretsProviderMixin, SecretsProvider):
     """
     A secrets provider for AWS Systems Manager Parameter Store.
 
@@ -113,7 +340,7 @@ class AWSSystemsManagerParameterStore(SecretsProvider):
 
     slug = "aws-sm-parameter-store"
     name = "AWS Systems Manager Parameter Store"
-    is_available = boto3 is not None
+    is_available = boto3.is_installed
 
     # TBD: Remove after pylint-nautobot bump
     # pylint: disable-next=nb-incorrect-base-class
@@ -134,35 +361,156 @@ class AWSSystemsManagerParameterStore(SecretsProvider):
         )
 
     @classmethod
+    def get_circuit_key(cls, parameters):
+        """Return the key of the circuit breaker of the Parameter Store region of a secret (see `circuit_breaker`)."""
+        return ("ssm", parameters.get("region"))
+
+    @classmethod
+    @cache_secret_value
+    @circuit_breaker
     def get_value_for_secret(cls, secret, obj=None, **kwargs):
         """Return the parameter value by name and region."""
         # Extract the parameters from the Nautobot secret.
         parameters = secret.rendered_parameters(obj=obj)
+        region_name = parameters.get("region")
+        key = parameters.get("key")
 
-        # Create a SSM client.
-        session = boto3.session.Session()
-        client = session.client(service_name="ssm", region_name=parameters.get("region"))
-        try:
-            get_secret_value_response = client.get_parameter(Name=parameters.get("name"), WithDecryption=True)
-        except ClientError as err:
-            if err.response["Error"]["Code"] == "ParameterNotFound":
-                raise exceptions.SecretParametersError(secret, cls, str(err))
-
-            if err.response["Error"]["Code"] == "ParameterVersionNotFound":
-                raise exceptions.SecretValueNotFoundError(secret, cls, str(err))
-
-            raise exceptions.SecretProviderError(secret, cls, str(err))
-
+        # Get a pooled SSM client.
+        client = get_client("ssm", region_name)
         try:
-            # Fetch the Value field from the parameter which must be a json field.
-            data = json.loads(get_secret_value_response["Parameter"]["Value"])
+            data = cls.get_parameter_document(
+                client,
+                region_name,
+                parameters.get("name"),
+                is_stale=lambda document: not isinstance(document, dict) or key not in document,
+            )
+        except botocore_exceptions.ClientError as err:
+            raise cls.get_error(secret, err.response["Error"]["Code"], str(err))
         except ValueError as err:
             msg = "InvalidJson"
             raise exceptions.SecretValueNotFoundError(secret, cls, msg) from err
 
+        return cls.get_value_from_data(secret, data, key)
+
+    @classmethod
+    def get_parameter_document(cls, client, region_name, name, is_stale=None):
+        """Return the parsed JSON value of a parameter.
+
+        Parameters usually hold several keys, each referenced by its own Nautobot secret, so the parsed value is cached
+        as a document (see `get_document`) keyed on `(profile_name, region_name, name)`. Batch lookups and
+        `prefetch_path` add the parameters they retrieve to the same cache.
+
+        Raises:
+            (ClientError): If the parameter can't be retrieved.
+            (ValueError): If the parameter isn't valid JSON.
+        """
+
+        def fetch():
+            response = call_api(client, "get_parameter", Name=name, WithDecryption=True)
+            return json.loads(response["Parameter"]["Value"])
+
+        return get_document(cls.slug, (get_profile_name(), region_name, name), fetch, is_stale=is_stale)
+
+    @classmethod
+    @cache_secret_values
+    def get_values_for_secrets(cls, requests):
+        """Return the values of many parameters, using as few `GetParameters` calls as possible.
+
+        Parameters are grouped by region and retrieved 10 per call, and each parameter is only retrieved once however
+        many of its keys are requested. See `BatchSecretsProviderMixin.get_values_for_secrets`.
+        """
+        requests = list(requests)
+        values, errors = {}, {}
+        for region_name, names in group_requests(requests, errors).items():
+            client = get_client("ssm", region_name)
+            for chunk in chunked(names, 10):
+                try:
+                    response = call_api(client, "get_parameters", Names=chunk, WithDecryption=True)
+                except botocore_exceptions.ClientError as err:
+                    for name in chunk:
+                        for index, secret, _ in names[name]:
+                            errors[index] = cls.get_error(secret, err.response["Error"]["Code"], str(err))
+                    continue
+
+                found = {}
+                for parameter in response["Parameters"]:
+                    found[parameter["Name"] + parameter.get("Selector", "")] = found[parameter["ARN"]] = parameter
+                for name in chunk:
+                    try:
+                        data = json.loads(found[name]["Value"]) if name in found else None
+                    except ValueError as err:
+                        data = err
+                    else:
+                        if name in found:
+                            set_document(cls.slug, (get_profile_name(), region_name, name), data)
+                    for index, secret, key in names[name]:
+                        try:
+                            if name not in found:
+                                # Parameters that don't exist are listed in the response's InvalidParameters.
+                                raise cls.get_error(secret, "ParameterNotFound", f"Parameter {name} not found.")
+                            if isinstance(data, ValueError):
+                                raise exceptions.SecretValueNotFoundError(secret, cls, "InvalidJson") from data
+                            values[index] = cls.get_value_from_data(secret, data, key)
+                        except Exception as err:  # pylint: disable=broad-exception-caught
+                            errors[index] = as_secret_error(err, secret, cls)
+        return values, errors
+
+    @classmethod
+    def prefetch_path(cls, path, region_name):
+        """Cache the parsed JSON value of every parameter under `path`, so that their lookups don't call AWS.
+
+        The hierarchy is retrieved with successive `GetParametersByPath` calls (recursive and with decryption), which
+        return up to 10 parameters each. Parameters that aren't valid JSON are skipped. This only has an effect when
+        caching is enabled for the provider, and the cached values expire with the cache TTL.
+
+        Args:
+            path (str): Hierarchy of parameters to retrieve, e.g. "/nautobot/devices".
+            region_name (str): AWS region name, which must match the `region` parameter of the secrets to prefetch.
+
+        Returns:
+            (int): The number of parameters cached.
+
+        Raises:
+            (ClientError): If the parameters can't be retrieved.
+        """
+        if not get_cache_ttl(get_cache_settings(cls.slug))[0]:
+            return 0
+
+        client = get_client("ssm", region_name)
+        profile_name = get_profile_name()
+        count = 0
+        kwargs = {"Path": path, "Recursive": True, "WithDecryption": True}
+        while True:
+            page = call_api(client, "get_parameters_by_path", **kwargs)
+            for parameter in page["Parameters"]:
+                try:
+                    data = json.loads(parameter["Value"])
+                except ValueError:
+                    continue
+                for name in (parameter["Name"], parameter["ARN"]):
+                    set_document(cls.slug, (profile_name, region_name, name), data)
+                count += 1
+            if not page.get("NextToken"):
+                return count
+            kwargs["NextToken"] = page["NextToken"]
+
+    @classmethod
+    def get_error(cls, secret, code, message):
+        """Return the `SecretError` to raise for an AWS Systems Manager error `code`."""
+        if code == "ParameterNotFound":
+            return exceptions.SecretParametersError(secret, cls, message)
+
+        if code == "ParameterVersionNotFound":
+            return exceptions.SecretValueNotFoundError(secret, cls, message)
+
+        return exceptions.SecretProviderError(secret, cls, message)
+
+    @classmethod
+    def get_value_from_data(cls, secret, data, key):
+        """Return the value of `key` in the parsed JSON value of a parameter."""
         try:
             # Return the value of the secret key configured in the nautobot secret.
-            return data[parameters.get("key")]
+            return data[key]
         except KeyError as err:
             msg = f"InvalidKeyName {err}"
             raise exceptions.SecretParametersError(secret, cls, msg) from err
@@ -1,26 +1,84 @@
 """Secrets Provider for Azure Key Vault."""
 
-try:
-    from azure.identity import DefaultAzureCredential
-    from azure.keyvault.secrets import SecretClient
-
-    azure_available = True  # pylint: disable=invalid-name
-except ImportError:
-    azure_available = False  # pylint: disable=invalid-name
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
 
 from django import forms
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from nautobot.core.forms import BootstrapMixin
 from nautobot.extras.secrets import SecretsProvider, exceptions
 
+from .batch import BatchSecretsProviderMixin
+from .cache import cache_secret_value
+from .circuitbreaker import circuit_breaker
+from .config import get_provider_config
+from .utils import ClientCache, LazyModule
+
 __all__ = ("AzureKeyVaultSecretsProvider",)
 
+# The Azure SDK is only imported by the first lookup, as it takes a while to load.
+azure_core_exceptions = LazyModule("azure.core.exceptions")
+azure_identity = LazyModule("azure.identity")
+azure_keyvault_secrets = LazyModule("azure.keyvault.secrets")
+
+# Names of the `azure.identity` credential classes, keyed on their `credential` setting.
+CREDENTIAL_CLASSES = {
+    "azure_cli": "AzureCliCredential",
+    "default": "DefaultAzureCredential",
+    "environment": "EnvironmentCredential",
+    "managed_identity": "ManagedIdentityCredential",
+    "workload_identity": "WorkloadIdentityCredential",
+}
+
+# One credential per process (keyed on its configured type) and one SecretClient per vault URL, so that the access
+# token obtained by the credential is reused until it expires.
+_credentials = ClientCache()
+_clients = ClientCache()
+
+
+@receiver(setting_changed)
+def _clear_clients(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the cached credential and clients when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        _credentials.clear()
+        _clients.clear()
+
+
+@dataclass(frozen=True, slots=True)
+class AzureKeyVaultConfig:
+    """The parsed `azure_key_vault` settings, along with the error making them invalid, if any."""
+
+    credential: str
+    credential_kwargs: Mapping
+    error: Optional[str]
+
+    @classmethod
+    def from_settings(cls, plugin_settings):
+        """Parse and validate the `azure_key_vault` app settings."""
+        azure_settings = plugin_settings.get("azure_key_vault", {})
+        credential = azure_settings.get("credential", "default")
+        error = None if credential in CREDENTIAL_CLASSES else f"Azure Key Vault credential {credential} is invalid!"
+        return cls(
+            credential=credential,
+            credential_kwargs=MappingProxyType(dict(azure_settings.get("credential_kwargs", {}))),
+            error=error,
+        )
+
+    @property
+    def errors(self):
+        """Return the error making the settings invalid, if any."""
+        return (self.error,) if self.error else ()
 
-class AzureKeyVaultSecretsProvider(SecretsProvider):
+
+class AzureKeyVaultSecretsProvider(BatchSecretsProviderMixin, SecretsProvider):
     """A secrets provider for Azure Key Vault."""
 
     slug = "azure-key-vault"
     name = "Azure Key Vault"
-    is_available = azure_available
+    is_available = azure_identity.is_installed and azure_keyvault_secrets.is_installed
+    version_parameter = "version"
 
     # pylint: disable-next=nb-incorrect-base-class
     class ParametersForm(BootstrapMixin, forms.Form):
@@ -34,23 +92,66 @@ class AzureKeyVaultSecretsProvider(SecretsProvider):
             required=True,
             help_text="The name of the secret in the Azure Key Vault",
         )
+        version = forms.CharField(
+            required=False,
+            help_text="The version of the secret in the Azure Key Vault, to pin a version rather than use the latest one",
+        )
+
+    @classmethod
+    def parse_config(cls, plugin_settings):
+        """Return the parsed `azure_key_vault` settings (see `nautobot_secrets_providers.providers.config`)."""
+        return AzureKeyVaultConfig.from_settings(plugin_settings)
+
+    @classmethod
+    def get_credential(cls, secret=None):
+        """Return the process-wide Azure credential.
+
+        By default this is a `DefaultAzureCredential`, which probes each authentication method in turn. Setting
+        `credential` in the `azure_key_vault` app settings pins a single credential type and skips that probing.
+        """
+        config = get_provider_config(cls)
+        if config.error:
+            raise exceptions.SecretProviderError(secret, cls, config.error)
+
+        credential_class = getattr(azure_identity, CREDENTIAL_CLASSES[config.credential])
+        return _credentials.get_or_create(config.credential, lambda: credential_class(**config.credential_kwargs))
+
+    @classmethod
+    def get_client(cls, secret=None, vault_url=None):
+        """Return the cached SecretClient for the given vault URL."""
+        credential = cls.get_credential(secret)
+        return _clients.get_or_create(
+            vault_url, lambda: azure_keyvault_secrets.SecretClient(vault_url=vault_url, credential=credential)
+        )
+
+    @classmethod
+    def get_circuit_key(cls, parameters):
+        """Return the key of the circuit breaker of the Key Vault of a secret (see `circuit_breaker`)."""
+        return ("azure-key-vault", parameters.get("vault_url"))
 
     @classmethod
+    @cache_secret_value
+    @circuit_breaker
     def get_value_for_secret(cls, secret, obj=None, **kwargs):
         """Return the secret value by name from Azure Key Vault."""
         # Extract the parameters from the Secret.
         parameters = secret.rendered_parameters(obj=obj)
         vault_url = parameters.get("vault_url")
         secret_name = parameters.get("secret_name")
+        version = parameters.get("version") or None
 
-        # Authenticate with Azure Key Vault using default credentials.
-        # This assumes that environment variables for Azure authentication are set.
-        credential = DefaultAzureCredential()
-        client = SecretClient(vault_url=vault_url, credential=credential)
+        # Authenticate with Azure Key Vault using the shared credential.
+        # By default this assumes that environment variables for Azure authentication are set.
+        client = cls.get_client(secret, vault_url)
 
         try:
             # Retrieve the secret from Azure Key Vault.
-            response = client.get_secret(secret_name)
+            if version:
+                response = client.get_secret(secret_name, version=version)
+            else:
+                response = client.get_secret(secret_name)
+        except azure_core_exceptions.ResourceNotFoundError as err:
+            raise exceptions.SecretValueNotFoundError(secret, cls, str(err)) from err
         except Exception as err:
             # Handle exceptions from the Azure SDK.
             raise exceptions.SecretProviderError(secret, cls, str(err))
@@ -0,0 +1,71 @@
+"""Resolution of many secrets at once for the Secrets Providers."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from nautobot.extras.secrets import exceptions
+
+__all__ = ("DEFAULT_BATCH_MAX_WORKERS", "BatchSecretsProviderMixin", "as_secret_error", "chunked")
+
+DEFAULT_BATCH_MAX_WORKERS = 8
+
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def as_secret_error(err, secret, provider):
+    """Return `err` as a `SecretError`, wrapping other exceptions the same way as `Secret.get_value()`."""
+    if isinstance(err, exceptions.SecretError):
+        return err
+    error = exceptions.SecretError(secret, provider, str(err))
+    error.__cause__ = err
+    return error
+
+
+class BatchSecretsProviderMixin:
+    """Add `get_values_for_secrets` to a `SecretsProvider`, to retrieve many secrets at once.
+
+    By default, the secrets are retrieved concurrently with `get_value_for_secret` by a bounded pool of threads, sized
+    by the `batch_max_workers` app setting. Providers whose backend has a native batch API override
+    `get_values_for_secrets` to use it instead.
+    """
+
+    @classmethod
+    def get_values_for_secrets(cls, requests):
+        """Retrieve the values of many secrets at once.
+
+        Args:
+            requests (Iterable[tuple]): `(secret, obj)` pairs, as would be passed to `get_value_for_secret`.
+
+        Returns:
+            (tuple[dict, dict]): The values retrieved and the errors of the requests that failed, each keyed on the
+                position of the request in `requests`. Errors are always instances of `SecretError`.
+        """
+        requests = list(requests)
+        values, errors = {}, {}
+        if not requests:
+            return values, errors
+
+        plugin_settings = settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {})
+        max_workers = min(plugin_settings.get("batch_max_workers", DEFAULT_BATCH_MAX_WORKERS), len(requests))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{cls.slug}-batch") as executor:
+            futures = [executor.submit(cls._get_value_in_thread, secret, obj) for secret, obj in requests]
+            for index, future in enumerate(futures):
+                try:
+                    values[index] = future.result()
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    errors[index] = as_secret_error(err, requests[index][0], cls)
+        return values, errors
+
+    @classmethod
+    def _get_value_in_thread(cls, secret, obj):
+        try:
+            return cls.get_value_for_secret(secret, obj=obj)
+        finally:
+            # Rendering the parameters may have queried the database from this worker thread.
+            connections.close_all()
@@ -0,0 +1,720 @@
+"""Opt-in caching of secret values for the Secrets Providers.
+
+Caching is disabled by default and is enabled through the `cache` app setting, for example:
+
+```python
+PLUGINS_CONFIG = {
+    "nautobot_secrets_providers": {
+        "cache": {
+            "enabled": True,
+            "ttl": 300,
+            "max_entries": 1024,
+            "shared": True,
+            "coalesce_across_processes": True,
+            "providers": {
+                "hashicorp-vault": {"ttl": 60},
+                "one-password": {"enabled": False},
+            },
+        },
+    },
+}
+```
+
+Values are cached per process, keyed on the provider slug and the fully rendered parameters of the secret. With
+`shared` enabled, a second tier in one of Django's configured caches (`shared_cache_alias`, usually Redis) is shared by
+all Nautobot processes. Values are encrypted before being stored there, with the `encryption_key` setting or, by
+default, a key derived from `SECRET_KEY`.
+
+Concurrent lookups of the same secret within a process are coalesced into a single request to the backend
+(`coalesce`, enabled by default). With `coalesce_across_processes`, a lock in the shared cache additionally lets a
+single process fetch a value missing from the shared tier while the others wait for it to be cached.
+
+Lookups failing with `SecretValueNotFoundError` or `SecretParametersError` are cached in-process too, for
+`not_found_ttl` and `parameters_error_ttl` seconds respectively, so that secrets missing from the backend aren't
+requested again by every lookup.
+
+Expired values can be kept in-process for a while longer: for `stale_while_revalidate` seconds, they are returned
+immediately while a background thread retrieves the current value, and for `stale_if_error` seconds, they are returned
+when retrieving the current value fails. `get_stale_counts` reports how many stale values were served.
+
+Values of secrets pinned to a specific version (see `is_pinned`) are immutable: unless `pinned_versions` is disabled,
+they are cached without expiry, bounded only by `max_entries`, even when caching is otherwise disabled.
+"""
+
+import base64
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils.crypto import salted_hmac
+from nautobot.extras.secrets import exceptions
+
+from .batch import DEFAULT_BATCH_MAX_WORKERS
+from .utils import SingleFlight, copy_exception
+
+__all__ = (
+    "DEFAULT_CACHE_SETTINGS",
+    "SharedCache",
+    "TTLCache",
+    "TieredCache",
+    "cache_secret_value",
+    "cache_secret_values",
+    "clear_cache",
+    "get_cache_key",
+    "get_cache_settings",
+    "get_cache_ttl",
+    "get_document",
+    "get_stale_counts",
+    "invalidate_values",
+    "is_pinned",
+    "is_value_cached",
+    "set_document",
+)
+
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": False,
+    "ttl": 300,
+    "max_entries": 1024,
+    "shared": False,
+    "shared_cache_alias": "default",
+    "encryption_key": None,
+    "coalesce": True,
+    "coalesce_across_processes": False,
+    "lock_timeout": 10,
+    "pinned_versions": True,
+    "not_found_ttl": 30,
+    "parameters_error_ttl": 300,
+    "stale_while_revalidate": 0,
+    "stale_if_error": 0,
+}
+
+# Errors cached by `cache_secret_value` and `cache_secret_values`, with the setting holding their TTL.
+NEGATIVE_TTL_SETTINGS = {
+    exceptions.SecretValueNotFoundError: "not_found_ttl",
+    exceptions.SecretParametersError: "parameters_error_ttl",
+}
+
+logger = logging.getLogger(__name__)
+
+# Sentinel returned by `TTLCache.get` on a cache miss, as `None` may be a legitimate secret value.
+MISSING = object()
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after a per-entry time-to-live.
+
+    Entries set with a `stale` period are kept for that many seconds after they expire, during which `get_stale` still
+    returns them.
+    """
+
+    def __init__(self, max_entries):
+        """Initialize an empty cache holding at most `max_entries` entries."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pid = os.getpid()
+        self._mutex = threading.Lock()
+
+    @property
+    def _lock(self):
+        # A lock inherited from the parent process may be held by a thread that doesn't exist in a forked child.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._mutex = threading.Lock()
+        return self._mutex
+
+    def get(self, key, default=MISSING):
+        """Return the value cached under `key`, or `default` if it is missing or expired."""
+        return self.get_stale(key, 0, default=default)
+
+    def get_stale(self, key, max_stale, default=MISSING):
+        """Return the value cached under `key` if it expired less than `max_stale` seconds ago, or `default`."""
+        with self._lock:
+            try:
+                value, expires_at, evict_at = self._entries[key]
+            except KeyError:
+                return default
+            if expires_at is not None:
+                now = time.monotonic()
+                if now >= evict_at:
+                    del self._entries[key]
+                    return default
+                if now >= expires_at + max_stale:
+                    return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None, stale=0):
+        """Cache `value` under `key` for `ttl` seconds, or until evicted if `ttl` is None, keeping it `stale` more."""
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        evict_at = None if ttl is None else expires_at + stale
+        with self._lock:
+            self._entries[key] = (value, expires_at, evict_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove `key` from the cache, returning its value."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def pop_if(self, predicate):
+        """Remove the entries whose key matches `predicate`, returning how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        """Return the number of entries, including expired entries not yet evicted."""
+        return len(self._entries)
+
+
+class SharedCache:
+    """Encrypted entries in one of Django's configured caches, shared by every Nautobot process using that cache.
+
+    Neither the values nor the keys they are stored under are readable from the cache backend: values are encrypted
+    with Fernet and keys are replaced by an HMAC of the original key. Errors of the cache backend are logged and
+    treated as a cache miss, so that an unavailable cache never prevents secrets from being retrieved.
+    """
+
+    key_prefix = "nautobot_secrets_providers"
+
+    def __init__(self, alias="default", encryption_key=None):
+        """Initialize the cache on top of the Django cache `alias`, encrypting with a key derived from `encryption_key`.
+
+        `SECRET_KEY` is used when no `encryption_key` is given.
+        """
+        self.alias = alias
+        self._secret = encryption_key or settings.SECRET_KEY
+        key = salted_hmac(f"{self.key_prefix}.encryption", "", secret=self._secret, algorithm="sha256").digest()
+        self._fernet = Fernet(base64.urlsafe_b64encode(key))
+
+    def make_key(self, key):
+        """Return the key under which the entry for `key` is stored in the Django cache."""
+        digest = salted_hmac(f"{self.key_prefix}.key", repr(key), secret=self._secret, algorithm="sha256").hexdigest()
+        return f"{self.key_prefix}:{digest}"
+
+    def get_entry(self, key):
+        """Return a `(value, ttl)` tuple for the entry cached under `key`, with its remaining TTL, or None."""
+        try:
+            token = caches[self.alias].get(self.make_key(key))
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to read from the shared secrets cache: %s", err)
+            return None
+        if token is None:
+            return None
+        try:
+            value, expires_at = json.loads(self._fernet.decrypt(token))
+        except (InvalidToken, TypeError, ValueError):
+            # Written with another encryption key, or not by us at all.
+            return None
+        ttl = None if expires_at is None else expires_at - time.time()
+        if ttl is not None and ttl <= 0:
+            return None
+        return value, ttl
+
+    def get(self, key, default=MISSING):
+        """Return the value cached under `key`, or `default` if it is missing or expired."""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Encrypt and cache `value` under `key` for `ttl` seconds, or without expiry if `ttl` is None."""
+        expires_at = None if ttl is None else time.time() + ttl
+        try:
+            token = self._fernet.encrypt(json.dumps([value, expires_at]).encode())
+        except TypeError:
+            logger.debug("Not sharing a secret value of type %s, it isn't JSON serializable", type(value).__name__)
+            return
+        try:
+            caches[self.alias].set(self.make_key(key), token, timeout=ttl)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to write to the shared secrets cache: %s", err)
+
+    @contextlib.contextmanager
+    def lock(self, key, timeout):
+        """Hold a lock on `key`, shared by all processes, for at most `timeout` seconds while in the context.
+
+        Waits up to `timeout` seconds for the lock. The context value is whether the lock was acquired: it isn't if
+        the wait timed out, the cache can't be reached or its backend (unlike django-redis) doesn't support locking.
+        """
+        try:
+            lock = caches[self.alias].lock(f"{self.make_key(key)}:lock", timeout=timeout, blocking_timeout=timeout)
+            acquired = lock.acquire()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to lock the shared secrets cache: %s", err)
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    # The lock expired, or the cache went away, while the value was retrieved.
+                    logger.warning("Unable to unlock the shared secrets cache: %s", err)
+
+    def pop(self, key, default=None):
+        """Remove `key` from the cache, returning its value."""
+        value = self.get(key, default)
+        try:
+            caches[self.alias].delete(self.make_key(key))
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to delete from the shared secrets cache: %s", err)
+        return value
+
+
+class TieredCache:
+    """An in-process `TTLCache` layered over an optional `SharedCache`.
+
+    Lookups are served from the process first and from the shared cache next; a value found in the shared cache is
+    copied to the process for the rest of its TTL. Values are written to both tiers.
+    """
+
+    def __init__(self, local, shared=None):
+        """Initialize the cache from its in-process tier `local` and its (optional) `shared` tier."""
+        self.local = local
+        self.shared = shared
+
+    def get(self, key, default=MISSING, shared=True):
+        """Return the value cached under `key` in either tier, or `default`; `shared=False` skips the shared tier."""
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        if shared and self.shared is not None:
+            entry = self.shared.get_entry(key)
+            if entry is not None:
+                self.local.set(key, *entry)
+                return entry[0]
+        return default
+
+    def set(self, key, value, ttl=None, shared=True, stale=0):
+        """Cache `value` under `key` for `ttl` seconds in both tiers; `shared=False` skips the shared tier.
+
+        The value is kept `stale` more seconds in the in-process tier only.
+        """
+        self.local.set(key, value, ttl, stale)
+        if shared and self.shared is not None:
+            self.shared.set(key, value, ttl)
+
+    def pop(self, key, default=None):
+        """Remove `key` from both tiers, returning its value."""
+        value = self.local.pop(key, MISSING)
+        if self.shared is not None:
+            shared_value = self.shared.pop(key, MISSING)
+            if value is MISSING:
+                value = shared_value
+        return default if value is MISSING else value
+
+    def clear(self):
+        """Remove all entries of the in-process tier; entries of the shared tier are left to expire."""
+        self.local.clear()
+
+    def __len__(self):
+        """Return the number of entries of the in-process tier."""
+        return len(self.local)
+
+
+_values = None
+_documents = None
+_values_lock = threading.Lock()
+_in_flight = SingleFlight()
+
+# Keys of the values being refreshed in the background, the pool refreshing them, and the number of stale values served.
+_refreshing = set()
+_refresh_executor = None
+_stale_counts = Counter()
+_stats_lock = threading.Lock()
+
+# Number of refreshes that may be pending, per refresh thread, before further refreshes are dropped.
+REFRESH_QUEUE_FACTOR = 4
+
+
+def _reset_refreshing():
+    # The threads refreshing values don't exist in a forked child.
+    global _stats_lock, _refresh_executor  # pylint: disable=global-statement
+    _stats_lock = threading.Lock()
+    _refresh_executor = None
+    _refreshing.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_refreshing)
+
+
+def get_value_cache():
+    """Return the process-wide cache of secret values, configured according to the app settings."""
+    global _values  # pylint: disable=global-statement
+    with _values_lock:
+        if _values is None:
+            cache_settings = get_cache_settings()
+            _values = TieredCache(
+                TTLCache(cache_settings["max_entries"]),
+                SharedCache(cache_settings["shared_cache_alias"], cache_settings["encryption_key"]),
+            )
+        return _values
+
+
+def get_document_cache():
+    """Return the process-wide cache of secret documents, configured according to the app settings."""
+    global _documents  # pylint: disable=global-statement
+    with _values_lock:
+        if _documents is None:
+            _documents = TTLCache(get_cache_settings()["max_entries"])
+        return _documents
+
+
+def clear_cache():
+    """Remove every cached secret value and document."""
+    global _values, _documents  # pylint: disable=global-statement
+    with _values_lock:
+        _values = None
+        _documents = None
+
+
+@receiver(setting_changed)
+def _clear_cache(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the cached values when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        clear_cache()
+
+
+def get_cache_settings(slug=None):
+    """Return the cache settings, with the overrides for the provider with the given `slug` applied."""
+    cache_settings = settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {}).get("cache", {})
+    provider_settings = cache_settings.get("providers", {}).get(slug, {}) if slug else {}
+    return {
+        key: provider_settings.get(key, cache_settings.get(key, default))
+        for key, default in DEFAULT_CACHE_SETTINGS.items()
+    }
+
+
+def is_pinned(provider, parameters):
+    """Return True if the rendered `parameters` pin a secret of `provider` to a specific, immutable, version.
+
+    Providers supporting version pinning name the parameter holding the version in their `version_parameter`.
+    """
+    version_parameter = getattr(provider, "version_parameter", None)
+    return bool(version_parameter and parameters.get(version_parameter))
+
+
+def get_cache_ttl(cache_settings, pinned=False):
+    """Return whether a value is cached according to `cache_settings`, and the TTL to cache it with."""
+    if pinned and cache_settings["pinned_versions"]:
+        return True, None
+    return cache_settings["enabled"], cache_settings["ttl"]
+
+
+def get_cache_key(slug, parameters):
+    """Return the cache key for a secret of the given provider with the given rendered parameters."""
+    return (slug, tuple(sorted(parameters.items())))
+
+
+def is_value_cached(slug, parameters):
+    """Return True if the in-process cache holds the current value of a secret with the given rendered `parameters`."""
+    if _values is None:
+        return False
+    return _values.local.get(get_cache_key(slug, parameters)) is not MISSING
+
+
+def get_document(slug, key, fetch, is_stale=None, pinned=False):
+    """Return a document of the provider with the given `slug`, calling `fetch()` to retrieve it if it isn't cached.
+
+    Documents are whatever a backend returns for a single request but may hold several secret values, such as a JSON
+    secret with a username and a password, so that lookups of sibling values share a request. Documents are only
+    cached in-process, following the `enabled`, `ttl` and `coalesce` cache settings of the provider.
+
+    Args:
+        slug (str): Slug of the provider.
+        key (tuple): Hashable identifier of the document in the backend.
+        fetch (callable): Function retrieving the document from the backend.
+        is_stale (callable, optional): Function called with a cached document, returning True if it must be fetched
+            again, e.g. because it lacks a value that may have been added to the backend since.
+        pinned (bool, optional): Whether the document is a specific, immutable, version, cached without expiry.
+
+    Returns:
+        (object): The document returned by `fetch()`, now or earlier.
+    """
+    cache_settings = get_cache_settings(slug)
+    key = ("document", slug, key)
+    enabled, ttl = get_cache_ttl(cache_settings, pinned)
+    if not enabled:
+        return _in_flight.do(key, fetch) if cache_settings["coalesce"] else fetch()
+
+    documents = get_document_cache()
+    document = documents.get(key)
+    if document is not MISSING and not (is_stale and is_stale(document)):
+        return document
+
+    def fetch_and_cache():
+        document = fetch()
+        documents.set(key, document, ttl)
+        return document
+
+    return _in_flight.do(key, fetch_and_cache) if cache_settings["coalesce"] else fetch_and_cache()
+
+
+def set_document(slug, key, document, pinned=False):
+    """Cache a `document` of the provider with the given `slug` retrieved otherwise than through `get_document`.
+
+    This lets batch and prefetch requests fill the cache used by single lookups. Nothing is cached if caching is
+    disabled for the provider.
+
+    Returns:
+        (bool): Whether the document was cached.
+    """
+    enabled, ttl = get_cache_ttl(get_cache_settings(slug), pinned)
+    if enabled:
+        get_document_cache().set(("document", slug, key), document, ttl)
+    return enabled
+
+
+def invalidate_values(slug, predicate):
+    """Remove the cached values and errors of the provider `slug` whose rendered parameters match `predicate`.
+
+    Only the in-process tier can be searched; values in the shared tier expire at the end of their TTL.
+    """
+    if _values is not None:
+        # Values are cached under `(slug, parameters)` and errors under `("error", slug, parameters)`.
+        _values.local.pop_if(lambda key: key[-2] == slug and predicate(dict(key[-1])))
+
+
+def get_stale_counts():
+    """Return the number of stale values served by this process, keyed on `(provider slug, reason)`.
+
+    The reason is `"revalidate"` for values served while refreshed in the background (`stale_while_revalidate`), or
+    `"error"` for values served because retrieving the current value failed (`stale_if_error`).
+    """
+    with _stats_lock:
+        return dict(_stale_counts)
+
+
+def serve_stale(slug, reason):
+    """Count a stale value of the provider `slug` served for `reason`."""
+    with _stats_lock:
+        _stale_counts[(slug, reason)] += 1
+
+
+def refresh_in_background(key, fetch):
+    """Call `fetch()` in a background thread to refresh the value cached under `key`, unless already refreshing it.
+
+    Refreshes run on a process-wide pool of `batch_max_workers` threads. When too many refreshes are already pending,
+    as when many values expire at once, the refresh is dropped: the stale value is then refreshed by a later lookup.
+    """
+    global _refresh_executor  # pylint: disable=global-statement
+    plugin_settings = settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {})
+    max_workers = plugin_settings.get("batch_max_workers", DEFAULT_BATCH_MAX_WORKERS)
+    with _stats_lock:
+        if key in _refreshing or len(_refreshing) >= max_workers * REFRESH_QUEUE_FACTOR:
+            return
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="nautobot-secrets-providers-refresh"
+            )
+        _refreshing.add(key)
+        executor = _refresh_executor
+
+    def refresh():
+        try:
+            fetch()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to refresh a cached secret value of %s: %s", key[0], err)
+        finally:
+            with _stats_lock:
+                _refreshing.discard(key)
+            # Rendering the parameters may have queried the database from this thread.
+            connections.close_all()
+
+    executor.submit(refresh)
+
+
+def copy_secret_error(error, secret, provider):
+    """Return `error`, raised by a lookup of another secret with the same parameters, anew for `secret`."""
+    if not isinstance(error, exceptions.SecretError):
+        return copy_exception(error)
+    copied = type(error)(secret, provider, error.message)
+    copied.__cause__ = error.__cause__
+    return copied
+
+
+def get_cached_error(values, key, secret, provider):
+    """Return the error cached for the lookup with the given cache `key`, raised anew for `secret`, or None."""
+    error = values.local.get(("error", *key))
+    if error is MISSING:
+        return None
+    return copy_secret_error(error, secret, provider)
+
+
+def cache_error(values, key, error, cache_settings):
+    """Cache `error`, raised by the lookup with the given cache `key`, in-process if it is a cacheable error."""
+    for error_class, setting in NEGATIVE_TTL_SETTINGS.items():
+        if isinstance(error, error_class) and cache_settings[setting]:
+            values.local.set(("error", *key), error, cache_settings[setting])
+            return
+
+
+def cache_secret_value(func):
+    """Decorate a provider's `get_value_for_secret` to cache the values it returns, when enabled in the settings.
+
+    Example:
+        ```python
+        @classmethod
+        @cache_secret_value
+        def get_value_for_secret(cls, secret, obj=None, **kwargs):
+            ...
+        ```
+    """
+
+    @functools.wraps(func)
+    def wrapper(cls, secret, obj=None, **kwargs):
+        cache_settings = get_cache_settings(cls.slug)
+        if not (cache_settings["enabled"] or cache_settings["coalesce"] or cache_settings["pinned_versions"]):
+            return func(cls, secret, obj=obj, **kwargs)
+
+        parameters = secret.rendered_parameters(obj=obj)
+        key = get_cache_key(cls.slug, parameters)
+        # Lookups of distinct secrets with the same parameters are coalesced, each raising errors for its own secret.
+        copy_error = functools.partial(copy_secret_error, secret=secret, provider=cls)
+        enabled, ttl = get_cache_ttl(cache_settings, is_pinned(cls, parameters))
+        if not enabled:
+            if cache_settings["coalesce"]:
+                return _in_flight.do(key, lambda: func(cls, secret, obj=obj, **kwargs), copy_error)
+            return func(cls, secret, obj=obj, **kwargs)
+
+        values = get_value_cache()
+        shared = cache_settings["shared"]
+        value = values.get(key, shared=shared)
+        if value is not MISSING:
+            return value
+        error = get_cached_error(values, key, secret, cls)
+        if error is not None:
+            raise error
+        stale = max(cache_settings["stale_while_revalidate"], cache_settings["stale_if_error"])
+
+        def lookup():
+            try:
+                return func(cls, secret, obj=obj, **kwargs)
+            except tuple(NEGATIVE_TTL_SETTINGS) as err:
+                cache_error(values, key, err, cache_settings)
+                raise
+
+        def fetch():
+            # Another thread may have cached the value since it was looked up.
+            value = values.get(key, shared=False)
+            if value is not MISSING:
+                return value
+            if shared and cache_settings["coalesce_across_processes"]:
+                with values.shared.lock(key, cache_settings["lock_timeout"]) as locked:
+                    # Another process may have cached the value while this one was waiting for the lock.
+                    value = values.get(key) if locked else MISSING
+                    if value is MISSING:
+                        value = lookup()
+                        values.set(key, value, ttl, stale=stale)
+                    return value
+            value = lookup()
+            values.set(key, value, ttl, shared=shared, stale=stale)
+            return value
+
+        def coalesced_fetch():
+            return _in_flight.do(key, fetch, copy_error) if cache_settings["coalesce"] else fetch()
+
+        if cache_settings["stale_while_revalidate"]:
+            value = values.local.get_stale(key, cache_settings["stale_while_revalidate"])
+            if value is not MISSING:
+                refresh_in_background(key, coalesced_fetch)
+                serve_stale(cls.slug, "revalidate")
+                return value
+
+        try:
+            return coalesced_fetch()
+        except tuple(NEGATIVE_TTL_SETTINGS):
+            raise
+        except Exception as err:
+            value = values.local.get_stale(key, cache_settings["stale_if_error"]) if stale else MISSING
+            if value is MISSING:
+                raise
+            logger.warning("Serving a stale cached secret value of %s after an error: %s", cls.slug, err)
+            serve_stale(cls.slug, "error")
+            return value
+
+    return wrapper
+
+
+def cache_secret_values(func):
+    """Decorate a provider's `get_values_for_secrets` to cache the values it returns, when enabled in the settings.
+
+    Cached values are returned without calling the decorated method, which is only passed the requests missing from
+    the cache. See `BatchSecretsProviderMixin.get_values_for_secrets` for its signature.
+    """
+
+    @functools.wraps(func)
+    def wrapper(cls, requests):
+        requests = list(requests)
+        cache_settings = get_cache_settings(cls.slug)
+        if not (cache_settings["enabled"] or cache_settings["pinned_versions"]):
+            return func(cls, requests)
+
+        values_cache = get_value_cache()
+        shared = cache_settings["shared"]
+        stale = max(cache_settings["stale_while_revalidate"], cache_settings["stale_if_error"])
+        values, errors, misses = {}, {}, []
+        for index, (secret, obj) in enumerate(requests):
+            try:
+                parameters = secret.rendered_parameters(obj=obj)
+            except exceptions.SecretError as err:
+                errors[index] = err
+                continue
+            key = get_cache_key(cls.slug, parameters)
+            enabled, ttl = get_cache_ttl(cache_settings, is_pinned(cls, parameters))
+            value = values_cache.get(key, shared=shared) if enabled else MISSING
+            error = get_cached_error(values_cache, key, secret, cls) if enabled and value is MISSING else None
+            if error is not None:
+                errors[index] = error
+            elif value is MISSING:
+                misses.append((index, key, enabled, ttl))
+            else:
+                values[index] = value
+
+        if misses:
+            miss_values, miss_errors = func(cls, [requests[index] for index, *_ in misses])
+            for position, value in miss_values.items():
+                index, key, enabled, ttl = misses[position]
+                values[index] = value
+                if enabled:
+                    values_cache.set(key, value, ttl, shared=shared, stale=stale)
+            for position, err in miss_errors.items():
+                index, key, enabled, _ = misses[position]
+                value = MISSING
+                if enabled and not isinstance(err, tuple(NEGATIVE_TTL_SETTINGS)):
+                    value = values_cache.local.get_stale(key, cache_settings["stale_if_error"])
+                if value is not MISSING:
+                    logger.warning("Serving a stale cached secret value of %s after an error: %s", cls.slug, err)
+                    serve_stale(cls.slug, "error")
+                    values[index] = value
+                    continue
+                errors[index] = err
+                if enabled:
+                    cache_error(values_cache, key, err, cache_settings)
+        return values, errors
+
+    return wrapper
@@ -0,0 +1,195 @@
+"""Circuit breakers failing lookups fast while a secrets backend is unavailable.
+
+Circuit breakers are disabled by default and are enabled through the `circuit_breaker` app setting, for example:
+
+```python
+PLUGINS_CONFIG = {
+    "nautobot_secrets_providers": {
+        "circuit_breaker": {
+            "enabled": True,
+            "failure_threshold": 5,
+            "latency_threshold": 10,
+            "recovery_timeout": 30,
+            "providers": {
+                "one-password": {"enabled": False},
+            },
+        },
+    },
+}
+```
+
+Each backend (as returned by the `get_circuit_key` classmethod of its provider, such as a HashiCorp Vault name or an
+AWS service and region) has its own breaker, kept per process. A breaker opens after `failure_threshold` consecutive
+failed lookups, counting lookups slower than `latency_threshold` seconds as failures. While open, lookups immediately
+raise `SecretProviderError` instead of waiting for the backend. After `recovery_timeout` seconds, a single lookup is let
+through as a probe: the breaker closes if it succeeds and opens again otherwise.
+
+Lookups failing with `SecretValueNotFoundError` or `SecretParametersError` got an answer from the backend, so they
+don't count as failures.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from nautobot.extras.secrets import exceptions
+
+from .utils import ClientCache
+
+__all__ = (
+    "DEFAULT_CIRCUIT_BREAKER_SETTINGS",
+    "CircuitBreaker",
+    "circuit_breaker",
+    "get_circuit_breaker_settings",
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CIRCUIT_BREAKER_SETTINGS = {
+    "enabled": False,
+    "failure_threshold": 5,
+    "latency_threshold": None,
+    "recovery_timeout": 30,
+}
+
+_breakers = ClientCache()
+
+
+@receiver(setting_changed)
+def _clear_breakers(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the circuit breakers when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        _breakers.clear()
+
+
+def get_circuit_breaker_settings(slug=None):
+    """Return the circuit breaker settings, with the overrides for the provider with the given `slug` applied."""
+    breaker_settings = settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {}).get("circuit_breaker", {})
+    provider_settings = breaker_settings.get("providers", {}).get(slug, {}) if slug else {}
+    return {
+        key: provider_settings.get(key, breaker_settings.get(key, default))
+        for key, default in DEFAULT_CIRCUIT_BREAKER_SETTINGS.items()
+    }
+
+
+class CircuitBreaker:
+    """A thread-safe circuit breaker, closed, open or half-open.
+
+    Callers ask `allow()` before calling the backend, then report the outcome with `succeeded()` or `failed()`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold, recovery_timeout):
+        """Initialize a closed breaker opening after `failure_threshold` failures, for `recovery_timeout` seconds."""
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Return whether a call may go through, letting a single probe through once the breaker may recover."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self.opened_at + self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self):
+        """Return the number of seconds before the open breaker lets a probe through."""
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def succeeded(self):
+        """Record a successful call, closing the breaker."""
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def failed(self):
+        """Record a failed call, opening the breaker after too many consecutive failures or a failed probe.
+
+        Returns:
+            (bool): Whether the breaker was opened by this failure.
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+def get_circuit_breaker(key, breaker_settings):
+    """Return the circuit breaker of the backend identified by `key`."""
+    return _breakers.get_or_create(
+        key, lambda: CircuitBreaker(breaker_settings["failure_threshold"], breaker_settings["recovery_timeout"])
+    )
+
+
+def circuit_breaker(func):
+    """Decorate a provider's `get_value_for_secret` to fail fast while its backend is unavailable.
+
+    The provider identifies the backend of a secret with a `get_circuit_key(parameters)` classmethod, called with the
+    rendered parameters of the secret. Stacked under `cache_secret_value`, so that cached values are still served while
+    the breaker is open.
+
+    Example:
+        ```python
+        @classmethod
+        @cache_secret_value
+        @circuit_breaker
+        def get_value_for_secret(cls, secret, obj=None, **kwargs):
+            ...
+        ```
+    """
+
+    @functools.wraps(func)
+    def wrapper(cls, secret, obj=None, **kwargs):
+        breaker_settings = get_circuit_breaker_settings(cls.slug)
+        if not breaker_settings["enabled"]:
+            return func(cls, secret, obj=obj, **kwargs)
+
+        key = cls.get_circuit_key(secret.rendered_parameters(obj=obj))
+        breaker = get_circuit_breaker(key, breaker_settings)
+        if not breaker.allow():
+            raise exceptions.SecretProviderError(
+                secret,
+                cls,
+                f"{cls.name} backend {key[-1]} is unavailable, not retrying for {breaker.retry_in():.0f} seconds",
+            )
+
+        start = time.monotonic()
+        try:
+            value = func(cls, secret, obj=obj, **kwargs)
+        except (exceptions.SecretValueNotFoundError, exceptions.SecretParametersError):
+            breaker.succeeded()
+            raise
+        except Exception:
+            if breaker.failed():
+                logger.warning("Circuit breaker opened for %s backend %s after a failure", cls.name, key[-1])
+            raise
+
+        latency_threshold = breaker_settings["latency_threshold"]
+        if latency_threshold is not None and time.monotonic() - start > latency_threshold:
+            if breaker.failed():
+                logger.warning("Circuit breaker opened for %s backend %s after a slow lookup", cls.name, key[-1])
+        else:
+            breaker.succeeded()
+        return value
+
+    return wrapper
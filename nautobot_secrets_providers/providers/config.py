@@ -0,0 +1,54 @@
+"""Configuration of the Secrets Providers, parsed and validated once from the app settings.
+
+Providers needing settings implement a `parse_config(plugin_settings)` classmethod returning an immutable config object,
+whose `errors` attribute lists what is wrong with the settings. `NautobotSecretsProvidersConfig.ready()` parses the
+configuration of every published provider at startup and fails if any of them is invalid, so that lookups only have to
+index the prebuilt configuration. When the settings are changed at runtime (as in tests), the configuration is parsed
+again on next use and errors are only reported by the lookups that hit them.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+__all__ = ("get_plugin_settings", "get_provider_config", "load_provider_configs")
+
+# Parsed configuration of each provider class.
+_configs = {}
+
+
+@receiver(setting_changed)
+def _clear_configs(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the parsed configuration when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        _configs.clear()
+
+
+def get_plugin_settings():
+    """Return the settings of the app."""
+    return settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {})
+
+
+def get_provider_config(provider):
+    """Return the parsed configuration of `provider`, or None if it doesn't have any settings."""
+    try:
+        return _configs[provider]
+    except KeyError:
+        parse_config = getattr(provider, "parse_config", None)
+        config = _configs[provider] = parse_config(get_plugin_settings()) if parse_config else None
+        return config
+
+
+def load_provider_configs(providers):
+    """Parse the configuration of `providers`.
+
+    Raises:
+        (ImproperlyConfigured): If the configuration of any of the providers is invalid.
+    """
+    errors = []
+    for provider in providers:
+        config = get_provider_config(provider)
+        errors.extend(f"{provider.name}: {error}" for error in getattr(config, "errors", ()))
+    if errors:
+        raise ImproperlyConfigured("Invalid secrets providers configuration:\n" + "\n".join(errors))
@@ -1,62 +1,256 @@
 """Secrets Provider for Delinea Secret Server."""
 
-import os
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 from django import forms
-from django.conf import settings
-
-try:
-    from delinea.secrets.server import (
-        AccessTokenAuthorizer,
-        DomainPasswordGrantAuthorizer,
-        PasswordGrantAuthorizer,
-        SecretServer,
-        SecretServerCloud,
-        SecretServerError,
-        ServerSecret,
-    )
-
-    delinea_installed = True  # pylint: disable=invalid-name
-except ImportError:
-    try:
-        from thycotic.secrets.server import (
-            AccessTokenAuthorizer,
-            DomainPasswordGrantAuthorizer,
-            PasswordGrantAuthorizer,
-            SecretServer,
-            SecretServerCloud,
-            SecretServerError,
-            ServerSecret,
-        )
-
-        delinea_installed = True  # pylint: disable=invalid-name
-    except ImportError:
-        delinea_installed = False  # pylint: disable=invalid-name
-
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from nautobot.core.forms import BootstrapMixin
 from nautobot.extras.secrets import SecretsProvider, exceptions
 
+from .batch import BatchSecretsProviderMixin
+from .cache import TTLCache, cache_secret_value, get_document
 from .choices import DelineaSecretChoices
+from .circuitbreaker import circuit_breaker
+from .config import get_provider_config
+from .utils import ClientCache, LazyModule
 
 __all__ = (
     "DelineaSecretServerSecretsProviderId",
     "DelineaSecretServerSecretsProviderPath",
 )
 
+# The Delinea SDK, formerly published as `python-tss-sdk` under the `thycotic` package, is only imported by the first
+# lookup.
+delinea_sdk = LazyModule("delinea.secrets.server", "thycotic.secrets.server")
+requests = LazyModule("requests")
+
+# Seconds before its advertised expiry at which an OAuth access token is considered expired.
+TOKEN_EXPIRY_MARGIN = 60
+
+# Seconds to wait for Secret Server to answer a request, as the SDK does.
+REQUEST_TIMEOUT = 60
+
+# Maximum number of connections kept open to Secret Server by each client.
+POOL_MAXSIZE = 32
+
+# Seconds for which the ID a secret path resolved to is remembered, bounding how long a secret moved or renamed while
+# another secret still exists under its former ID keeps being retrieved.
+SECRET_ID_TTL = 3600
+
+# Secret Server clients (and their sessions and authorizers), keyed on (base_url, tenant, username, domain,
+# ca_bundle_path).
+_clients = ClientCache()
+
+
+@receiver(setting_changed)
+def _clear_clients(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the cached clients when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        _clients.clear()
+
+
+@dataclass(frozen=True, slots=True)
+class DelineaConfig:  # pylint: disable=too-many-instance-attributes
+    """The parsed `delinea` settings, along with the error making them invalid, if any."""
+
+    base_url: Optional[str]
+    ca_bundle_path: Optional[str]
+    cloud_based: bool
+    domain: Optional[str]
+    password: Optional[str]
+    tenant: Optional[str]
+    token: Optional[str]
+    username: Optional[str]
+    error: Optional[str]
+
+    @classmethod
+    def from_settings(cls, plugin_settings):
+        """Parse and validate the `delinea` app settings, returning None if Delinea isn't configured.
+
+        Delinea counts as not configured without a `base_url` or without any credentials, which deployments usually
+        read from environment variables that may not be set.
+        """
+        delinea_settings = plugin_settings.get("delinea", {})
+        if delinea_settings.get("base_url") is None:
+            return None
+        if not any(delinea_settings.get(field) for field in ("password", "token", "username")):
+            return None
+
+        config = {field: delinea_settings.get(field) for field in cls.__dataclass_fields__ if field != "error"}
+        config["cloud_based"] = bool(config["cloud_based"])
+        error = None
+        if not config["token"] and not (config["username"] and config["password"]):
+            error = "Delinea Secret Server configuration is missing a token, or a username and password!"
+        elif config["cloud_based"] and not config["tenant"]:
+            error = "Delinea Secret Server Cloud configuration is missing a tenant!"
+        return cls(**config, error=error)
+
+    @property
+    def errors(self):
+        """Return the error making the settings invalid, if any."""
+        return (self.error,) if self.error else ()
+
+
+def get_session(ca_bundle_path=None):
+    """Return a new `requests.Session` with a connection pool sized for concurrent lookups.
+
+    The trusted certificates are set on the session rather than through the `REQUESTS_CA_BUNDLE` environment variable,
+    which is shared by every thread of the process. As `requests` lets that variable override `Session.verify`, the
+    requests must also pass `verify=session.verify`.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = ca_bundle_path or True
+    return session
+
+
+class SessionSecretServer:
+    """Secret Server REST API client making its requests through a dedicated `requests.Session`.
+
+    The SDK clients call the module-level functions of `requests`, so this wraps one of them (`SecretServer` or
+    `SecretServerCloud`) for its URLs, authorization headers and response handling, and only makes the requests itself.
+
+    Secret Server resolves folder paths noticeably slower than it fetches secrets by ID, so the ID each path resolves
+    to is remembered and later lookups of the path fetch the secret by ID.
+    """
+
+    def __init__(self, server, session):
+        """Wrap the SDK client `server`, making requests through `session`."""
+        self.server = server
+        self.session = session
+        self.secret_ids = TTLCache(max_entries=4096)
+
+    def get(self, url, params=None):
+        """Make an authorized GET request to `url`, returning the response if it was successful.
+
+        A shared access token rejected by Secret Server, as when it was revoked or the server restarted, is dropped
+        and the request is retried once with a new token.
+        """
+        headers = self.server.headers()
+        response = self.session.get(
+            url, params=params, headers=headers, timeout=REQUEST_TIMEOUT, verify=self.session.verify
+        )
+        authorizer = self.server.authorizer
+        if response.status_code == 401 and isinstance(authorizer, SharedTokenAuthorizer):
+            authorizer.reset_access_token(headers["Authorization"].removeprefix("Bearer "))
+            response = self.session.get(
+                url, params=params, headers=self.server.headers(), timeout=REQUEST_TIMEOUT, verify=self.session.verify
+            )
+        return self.server.process(response)
+
+    def get_secret(self, secret_id, query_params=None):
+        """Return the secret with the given ID as a dictionary, with the contents of its file attachments."""
+        response = self.get(f"{self.server.api_url}/secrets/{secret_id}", params=query_params)
+        try:
+            secret = response.json()
+        except ValueError as err:
+            raise delinea_sdk.SecretServerError(response.text) from err
+
+        for item in secret["items"]:
+            if item["fileAttachmentId"]:
+                item["itemValue"] = self.get(
+                    f"{self.server.api_url}/secrets/{secret_id}/fields/{item['slug']}", params=query_params
+                ).text
+        return secret
+
+    def get_secret_by_path(self, secret_path):
+        """Return the secret at the given folder path as a dictionary, by its ID if the path was already resolved.
+
+        The path is sent to Secret Server as given, but remembered under a normalized form so that spellings of the
+        same path differing only by their separators share its ID.
+        """
+        key = "\\" + re.sub(r"[\\/]+", r"\\", secret_path).strip("\\")
+        secret_id = self.secret_ids.get(key, None)
+        if secret_id is not None:
+            try:
+                return self.get_secret(secret_id)
+            except delinea_sdk.SecretServerClientError:
+                # The secret was deleted or can no longer be accessed, look the path up again.
+                self.secret_ids.pop(key)
+
+        secret = self.get_secret(0, query_params={"secretPath": secret_path})
+        self.secret_ids.set(key, secret["id"], SECRET_ID_TTL)
+        return secret
+
+
+class SharedTokenAuthorizer:
+    """Thread-safe wrapper around a Delinea password grant authorizer.
+
+    The OAuth access token is requested once and then shared by every lookup until it is about to expire or Secret
+    Server rejects it, at which point exactly one thread requests a new one while the others wait for it.
+    """
+
+    def __init__(self, authorizer, session):
+        """Wrap the given password grant authorizer, requesting its tokens through `session`."""
+        self.authorizer = authorizer
+        self.session = session
+        self.lock = threading.Lock()
+        self.access_token = None
+        self.expires_at = 0
+
+    def get_access_grant(self):
+        """Request a new OAuth access grant from Secret Server."""
+        response = self.session.post(
+            self.authorizer.token_url,
+            self.authorizer.grant_request,
+            timeout=REQUEST_TIMEOUT,
+            verify=self.session.verify,
+        )
+        # Secret Server answers some errors with a 200 (OK) HTML page.
+        try:
+            return json.loads(delinea_sdk.SecretServer.process(response).content)
+        except json.JSONDecodeError as err:
+            raise delinea_sdk.SecretServerError(response) from err
+
+    def get_access_token(self):
+        """Return the current access token, requesting a new one if it has expired."""
+        with self.lock:
+            if self.access_token is None or time.monotonic() >= self.expires_at:
+                grant = self.get_access_grant()
+                self.access_token = grant["access_token"]
+                self.expires_at = time.monotonic() + grant.get("expires_in", 0) - TOKEN_EXPIRY_MARGIN
+            return self.access_token
+
+    def reset_access_token(self, access_token):
+        """Drop `access_token`, unless another thread already replaced it, so that the next request gets a new one."""
+        with self.lock:
+            if self.access_token == access_token:
+                self.access_token = None
+
+    def headers(self, existing_headers=None):
+        """Return the headers for a REST API call, including the bearer token."""
+        return {"Authorization": f"Bearer {self.get_access_token()}", **(existing_headers or {})}
+
 
-class DelineaSecretServerSecretsProviderBase(SecretsProvider):
+class DelineaSecretServerSecretsProviderBase(BatchSecretsProviderMixin, SecretsProvider):
     """A secrets provider for Delinea Secret Server."""
 
-    is_available = delinea_installed
+    is_available = delinea_sdk.is_installed
 
     @classmethod
+    def get_circuit_key(cls, parameters):  # pylint: disable=unused-argument
+        """Return the key of the circuit breaker of the Secret Server (see `circuit_breaker`)."""
+        config = get_provider_config(cls)
+        return ("delinea", config.base_url if config else None)
+
+    @classmethod
+    @cache_secret_value
+    @circuit_breaker
     def get_value_for_secret(cls, secret, obj=None, **kwargs):  # pylint: disable=too-many-locals
         """Return the value stored under the secret's key in the secret's path."""
         # This is only required for Delinea Secret Server therefore not defined in
         # `required_settings` for the app config.
-        plugin_settings = settings.PLUGINS_CONFIG["nautobot_secrets_providers"]
-        if "delinea" not in plugin_settings:
+        config = get_provider_config(cls)
+        if config is None:
             raise exceptions.SecretProviderError(secret, cls, "Delinea Secret Server is not configured!")
 
         # Try to get parameters and error out early.
@@ -79,26 +273,77 @@ class DelineaSecretServerSecretsProviderBase(SecretsProvider):
             msg = "The secret parameter could not be retrieved for field!"
             raise exceptions.SecretParametersError(secret, cls, msg)
 
-        delinea_settings = plugin_settings["delinea"]
-        if delinea_settings["base_url"] is None:
-            raise exceptions.SecretProviderError(secret, cls, "Delinea Secret Server is not configured!")
+        if config.error:
+            raise exceptions.SecretProviderError(secret, cls, config.error)
 
         return cls.query_delinea_secret_server(
             secret=secret,
-            base_url=delinea_settings["base_url"],
-            ca_bundle_path=delinea_settings["ca_bundle_path"],
-            cloud_based=delinea_settings["cloud_based"],
-            domain=delinea_settings["domain"],
-            password=delinea_settings["password"],
+            base_url=config.base_url,
+            ca_bundle_path=config.ca_bundle_path,
+            cloud_based=config.cloud_based,
+            domain=config.domain,
+            password=config.password,
             secret_id=secret_id,
             secret_path=secret_path,
             secret_selected_value=secret_selected_value,
-            tenant=delinea_settings["tenant"],
-            token=delinea_settings["token"],
-            username=delinea_settings["username"],
+            tenant=config.tenant,
+            token=config.token,
+            username=config.username,
             caller_class=cls,
         )
 
+    @classmethod
+    def parse_config(cls, plugin_settings):
+        """Return the parsed `delinea` settings (see `nautobot_secrets_providers.providers.config`)."""
+        return DelineaConfig.from_settings(plugin_settings)
+
+    @staticmethod
+    def get_client(  # pylint: disable=too-many-arguments
+        base_url,
+        ca_bundle_path=None,
+        cloud_based=None,
+        domain=None,
+        password=None,
+        tenant=None,
+        token=None,
+        username=None,
+    ):
+        """Return a new Secret Server client, which reuses its connections and OAuth access token.
+
+        All the requests of the client, including those for access tokens, go through its own pooled session trusting
+        `ca_bundle_path`, so that lookups from many threads can safely run in parallel.
+        """
+        session = get_session(ca_bundle_path)
+
+        # Setup Delinea authorizer
+        # Username | Password | Token | Domain | Authorizer
+        #   def    |   def    |   *   |   -    | PasswordGrantAuthorizer
+        #   def    |   def    |   *   |  def   | DomainPasswordGrantAuthorizer
+        #    *     |    *     |  def  |   -    | AccessTokenAuthorizer
+        if all([username, password]):
+            if domain is not None:
+                delinea_authorizer = delinea_sdk.DomainPasswordGrantAuthorizer(
+                    base_url=base_url,
+                    domain=domain,
+                    username=username,
+                    password=password,
+                )
+            else:
+                delinea_authorizer = delinea_sdk.PasswordGrantAuthorizer(
+                    base_url=base_url,
+                    username=username,
+                    password=password,
+                )
+            delinea_authorizer = SharedTokenAuthorizer(delinea_authorizer, session)
+        else:
+            delinea_authorizer = delinea_sdk.AccessTokenAuthorizer(token)
+
+        if cloud_based:
+            server = delinea_sdk.SecretServerCloud(tenant=tenant, authorizer=delinea_authorizer)
+        else:
+            server = delinea_sdk.SecretServer(base_url=base_url, authorizer=delinea_authorizer)
+        return SessionSecretServer(server, session)
+
     @staticmethod
     def query_delinea_secret_server(  # pylint: disable=too-many-boolean-expressions,too-many-locals,too-many-branches,too-many-arguments,too-many-positional-arguments
         secret,
@@ -115,7 +360,12 @@ class DelineaSecretServerSecretsProviderBase(SecretsProvider):
         username=None,
         caller_class=None,
     ):
-        """Query Delinea Secret Server."""
+        """Query Delinea Secret Server.
+
+        A secret usually holds several values, such as the username and password referenced by one secrets group, so
+        its fields are cached as a document (see `get_document`) keyed on the client and the `secret_id` or
+        `secret_path`, and every value selected from it is served from a single request.
+        """
         # Ensure required parameters are set
         if any(
             [token is None and not all([username, password]), cloud_based and not all([tenant, username, password])]
@@ -128,71 +378,58 @@ class DelineaSecretServerSecretsProviderBase(SecretsProvider):
                 """,
             )
 
-        must_restore_env = False
-        original_env = os.getenv("REQUESTS_CA_BUNDLE", "")
-        try:
-            if ca_bundle_path is not None:
-                # Ensure cerificates file exists if ca_bundle_path is defined
-                if not Path(ca_bundle_path).exists():
-                    raise exceptions.SecretProviderError(
-                        secret,
-                        caller_class,
-                        (
-                            "Delinea Secret Server is not configured properly! "
-                            "Trusted certificates file not found: "
-                            "Environment variable 'REQUESTS_CA_BUNDLE': "
-                            f"{ca_bundle_path}."
-                        ),
-                    )
-                if original_env != ca_bundle_path:
-                    os.environ["REQUESTS_CA_BUNDLE"] = ca_bundle_path
-                    must_restore_env = True
-            # Setup Delinea authorizer
-            # Username | Password | Token | Domain | Authorizer
-            #   def    |   def    |   *   |   -    | PasswordGrantAuthorizer
-            #   def    |   def    |   *   |  def   | DomainPasswordGrantAuthorizer
-            #    *     |    *     |  def  |   -    | AccessTokenAuthorizer
-            if all([username, password]):
-                if domain is not None:
-                    delinea_authorizer = DomainPasswordGrantAuthorizer(
-                        base_url=base_url,
-                        domain=domain,
-                        username=username,
-                        password=password,
-                    )
-                else:
-                    delinea_authorizer = PasswordGrantAuthorizer(
-                        base_url=base_url,
-                        username=username,
-                        password=password,
-                    )
-            else:
-                delinea_authorizer = AccessTokenAuthorizer(token)
+        if ca_bundle_path and not Path(ca_bundle_path).exists():
+            # Ensure certificates file exists if ca_bundle_path is defined
+            raise exceptions.SecretProviderError(
+                secret,
+                caller_class,
+                (
+                    "Delinea Secret Server is not configured properly! "
+                    f"Trusted certificates file not found: {ca_bundle_path}."
+                ),
+            )
+
+        # Get the client.
+        delinea = _clients.get_or_create(
+            (base_url, tenant, username, domain, ca_bundle_path),
+            lambda: DelineaSecretServerSecretsProviderBase.get_client(
+                base_url=base_url,
+                ca_bundle_path=ca_bundle_path,
+                cloud_based=cloud_based,
+                domain=domain,
+                password=password,
+                tenant=tenant,
+                token=token,
+                username=username,
+            ),
+        )
 
-            # Get the client.
-            if cloud_based:
-                delinea = SecretServerCloud(tenant=tenant, authorizer=delinea_authorizer)
+        def fetch():
+            if secret_id is not None:
+                server_secret = delinea_sdk.ServerSecret(**delinea.get_secret(secret_id))
             else:
-                delinea = SecretServer(base_url=base_url, authorizer=delinea_authorizer)
+                server_secret = delinea_sdk.ServerSecret(**delinea.get_secret_by_path(secret_path))
+            return {slug: field.value for slug, field in server_secret.fields.items()}
 
-            # Attempt to retrieve the secret.
-            try:
-                if secret_id is not None:
-                    secret = ServerSecret(**delinea.get_secret(secret_id))
-                else:
-                    secret = ServerSecret(**delinea.get_secret_by_path(secret_path))
-            except SecretServerError as err:
-                raise exceptions.SecretValueNotFoundError(secret, caller_class, str(err)) from err
-
-            # Attempt to return the selected value.
-            try:
-                return secret.fields[secret_selected_value].value
-            except KeyError as err:
-                msg = f"The secret value could not be retrieved using key {err}"
-                raise exceptions.SecretValueNotFoundError(secret, caller_class, msg) from err
-        finally:
-            if must_restore_env:
-                os.environ["REQUESTS_CA_BUNDLE"] = original_env
+        # Attempt to retrieve the secret.
+        key = (base_url, tenant, username, domain, None if secret_id is None else str(secret_id), secret_path)
+        try:
+            fields = get_document(
+                caller_class.slug, key, fetch, is_stale=lambda fields: secret_selected_value not in fields
+            )
+        except delinea_sdk.SecretServerClientError as err:
+            # Secret Server answers 4xx for secrets that don't exist or can't be accessed.
+            raise exceptions.SecretValueNotFoundError(secret, caller_class, str(err.message)) from err
+        except delinea_sdk.SecretServerError as err:
+            # Server errors and unexpected responses mean Secret Server is unavailable, not that the secret is gone.
+            raise exceptions.SecretProviderError(secret, caller_class, str(err.message)) from err
+
+        # Attempt to return the selected value.
+        try:
+            return fields[secret_selected_value]
+        except KeyError as err:
+            msg = f"The secret value could not be retrieved using key {err}"
+            raise exceptions.SecretValueNotFoundError(secret, caller_class, msg) from err
 
 
 class DelineaSecretServerSecretsProviderId(DelineaSecretServerSecretsProviderBase):
@@ -1,27 +1,170 @@
 """Secrets Provider for HashiCorp Vault."""
 
-from django import forms
-from django.conf import settings
-
-try:
-    import boto3
-except ImportError:
-    boto3 = None
-
-try:
-    import hvac
-except ImportError:
-    hvac = None
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
 
+from django import forms
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from nautobot.core.forms import BootstrapMixin, add_blank_choice
 from nautobot.extras.secrets import SecretsProvider, exceptions
 
+from .batch import BatchSecretsProviderMixin
+from .cache import TTLCache, cache_secret_value, get_document, invalidate_values
 from .choices import HashicorpKVVersionChoices
+from .circuitbreaker import circuit_breaker
+from .config import get_provider_config
+from .utils import ClientCache, LazyModule
 
 __all__ = ("HashiCorpVaultSecretsProvider",)
 
+# The SDKs are only imported by the first lookup, as they take a while to load.
+boto3 = LazyModule("boto3")
+hvac = LazyModule("hvac")
+
 K8S_TOKEN_DEFAULT_PATH = "/var/run/secrets/kubernetes.io/serviceaccount/token"  # noqa: S105
 AUTH_METHOD_CHOICES = ["approle", "aws", "kubernetes", "token"]
+# Fraction of a token's TTL after which it is renewed, or replaced by a new login if it can't be renewed.
+TOKEN_RENEW_THRESHOLD = 0.75
+
+# Authenticated clients, keyed on (vault name, namespace).
+_clients = ClientCache()
+# Last version read of each KV v2 secret, keyed like the cached documents.
+_versions = TTLCache(max_entries=4096)
+
+
+@receiver(setting_changed)
+def _clear_clients(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the cached clients when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        _clients.clear()
+        _versions.clear()
+
+
+@dataclass(frozen=True, slots=True)
+class VaultConfig:  # pylint: disable=too-many-instance-attributes
+    """The parsed settings of a HashiCorp Vault, along with the error making them invalid, if any."""
+
+    settings: Mapping
+    url: Optional[str]
+    auth_method: str
+    kv_version: str
+    default_mount_point: str
+    namespace: Optional[str]
+    ca_cert: Optional[str]
+    token: Optional[str]
+    role_name: Optional[str]
+    role_id: Optional[str]
+    secret_id: Optional[str]
+    k8s_token_path: str
+    login_kwargs: Mapping
+    error: Optional[str]
+
+    @classmethod
+    def from_settings(cls, vault_settings):
+        """Parse and validate the settings of a vault."""
+        auth_method = vault_settings.get("auth_method", "token")
+        kv_version = vault_settings.get("kv_version", HashicorpKVVersionChoices.KV_VERSION_2)
+
+        error = None
+        if "url" not in vault_settings:
+            error = "HashiCorp Vault configuration is missing a url"
+        elif auth_method not in AUTH_METHOD_CHOICES:
+            error = f"HashiCorp Vault Auth Method {auth_method} is invalid!"
+        elif kv_version not in HashicorpKVVersionChoices.as_dict():
+            error = f"HashiCorp Vault KV version {kv_version} is invalid!"
+        elif auth_method == "aws" and not boto3.is_installed:
+            error = "HashiCorp Vault AWS Authentication Method requires the boto3 library!"
+        elif auth_method == "token" and "token" not in vault_settings:
+            error = "HashiCorp Vault configuration is missing a token for token authentication!"
+        elif auth_method == "kubernetes" and "role_name" not in vault_settings:
+            error = "HashiCorp Vault configuration is missing a role name for kubernetes authentication!"
+        elif auth_method == "approle" and ("role_id" not in vault_settings or "secret_id" not in vault_settings):
+            error = "HashiCorp Vault configuration is missing a role_id and/or secret_id!"
+
+        return cls(
+            settings=MappingProxyType(dict(vault_settings)),
+            url=vault_settings.get("url"),
+            auth_method=auth_method,
+            kv_version=kv_version,
+            default_mount_point=vault_settings.get("default_mount_point", "secret"),
+            namespace=vault_settings.get("namespace"),
+            ca_cert=vault_settings.get("ca_cert"),
+            token=vault_settings.get("token"),
+            role_name=vault_settings.get("role_name"),
+            role_id=vault_settings.get("role_id"),
+            secret_id=vault_settings.get("secret_id"),
+            k8s_token_path=vault_settings.get("k8s_token_path", K8S_TOKEN_DEFAULT_PATH),
+            login_kwargs=MappingProxyType(dict(vault_settings.get("login_kwargs", {}))),
+            error=error,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class HashiCorpVaultConfig:
+    """The parsed `hashicorp_vault` settings: either a single vault, used whatever its name, or named `vaults`."""
+
+    vaults: Mapping
+    multiple: bool
+
+    @classmethod
+    def from_settings(cls, plugin_settings):
+        """Parse and validate the `hashicorp_vault` app settings."""
+        vault_settings = plugin_settings.get("hashicorp_vault", {})
+        if "vaults" in vault_settings:
+            vaults = {
+                name: VaultConfig.from_settings(value) for name, value in vault_settings["vaults"].items() if value
+            }
+            return cls(vaults=MappingProxyType(vaults), multiple=True)
+        vaults = {None: VaultConfig.from_settings(vault_settings)} if vault_settings else {}
+        return cls(vaults=MappingProxyType(vaults), multiple=False)
+
+    @property
+    def errors(self):
+        """Return the errors of the invalid vaults."""
+        return tuple(
+            f"{name}: {vault.error}" if name else vault.error for name, vault in self.vaults.items() if vault.error
+        )
+
+    def get(self, name=None):
+        """Return the configuration of the vault with the given name, or None if it isn't configured."""
+        return self.vaults.get(name if self.multiple else None)
+
+
+class CachedClient:
+    """An authenticated hvac client along with the lifetime of its token."""
+
+    def __init__(self, client, auth=None):
+        """Wrap `client`, whose token was issued with the given `auth` section of a login response."""
+        self.client = client
+        self.lock = threading.Lock()
+        self.ttl = 0
+        self.update_lease(auth)
+
+    def update_lease(self, auth, renewal=False):
+        """Record the TTL of the token from the `auth` section of a login or renewal response."""
+        auth = auth or {}
+        lease_duration = auth.get("lease_duration") or 0
+        if not renewal:
+            self.ttl = lease_duration
+        self.renewable = bool(auth.get("renewable"))
+        now = time.monotonic()
+        # A lease duration of 0 means the token never expires, as is the case for static and root tokens.
+        self.expires_at = now + lease_duration if lease_duration else None
+        self.refresh_at = now + lease_duration * TOKEN_RENEW_THRESHOLD if lease_duration else None
+
+    @property
+    def needs_refresh(self):
+        """Return True once the token is close enough to expiry that it should be renewed."""
+        return self.refresh_at is not None and time.monotonic() >= self.refresh_at
+
+    @property
+    def can_renew(self):
+        """Return True if the token may still be renewed."""
+        return self.renewable and self.expires_at is not None and time.monotonic() < self.expires_at
 
 
 def vault_choices():
@@ -31,18 +174,19 @@ def vault_choices():
     then we build a form option for each key in vaults.
     Otherwise we fall "Default" to make this a non-breaking change.
     """
-    plugin_settings = settings.PLUGINS_CONFIG["nautobot_secrets_providers"]
-    if "vaults" in plugin_settings["hashicorp_vault"]:
-        return [(key, key.replace("_", " ").title()) for key in plugin_settings["hashicorp_vault"]["vaults"].keys()]
+    config = get_provider_config(HashiCorpVaultSecretsProvider)
+    if config.multiple:
+        return [(key, key.replace("_", " ").title()) for key in config.vaults]
     return [("default", "Default")]
 
 
-class HashiCorpVaultSecretsProvider(SecretsProvider):
+class HashiCorpVaultSecretsProvider(BatchSecretsProviderMixin, SecretsProvider):
     """A secrets provider for HashiCorp Vault."""
 
     slug = "hashicorp-vault"
+    version_parameter = "version"
     name = "HashiCorp Vault"
-    is_available = hvac is not None
+    is_available = hvac.is_installed
 
     # TBD: Remove after pylint-nautobot bump
     # pylint: disable-next=nb-incorrect-base-class
@@ -73,112 +217,140 @@ class HashiCorpVaultSecretsProvider(SecretsProvider):
             help_text="Override Vault Setting: The version of the kv engine (either v1 or v2).",
             label="KV Version (override)",
         )
+        version = forms.CharField(
+            required=False,
+            help_text="The version of the HashiCorp Vault secret, to pin a version rather than use the latest one (KV v2 only)",
+            label="Secret Version",
+        )
 
-    @staticmethod
-    def retrieve_vault_settings(name=None):
+    @classmethod
+    def parse_config(cls, plugin_settings):
+        """Return the parsed `hashicorp_vault` settings (see `nautobot_secrets_providers.providers.config`)."""
+        return HashiCorpVaultConfig.from_settings(plugin_settings)
+
+    @classmethod
+    def retrieve_vault_settings(cls, name=None):
         """Retrieve the configuration from settings that matches the provided vault name.
 
         Args:
             name (str, optional): Vault name to retrieve from settings. Defaults to None.
 
         Returns:
-            vault_settings (dict): Hashicorp Vault Settings
+            vault_settings (Mapping): Hashicorp Vault Settings, read-only.
+
+        Raises:
+            (KeyError): If the vault isn't configured.
         """
-        vault_settings = settings.PLUGINS_CONFIG["nautobot_secrets_providers"].get("hashicorp_vault", {})
-        if name and "vaults" in vault_settings:
-            return vault_settings["vaults"][name]
-        return vault_settings
+        vault = get_provider_config(cls).get(name)
+        if vault is None:
+            raise KeyError(name)
+        return vault.settings
 
     @classmethod
-    def validate_vault_settings(cls, secret=None, vault_name=None):
-        """Validate the vault settings."""
-        try:
-            vault_settings = cls.retrieve_vault_settings(vault_name)
-        except KeyError as err:
-            raise exceptions.SecretProviderError(
-                secret, cls, f"HashiCorp Vault {vault_name} is not configured!"
-            ) from err
-        if not vault_settings:
+    def get_vault_config(cls, secret=None, vault_name=None):
+        """Return the parsed configuration of a vault, raising a `SecretProviderError` if it is missing or invalid."""
+        vault = get_provider_config(cls).get(vault_name)
+        if vault is None:
             raise exceptions.SecretProviderError(secret, cls, f"HashiCorp Vault {vault_name} is not configured!")
+        if vault.error:
+            raise exceptions.SecretProviderError(secret, cls, vault.error)
+        return vault
 
-        auth_method = vault_settings.get("auth_method", "token")
-        kv_version = vault_settings.get("kv_version", HashicorpKVVersionChoices.KV_VERSION_2)
-
-        if "url" not in vault_settings:
-            raise exceptions.SecretProviderError(secret, cls, "HashiCorp Vault configuration is missing a url")
+    @classmethod
+    def validate_vault_settings(cls, secret=None, vault_name=None):
+        """Validate the vault settings, and return them."""
+        return cls.get_vault_config(secret, vault_name).settings
 
-        if auth_method not in AUTH_METHOD_CHOICES:
-            raise exceptions.SecretProviderError(secret, cls, f"HashiCorp Vault Auth Method {auth_method} is invalid!")
+    @classmethod
+    def get_client(cls, secret=None, vault_name=None):
+        """Authenticate and return a hashicorp client."""
+        client, _ = cls.authenticate(secret, vault_name)
+        return client
 
-        if kv_version not in HashicorpKVVersionChoices.as_dict():
-            raise exceptions.SecretProviderError(secret, cls, f"HashiCorp Vault KV version {kv_version} is invalid!")
+    @classmethod
+    def get_cached_client(cls, secret=None, vault_name=None):
+        """Return an authenticated hashicorp client, reusing the one from previous lookups where possible.
 
-        if auth_method == "aws" and not boto3:
-            raise exceptions.SecretProviderError(
-                secret, cls, "HashiCorp Vault AWS Authentication Method requires the boto3 library!"
-            )
-        if auth_method == "token" and "token" not in vault_settings:
-            raise exceptions.SecretProviderError(
-                secret, cls, "HashiCorp Vault configuration is missing a token for token authentication!"
-            )
-        if auth_method == "kubernetes" and "role_name" not in vault_settings:
-            raise exceptions.SecretProviderError(
-                secret, cls, "HashiCorp Vault configuration is missing a role name for kubernetes authentication!"
-            )
-        if auth_method == "approle" and ("role_id" not in vault_settings or "secret_id" not in vault_settings):
-            raise exceptions.SecretProviderError(
-                secret, cls, "HashiCorp Vault configuration is missing a role_id and/or secret_id!"
-            )
+        The client is cached per vault name and namespace. Its token is renewed once it has used up
+        `TOKEN_RENEW_THRESHOLD` of its TTL, or replaced by a new login if it is not renewable or has reached its
+        maximum TTL.
+        """
+        cached = _clients.get_or_create(
+            cls.get_client_cache_key(vault_name), lambda: CachedClient(*cls.authenticate(secret, vault_name))
+        )
+        if cached.needs_refresh:
+            with cached.lock:
+                if cached.needs_refresh:
+                    cls.refresh_client(cached, secret, vault_name)
+        return cached.client
 
-        return vault_settings
+    @classmethod
+    def get_client_cache_key(cls, vault_name=None):
+        """Return the key under which the client for the given vault is cached."""
+        vault = get_provider_config(cls).get(vault_name)
+        return (vault_name, vault.namespace if vault else None)
 
     @classmethod
-    def get_client(cls, secret=None, vault_name=None):  # pylint: disable-msg=too-many-locals
-        """Authenticate and return a hashicorp client."""
-        vault_settings = cls.validate_vault_settings(secret, vault_name)
-        auth_method = vault_settings.get("auth_method", "token")
+    def refresh_client(cls, cached, secret=None, vault_name=None):
+        """Renew the token of a cached client, falling back to a new login."""
+        if cached.can_renew:
+            try:
+                auth = cached.client.auth.token.renew_self().get("auth") or {}
+            except hvac.exceptions.VaultError:
+                auth = {}
+            # Once the token approaches its maximum TTL, Vault grants shorter and shorter renewals; log in again.
+            if auth.get("lease_duration", 0) >= cached.ttl * (1 - TOKEN_RENEW_THRESHOLD):
+                cached.update_lease(auth, renewal=True)
+                return
+        cached.client, auth = cls.authenticate(secret, vault_name)
+        cached.update_lease(auth)
 
-        k8s_token_path = vault_settings.get("k8s_token_path", K8S_TOKEN_DEFAULT_PATH)
-        login_kwargs = vault_settings.get("login_kwargs", {})
+    @classmethod
+    def authenticate(cls, secret=None, vault_name=None):  # pylint: disable-msg=too-many-locals
+        """Authenticate and return a hashicorp client along with the `auth` section of the login response."""
+        vault = cls.get_vault_config(secret, vault_name)
+        auth_method = vault.auth_method
+        login_kwargs = vault.login_kwargs
 
         # According to the docs (https://hvac.readthedocs.io/en/stable/source/hvac_v1.html?highlight=verify#hvac.v1.Client.__init__)
         # the client verify parameter is either a boolean or a path to a ca certificate file to verify.  This is non-intuitive
         # so we use a parameter to specify the path to the ca_cert, if not provided we use the default of None
-        ca_cert = vault_settings.get("ca_cert", None)
+        ca_cert = vault.ca_cert
 
-        namespace = vault_settings.get("namespace", None)
+        namespace = vault.namespace
 
         # Get the client and attempt to retrieve the secret.
+        response = {}
         try:
             if auth_method == "token":
                 client = hvac.Client(
-                    url=vault_settings["url"],
-                    token=vault_settings["token"],
+                    url=vault.url,
+                    token=vault.token,
                     verify=ca_cert,
                     namespace=namespace,
                 )
             else:
-                client = hvac.Client(url=vault_settings["url"], verify=ca_cert, namespace=namespace)
+                client = hvac.Client(url=vault.url, verify=ca_cert, namespace=namespace)
                 if auth_method == "approle":
-                    client.auth.approle.login(
-                        role_id=vault_settings["role_id"],
-                        secret_id=vault_settings["secret_id"],
+                    response = client.auth.approle.login(
+                        role_id=vault.role_id,
+                        secret_id=vault.secret_id,
                         **login_kwargs,
                     )
                 elif auth_method == "kubernetes":
-                    with open(k8s_token_path, "r", encoding="utf-8") as token_file:
+                    with open(vault.k8s_token_path, "r", encoding="utf-8") as token_file:
                         jwt = token_file.read()
-                    client.auth.kubernetes.login(role=vault_settings["role_name"], jwt=jwt, **login_kwargs)
+                    response = client.auth.kubernetes.login(role=vault.role_name, jwt=jwt, **login_kwargs)
                 elif auth_method == "aws":
                     session = boto3.Session()
                     aws_creds = session.get_credentials()
                     aws_region = session.region_name or "us-east-1"
-                    client.auth.aws.iam_login(
+                    response = client.auth.aws.iam_login(
                         access_key=aws_creds.access_key,
                         secret_key=aws_creds.secret_key,
                         session_token=aws_creds.token,
                         region=aws_region,
-                        role=vault_settings.get("role_name", None),
+                        role=vault.role_name,
                         **login_kwargs,
                     )
         except hvac.exceptions.InvalidRequest as err:
@@ -190,22 +362,32 @@ class HashiCorpVaultSecretsProvider(SecretsProvider):
                 secret, cls, f"HashiCorp Vault Access Denied (auth_method: {auth_method}). Error: {err}"
             ) from err
 
-        return client
+        return client, (response or {}).get("auth")
+
+    @classmethod
+    def get_mount_point(cls, parameters):
+        """Return the mount point of a secret with the given rendered parameters, or of its vault by default."""
+        vault = get_provider_config(cls).get(parameters.get("vault", "default"))
+        return parameters.get("mount_point") or (vault.default_mount_point if vault else "secret")
+
+    @classmethod
+    def get_circuit_key(cls, parameters):
+        """Return the key of the circuit breaker of the vault of a secret (see `circuit_breaker`)."""
+        return ("hashicorp-vault", parameters.get("vault", "default"))
 
     @classmethod
+    @cache_secret_value
+    @circuit_breaker
     def get_value_for_secret(cls, secret, obj=None, **kwargs):
         """Return the value stored under the secret’s key in the secret’s path."""
         # Try to get parameters and error out early.
         parameters = secret.rendered_parameters(obj=obj)
-        try:
-            vault_name = parameters.get("vault", "default")
-            vault_settings = cls.retrieve_vault_settings(vault_name)
-        except KeyError:
-            vault_settings = {}
+        vault_name = parameters.get("vault", "default")
+        vault = get_provider_config(cls).get(vault_name)
         # Get the mount_point and kv_version from the Vault configuration. These default to the
         # default Vault that HashiCorp provides.
-        secret_mount_point = vault_settings.get("default_mount_point", "secret")
-        secret_kv_version = vault_settings.get("kv_version", HashicorpKVVersionChoices.KV_VERSION_2)
+        secret_mount_point = cls.get_mount_point(parameters)
+        secret_kv_version = vault.kv_version if vault else HashicorpKVVersionChoices.KV_VERSION_2
 
         try:
             secret_path = parameters["path"]
@@ -214,27 +396,99 @@ class HashiCorpVaultSecretsProvider(SecretsProvider):
             # the settings they provide. These are here to support multiple vaults (vault engines) when
             # that was not allowed by the settings. Ideally these should be deprecated and removed in
             # the future.
-            secret_mount_point = parameters.get("mount_point", secret_mount_point) or secret_mount_point
             secret_kv_version = parameters.get("kv_version", secret_kv_version) or secret_kv_version
         except KeyError as err:
             msg = f"The secret parameter could not be retrieved for field {err}"
             raise exceptions.SecretParametersError(secret, cls, msg) from err
 
-        client = cls.get_client(secret, vault_name)
+        secret_version = parameters.get("version") or None
+        if secret_version is not None:
+            if secret_kv_version == HashicorpKVVersionChoices.KV_VERSION_1:
+                msg = "Secret versions are only supported by the KV version 2 secrets engine"
+                raise exceptions.SecretParametersError(secret, cls, msg)
+            try:
+                secret_version = int(secret_version)
+            except ValueError as err:
+                msg = f"The secret version {secret_version} is not a number"
+                raise exceptions.SecretParametersError(secret, cls, msg) from err
 
         try:
-            if secret_kv_version == HashicorpKVVersionChoices.KV_VERSION_1:
-                response = client.secrets.kv.v1.read_secret(path=secret_path, mount_point=secret_mount_point)
-            else:
-                response = client.secrets.kv.v2.read_secret(path=secret_path, mount_point=secret_mount_point)
+            data = cls.get_secret_document(
+                secret,
+                vault_name,
+                secret_kv_version,
+                secret_path,
+                secret_mount_point,
+                version=secret_version,
+                is_stale=lambda document: secret_key not in document,
+            )
         except hvac.exceptions.InvalidPath as err:
             raise exceptions.SecretValueNotFoundError(secret, cls, str(err)) from err
 
         # Retrieve the value using the key or complain loudly.
         try:
-            if secret_kv_version == HashicorpKVVersionChoices.KV_VERSION_1:
-                return response["data"][secret_key]
-            return response["data"]["data"][secret_key]
+            return data[secret_key]
         except KeyError as err:
             msg = f"The secret value could not be retrieved using key {err}"
             raise exceptions.SecretValueNotFoundError(secret, cls, msg) from err
+
+    @classmethod
+    def get_secret_document(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        cls, secret, vault_name, kv_version, path, mount_point, version=None, is_stale=None
+    ):
+        """Return the data of the KV secret at `path`, with all its keys, in its latest or the given `version`.
+
+        The data is cached as a document (see `get_document`) keyed on the vault, namespace, mount point, KV version,
+        path and version, so that lookups of its other keys are served from a single read. When a read of the latest
+        version of a KV v2 secret returns a new `metadata.version`, the cached values of the secret's keys are
+        invalidated. Pinned versions never change, so they are cached without expiry.
+
+        Raises:
+            (hvac.exceptions.InvalidPath): If there is no secret at `path`.
+        """
+        key = (*cls.get_client_cache_key(vault_name), mount_point, kv_version, path, version)
+
+        def fetch():
+            client = cls.get_cached_client(secret, vault_name)
+            try:
+                response = cls.read_secret(client, kv_version, path, mount_point, version=version)
+            except hvac.exceptions.Forbidden:
+                # The cached token may have been revoked; log in again and retry once. Only the client that failed is
+                # dropped, so that concurrent lookups hitting the same error log in once.
+                client_key = cls.get_client_cache_key(vault_name)
+                cached = _clients.get(client_key)
+                if cached is not None and cached.client is client:
+                    _clients.discard(client_key, cached)
+                client = cls.get_cached_client(secret, vault_name)
+                response = cls.read_secret(client, kv_version, path, mount_point, version=version)
+
+            if kv_version == HashicorpKVVersionChoices.KV_VERSION_1:
+                return response["data"]
+            if version is None:
+                latest_version = (response["data"].get("metadata") or {}).get("version")
+                previous_version = _versions.get(key, None)
+                _versions.set(key, latest_version)
+                if previous_version is not None and previous_version != latest_version:
+                    config = get_provider_config(cls)
+                    vault = config.get(vault_name)
+                    invalidate_values(
+                        cls.slug,
+                        lambda parameters: (
+                            parameters.get("path") == path
+                            and not parameters.get("version")
+                            and config.get(parameters.get("vault", "default")) is vault
+                            and cls.get_mount_point(parameters) == mount_point
+                        ),
+                    )
+            return response["data"]["data"]
+
+        return get_document(cls.slug, key, fetch, is_stale=is_stale, pinned=version is not None)
+
+    @staticmethod
+    def read_secret(client, kv_version, path, mount_point, version=None):
+        """Read the KV secret at `path` using the given KV engine version, in its latest or the given `version`."""
+        if kv_version == HashicorpKVVersionChoices.KV_VERSION_1:
+            return client.secrets.kv.v1.read_secret(path=path, mount_point=mount_point)
+        if version is not None:
+            return client.secrets.kv.v2.read_secret_version(path=path, version=version, mount_point=mount_point)
+        return client.secrets.kv.v2.read_secret(path=path, mount_point=mount_point)
@@ -1,40 +1,144 @@
 """1Password Secrets Provider for Nautobot."""
 
-from asgiref.sync import async_to_sync
+import asyncio
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from asgiref.sync import sync_to_async
 from django import forms
-from django.conf import settings
 from nautobot.core.forms import BootstrapMixin
+from nautobot.extras.models import Secret
 from nautobot.extras.secrets import SecretsProvider, exceptions
 
-try:
-    from onepassword.client import Client
-except ImportError:
-    Client = None
-
 from nautobot_secrets_providers import __version__
 
+from .batch import BatchSecretsProviderMixin, as_secret_error
+from .cache import (
+    cache_secret_value,
+    cache_secret_values,
+    get_cache_settings,
+    get_document,
+    is_value_cached,
+    set_document,
+)
+from .circuitbreaker import circuit_breaker
+from .config import get_provider_config
+from .utils import ClientCache, EventLoopThread, LazyModule
+
 __all__ = ("OnePasswordSecretsProvider",)
 
+# The 1Password SDK is only imported by the first lookup, as it takes a while to load.
+onepassword_client = LazyModule("onepassword.client")
+
+# Authentication tasks, keyed on the service account token. Only ever accessed from the thread of
+# `OnePasswordSecretsProvider.event_loop`.
+_clients = ClientCache()
 
-@async_to_sync
-async def get_secret_from_vault(vault, item, field, token, section=None):
-    """Get a secret from a 1Password vault.
+# Messages of the exceptions raised by `Secrets.resolve` (used by SDK releases without `resolve_all`) when the vault,
+# item or field of a reference doesn't exist.
+NOT_FOUND_ERROR = re.compile(r"no \w+ matched|cannot be found|not found", re.IGNORECASE)
+
+
+def cache_results(token, results):
+    """Cache the values of the references resolved with `token` as documents keyed on `(token, reference)`.
+
+    This lets the lookups of the other secrets resolved along with a secret be served from the document cache (see
+    `get_document`). Nothing is cached if caching is disabled for the provider.
+    """
+    for reference, result in results.items():
+        if isinstance(result, str):
+            set_document(OnePasswordSecretsProvider.slug, (token, reference), result)
+
+
+async def get_client(token):
+    """Return a 1Password client authenticated with `token`, authenticating only on first use.
+
+    Concurrent callers share the same pending authentication, and a failed authentication is not cached. Must be
+    awaited on `OnePasswordSecretsProvider.event_loop`, which the clients are bound to.
 
     Args:
-        vault (str): 1Password Vault where the secret is located.
-        item (str): 1Password Item where the secret is located.
-        field (str): 1Password secret field name.
         token (str): 1Password Service Account token.
-        section (str, optional): 1Password Item Section for the secret. Defaults to None.
 
     Returns:
-        (str): Value from the secret.
+        (Client): Authenticated 1Password client.
     """
-    client = await Client.authenticate(
-        auth=token, integration_name="nautobot-secrets-providers", integration_version=__version__
+    task = _clients.get_or_create(
+        token,
+        lambda: asyncio.ensure_future(
+            onepassword_client.Client.authenticate(
+                auth=token, integration_name="nautobot-secrets-providers", integration_version=__version__
+            )
+        ),
     )
-    reference = f"op://{vault}/{item}/{f'{section}/' if section else ''}{field}"
-    return await client.secrets.resolve(reference)
+    try:
+        return await task
+    except Exception:
+        if _clients.get(token) is task:
+            _clients.pop(token)
+        raise
+
+
+def get_reference(vault, item, field, section=None):
+    """Return the 1Password secret reference (`op://...`) of a field."""
+    return f"op://{vault}/{item}/{f'{section}/' if section else ''}{field}"
+
+
+async def resolve_secrets(references, token):
+    """Resolve many secret references at once.
+
+    SDK releases providing `Secrets.resolve_all` resolve all the references with a single call, older releases resolve
+    them concurrently.
+
+    Args:
+        references (list[str]): 1Password secret references.
+        token (str): 1Password Service Account token.
+
+    Returns:
+        (dict): The value of each reference, or the exception or `ResolveReferenceError` raised resolving it.
+    """
+    client = await get_client(token)
+    if not hasattr(client.secrets, "resolve_all"):
+        results = await asyncio.gather(*map(client.secrets.resolve, references), return_exceptions=True)
+        return dict(zip(references, results))
+
+    response = await client.secrets.resolve_all(references)
+    return {
+        reference: result.content.secret if result.error is None else result.error
+        for reference, result in response.individual_responses.items()
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class OnePasswordConfig:
+    """The parsed `one_password` settings."""
+
+    token: Optional[str]
+    vaults: Mapping
+
+    @classmethod
+    def from_settings(cls, plugin_settings):
+        """Parse the `one_password` app settings, returning None if 1Password isn't configured.
+
+        1Password counts as not configured without any `vaults`, as in the development configuration.
+        """
+        one_password_settings = plugin_settings.get("one_password") or {}
+        if not one_password_settings.get("vaults"):
+            return None
+        token = one_password_settings.get("token")
+        vaults = {
+            name: (vault_settings or {}).get("token") or token
+            for name, vault_settings in one_password_settings.get("vaults", {}).items()
+        }
+        return cls(token=token, vaults=MappingProxyType(vaults))
+
+    @property
+    def errors(self):
+        """Return the errors making the settings invalid."""
+        return tuple(
+            f"1Password token is not configured for vault {name}!" for name, token in self.vaults.items() if not token
+        )
 
 
 def vault_choices():
@@ -42,16 +146,20 @@ def vault_choices():
 
     Build a form option for each key in vaults.
     """
-    plugin_settings = settings.PLUGINS_CONFIG["nautobot_secrets_providers"]
-    return [(key, key) for key in plugin_settings["one_password"]["vaults"].keys()]
+    config = get_provider_config(OnePasswordSecretsProvider)
+    return [(key, key) for key in config.vaults] if config else []
 
 
-class OnePasswordSecretsProvider(SecretsProvider):
+class OnePasswordSecretsProvider(BatchSecretsProviderMixin, SecretsProvider):
     """A secrets provider for 1Password."""
 
     slug = "one-password"
     name = "1Password Vault"
-    is_available = Client is not None
+    is_available = onepassword_client.is_installed
+
+    # All 1Password SDK calls run on this loop, so that authenticated clients can be shared by every lookup and
+    # concurrent lookups from many threads run concurrently.
+    event_loop = EventLoopThread(name="nautobot-secrets-providers-1password")
 
     # TBD: Remove after pylint-nautobot bump
     # pylint: disable-next=nb-incorrect-base-class
@@ -77,33 +185,170 @@ class OnePasswordSecretsProvider(SecretsProvider):
             initial="password",
         )
 
+    @classmethod
+    def parse_config(cls, plugin_settings):
+        """Return the parsed `one_password` settings (see `nautobot_secrets_providers.providers.config`)."""
+        return OnePasswordConfig.from_settings(plugin_settings)
+
     @classmethod
     def get_token(cls, secret, vault):
         """Get the token for a vault."""
-        plugin_settings = settings.PLUGINS_CONFIG["nautobot_secrets_providers"]
-        if "token" in plugin_settings["one_password"]["vaults"][vault]:
-            return plugin_settings["one_password"]["vaults"][vault]["token"]
+        config = get_provider_config(cls)
+        if config is None:
+            raise exceptions.SecretProviderError(secret, cls, "1Password is not configured!")
         try:
-            return plugin_settings["one_password"]["token"]
-        except KeyError as exc:
-            raise exceptions.SecretProviderError(secret, cls, "1Password token is not configured!") from exc
+            token = config.vaults[vault]
+        except KeyError as err:
+            raise exceptions.SecretProviderError(secret, cls, f"1Password vault {vault} is not configured!") from err
+        if not token:
+            raise exceptions.SecretProviderError(secret, cls, "1Password token is not configured!")
+        return token
+
+    @classmethod
+    def get_resolve_error(cls, secret, reference, error):
+        """Return the `SecretError` to raise for an error resolving `reference`."""
+        if isinstance(error, Exception):
+            if not isinstance(error, exceptions.SecretError) and NOT_FOUND_ERROR.search(str(error)):
+                not_found = exceptions.SecretValueNotFoundError(secret, cls, f"Unable to resolve {reference}: {error}")
+                not_found.__cause__ = error
+                return not_found
+            return as_secret_error(error, secret, cls)
+        if error is None:
+            return exceptions.SecretValueNotFoundError(secret, cls, f"{reference} was not resolved")
+        error_type = getattr(getattr(error, "type", None), "value", str(error))
+        msg = f"Unable to resolve {reference}: {error_type}"
+        if error_type == "parsing":
+            return exceptions.SecretParametersError(secret, cls, msg)
+        if error_type.endswith("NotFound"):
+            return exceptions.SecretValueNotFoundError(secret, cls, msg)
+        return exceptions.SecretProviderError(secret, cls, msg)
 
     @classmethod
+    def get_sibling_references(cls, secret, obj, token):
+        """Return the references of the other 1Password secrets sharing a secrets group with `secret` and its `token`.
+
+        Siblings whose parameters can't be rendered for `obj`, that use another token, or whose value is already cached,
+        are left out.
+        """
+        if secret.pk is None:
+            return []
+        siblings = (
+            Secret.objects.filter(provider=cls.slug, secrets_groups__secrets=secret).exclude(pk=secret.pk).distinct()
+        )
+        references = []
+        for sibling in siblings:
+            try:
+                parameters = sibling.rendered_parameters(obj=obj)
+                if is_value_cached(cls.slug, parameters) or cls.get_token(sibling, vault=parameters["vault"]) != token:
+                    continue
+                references.append(
+                    get_reference(
+                        parameters["vault"], parameters["item"], parameters["field"], section=parameters.get("section")
+                    )
+                )
+            except (exceptions.SecretError, KeyError):
+                continue
+        return references
+
+    @classmethod
+    def get_circuit_key(cls, parameters):
+        """Return the key of the circuit breaker of the vault of a secret (see `circuit_breaker`)."""
+        return ("one-password", parameters.get("vault"))
+
+    @classmethod
+    @cache_secret_value
+    @circuit_breaker
     def get_value_for_secret(cls, secret, obj=None, **kwargs):  # pylint: disable=too-many-locals
-        """Get the value for a secret from 1Password."""
+        """Get the value for a secret from 1Password.
+
+        With caching enabled, the other 1Password secrets of the secrets groups of the secret are resolved along with
+        it, in a single `resolve_all` call, and cached as documents: looking up the username and then the password of a
+        secrets group costs a single round-trip.
+        """
         # This is only required for 1Password therefore not defined in
         # `required_settings` for the app config.
-        plugin_settings = settings.PLUGINS_CONFIG["nautobot_secrets_providers"]
-        if "one_password" not in plugin_settings:
+        if get_provider_config(cls) is None:
             raise exceptions.SecretProviderError(secret, cls, "1Password is not configured!")
 
         parameters = secret.rendered_parameters(obj=obj)
         vault = parameters["vault"]
+        token = cls.get_token(secret, vault=vault)
+        reference = get_reference(vault, parameters["item"], parameters["field"], section=parameters.get("section"))
 
-        return get_secret_from_vault(
-            vault=vault,
-            item=parameters["item"],
-            field=parameters["field"],
-            token=cls.get_token(secret, vault=vault),
-            section=parameters.get("section", None),
-        )
+        def fetch():
+            # Siblings are only worth resolving if their values are cached for their own lookups.
+            siblings = cls.get_sibling_references(secret, obj, token) if get_cache_settings(cls.slug)["enabled"] else []
+            references = list(dict.fromkeys([reference, *siblings]))
+            try:
+                results = cls.event_loop.run(resolve_secrets(references, token))
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                results = dict.fromkeys(references, err)
+            cache_results(token, results)
+            result = results.get(reference)
+            if isinstance(result, str):
+                return result
+            raise cls.get_resolve_error(secret, reference, result)
+
+        return get_document(cls.slug, (token, reference), fetch)
+
+    @classmethod
+    async def aget_value_for_secret(cls, secret, obj=None, **kwargs):  # pylint: disable=unused-argument
+        """Get the value for a secret from 1Password, for asynchronous callers.
+
+        The secret is resolved on `event_loop`, sharing its authenticated clients, while the calling loop keeps running.
+        Values aren't read from or stored in the value cache, whose shared tier can't be accessed asynchronously.
+        """
+        if get_provider_config(cls) is None:
+            raise exceptions.SecretProviderError(secret, cls, "1Password is not configured!")
+
+        # Rendering the parameters may access the database.
+        parameters = await sync_to_async(secret.rendered_parameters)(obj=obj)
+        vault = parameters["vault"]
+        token = cls.get_token(secret, vault=vault)
+        reference = get_reference(vault, parameters["item"], parameters["field"], section=parameters.get("section"))
+
+        try:
+            result = (await cls.event_loop.arun(resolve_secrets([reference], token))).get(reference)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            result = err
+        if isinstance(result, str):
+            return result
+        raise cls.get_resolve_error(secret, reference, result)
+
+    @classmethod
+    @cache_secret_values
+    def get_values_for_secrets(cls, requests):
+        """Return the values of many secrets, resolving them with a single `resolve_all` call per token.
+
+        The values resolved are cached as documents for later single lookups. See
+        `BatchSecretsProviderMixin.get_values_for_secrets`.
+        """
+        requests = list(requests)
+        values, errors = {}, {}
+        tokens = {}
+        for index, (secret, obj) in enumerate(requests):
+            try:
+                parameters = secret.rendered_parameters(obj=obj)
+                token = cls.get_token(secret, vault=parameters["vault"])
+                reference = get_reference(
+                    parameters["vault"], parameters["item"], parameters["field"], section=parameters.get("section")
+                )
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                errors[index] = as_secret_error(err, secret, cls)
+                continue
+            tokens.setdefault(token, {}).setdefault(reference, []).append((index, secret))
+
+        for token, references in tokens.items():
+            try:
+                results = cls.event_loop.run(resolve_secrets(list(references), token))
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                results = dict.fromkeys(references, err)
+            cache_results(token, results)
+            for reference, lookups in references.items():
+                result = results.get(reference)
+                for index, secret in lookups:
+                    if isinstance(result, str):
+                        values[index] = result
+                    else:
+                        errors[index] = cls.get_resolve_error(secret, reference, result)
+        return values, errors
@@ -0,0 +1,205 @@
+"""Adaptive client-side rate limiting for the Secrets Providers.
+
+Once enabled with the `rate_limit` app setting, requests to rate-limited backends go through a token bucket per backend,
+for example:
+
+```python
+PLUGINS_CONFIG = {
+    "nautobot_secrets_providers": {
+        "rate_limit": {
+            "enabled": True,
+            "rates": {"secretsmanager": 5000, "ssm": 100},
+            "max_retries": 8,
+            "shared": True,
+        },
+    },
+}
+```
+
+`rates` maps each service to the number of requests per second allowed before the backend throttles. Whenever the
+backend throttles a request anyway, the rate of its bucket is halved (down to `min_rate`), then raised again by 5% of
+its configured rate for each successful request. Throttled requests are retried up to `max_retries` times, with an
+exponential backoff capped at `max_backoff` seconds.
+
+Buckets are kept per process unless `shared` is enabled, in which case the request budget and the throttling
+feedback are shared by all Nautobot processes through one of Django's configured caches (`shared_cache_alias`, usually
+Redis), with the throttled rate recovering after `recovery` seconds.
+"""
+
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .utils import ClientCache
+
+__all__ = (
+    "DEFAULT_RATE_LIMIT_SETTINGS",
+    "SharedTokenBucket",
+    "TokenBucket",
+    "get_backoff",
+    "get_rate_limit_settings",
+    "get_token_bucket",
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT_SETTINGS = {
+    "enabled": False,
+    # Default quotas of GetSecretValue and of the standard throughput of GetParameter(s), per account and region.
+    "rates": {"secretsmanager": 10000, "ssm": 40},
+    "min_rate": 1,
+    "max_retries": 5,
+    "max_backoff": 20,
+    "shared": False,
+    "shared_cache_alias": "default",
+    "recovery": 60,
+}
+
+_buckets = ClientCache()
+
+
+@receiver(setting_changed)
+def _clear_buckets(setting, **kwargs):  # pylint: disable=unused-argument
+    """Drop the token buckets when the app configuration is changed."""
+    if setting == "PLUGINS_CONFIG":
+        _buckets.clear()
+
+
+def get_rate_limit_settings():
+    """Return the rate limit settings, with the defaults applied."""
+    rate_limit_settings = settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {}).get("rate_limit", {})
+    merged = {key: rate_limit_settings.get(key, default) for key, default in DEFAULT_RATE_LIMIT_SETTINGS.items()}
+    merged["rates"] = {**DEFAULT_RATE_LIMIT_SETTINGS["rates"], **rate_limit_settings.get("rates", {})}
+    return merged
+
+
+def get_backoff(attempt, max_backoff):
+    """Return the number of seconds to wait before retrying a throttled request, with exponential backoff and jitter."""
+    return random.uniform(0, min(max_backoff, 0.1 * 2**attempt))  # noqa: S311
+
+
+def get_token_bucket(service_name, key):
+    """Return the token bucket of a backend of `service_name`, identified by `key`, or None if it isn't rate limited.
+
+    Args:
+        service_name (str): Service whose rate applies, as named in the `rates` setting.
+        key (tuple): Identifies the backend, e.g. `(service_name, region_name, profile_name)`.
+    """
+    rate_limit_settings = get_rate_limit_settings()
+    rate = rate_limit_settings["rates"].get(service_name)
+    if not rate_limit_settings["enabled"] or not rate:
+        return None
+
+    def create_bucket():
+        min_rate = min(rate, rate_limit_settings["min_rate"])
+        if rate_limit_settings["shared"]:
+            return SharedTokenBucket(
+                ":".join(str(part) for part in key),
+                rate,
+                min_rate=min_rate,
+                alias=rate_limit_settings["shared_cache_alias"],
+                recovery=rate_limit_settings["recovery"],
+            )
+        return TokenBucket(rate, min_rate=min_rate)
+
+    return _buckets.get_or_create(key, create_bucket)
+
+
+class TokenBucket:
+    """A thread-safe token bucket whose rate adapts to throttling, with additive increase and multiplicative decrease.
+
+    The bucket holds up to one second worth of tokens. `acquire` takes a token, sleeping until one is available, so
+    that requests are spread at the current rate; waiting requests are served in the order they arrived.
+    """
+
+    def __init__(self, rate, min_rate=1):
+        """Initialize a full bucket allowing `rate` requests per second, never throttled below `min_rate`."""
+        self.max_rate = self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self._lock = threading.Lock()
+        self._tokens = self.rate
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take a token, waiting for the bucket to refill if it is empty."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def throttled(self):
+        """Halve the rate after the backend throttled a request, and drop the tokens left."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0)
+
+    def succeeded(self):
+        """Raise the rate back towards its configured value after a successful request."""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class SharedTokenBucket(TokenBucket):
+    """A token bucket shared by every process using the same Django cache, usually Redis.
+
+    Requests are counted in one-second windows in the shared cache, and throttling halves the shared rate for
+    `recovery` seconds. If the shared cache can't be reached, the bucket falls back to limiting the current process.
+    """
+
+    def __init__(self, key, rate, min_rate=1, alias="default", recovery=60):  # pylint: disable=too-many-arguments
+        """Initialize a bucket stored under `key` in the Django cache named `alias`."""
+        super().__init__(rate, min_rate=min_rate)
+        self.key = f"nautobot_secrets_providers:ratelimit:{key}"
+        self.alias = alias
+        self.recovery = recovery
+
+    @property
+    def cache(self):
+        """Return the Django cache holding the bucket."""
+        return caches[self.alias]
+
+    def acquire(self):
+        """Take a token from the shared budget, waiting for the next one-second window if it is exhausted."""
+        while True:
+            now = time.time()
+            window = int(now)
+            counter = f"{self.key}:{window}"
+            try:
+                rate = self.cache.get(f"{self.key}:rate") or self.max_rate
+                self.cache.add(counter, 0, timeout=2)
+                count = self.cache.incr(counter)
+            except ValueError:
+                # The counter expired between its creation and its increment.
+                continue
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.warning("Unable to use the shared rate limit, limiting this process only: %s", err)
+                super().acquire()
+                return
+            if count <= rate:
+                return
+            time.sleep(window + 1 - now)
+
+    def throttled(self):
+        """Halve the shared rate for `recovery` seconds after the backend throttled a request."""
+        super().throttled()
+        try:
+            rate = self.cache.get(f"{self.key}:rate") or self.max_rate
+            self.cache.set(f"{self.key}:rate", max(self.min_rate, rate / 2), timeout=self.recovery)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Unable to update the shared rate limit: %s", err)
@@ -0,0 +1,258 @@
+"""Shared helpers for the Secrets Providers."""
+
+import asyncio
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import threading
+
+__all__ = ("ClientCache", "EventLoopThread", "LazyModule", "SingleFlight", "copy_exception", "is_installed")
+
+
+def is_installed(name):
+    """Return True if the module `name` can be imported, without importing it.
+
+    Unlike `importlib.util.find_spec`, this doesn't import the parent packages of a submodule either, whose `__init__`
+    may import the whole SDK.
+    """
+    if name in sys.modules:
+        return True
+    top_level, *parts = name.split(".")
+    try:
+        spec = importlib.util.find_spec(top_level)
+    except (ImportError, ValueError):
+        return False
+    for part in parts:
+        if spec is None or spec.submodule_search_locations is None:
+            return False
+        spec = importlib.machinery.PathFinder.find_spec(part, spec.submodule_search_locations)
+    return spec is not None
+
+
+class LazyModule:
+    """A module imported on first attribute access, so that optional SDKs are only loaded once actually used.
+
+    Given several names, the first one installed is used, e.g. a renamed SDK and its legacy name. Whether any of them
+    is installed is known without importing it, from `is_installed`.
+    """
+
+    def __init__(self, *names):
+        """Initialize the proxy of the first installed of the modules `names`."""
+        self.__names = names
+        self.__module = None
+
+    @property
+    def is_installed(self):
+        """Return True if one of the modules is installed."""
+        return any(is_installed(name) for name in self.__names)
+
+    def __getattr__(self, attr):
+        """Import the module if needed and return its attribute `attr`."""
+        if self.__module is None:
+            for name in self.__names:
+                if is_installed(name):
+                    self.__module = importlib.import_module(name)
+                    break
+            else:
+                raise ImportError(f"No module named {self.__names[0]!r}")
+        return getattr(self.__module, attr)
+
+
+class ClientCache:
+    """A thread-safe, fork-aware cache of SDK clients.
+
+    Clients are stored under a hashable key (usually a tuple describing the backend they talk to) and created on first
+    use by the factory passed to `get_or_create`. Clients are created outside of the cache's lock, with concurrent
+    creations of the same client coalesced, so that a slow login to one backend doesn't hold up the others. The cache is
+    emptied in forked child processes so that a worker never reuses sockets, locks or credentials inherited from its
+    parent.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._creating = SingleFlight()
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get_or_create(self, key, factory):
+        """Return the client stored under `key`, calling `factory()` to create it if needed."""
+        try:
+            return self._clients[key]
+        except KeyError:
+            return self._creating.do(key, lambda: self._create(key, factory))
+
+    def _create(self, key, factory):
+        try:
+            return self._clients[key]
+        except KeyError:
+            client = factory()
+        with self._lock:
+            return self._clients.setdefault(key, client)
+
+    def get(self, key, default=None):
+        """Return the client stored under `key`, if any."""
+        return self._clients.get(key, default)
+
+    def pop(self, key, default=None):
+        """Remove and return the client stored under `key`."""
+        with self._lock:
+            return self._clients.pop(key, default)
+
+    def discard(self, key, client):
+        """Remove `client` from under `key`, unless it was already replaced by another client."""
+        with self._lock:
+            if self._clients.get(key) is client:
+                del self._clients[key]
+
+    def clear(self):
+        """Remove all cached clients."""
+        with self._lock:
+            self._clients.clear()
+
+    def __contains__(self, key):
+        """Return True if a client is cached under `key`."""
+        return key in self._clients
+
+    def __len__(self):
+        """Return the number of cached clients."""
+        return len(self._clients)
+
+
+class EventLoopThread:
+    """A long-lived asyncio event loop running in a daemon thread.
+
+    Synchronous code submits coroutines with `run`, and asynchronous code running on other loops awaits them with
+    `arun`, so that asynchronous SDK clients (and their connections) can be created once and shared by every lookup in
+    the process. The thread is started on first use and, like `ClientCache`, is discarded in forked child processes,
+    which start their own on demand.
+    """
+
+    def __init__(self, name):
+        """Initialize the (not yet started) loop thread with the given thread name."""
+        self.name = name
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    @property
+    def loop(self):
+        """Return the running event loop, starting its thread if needed."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_forever():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule `coro` on the loop, returning a `concurrent.futures.Future` of its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run `coro` on the loop and block until it returns, re-raising any exception it raised."""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(f"{self.name} can't wait on its own event loop")
+        return self.submit(coro).result(timeout)
+
+    async def arun(self, coro):
+        """Run `coro` on the loop and await its result from any event loop, without blocking that loop."""
+        if threading.current_thread() is self._thread:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+
+def copy_exception(error):
+    """Return a copy of `error`, so that threads sharing an exception each raise their own, with its own traceback.
+
+    The copy is made without calling the exception's `__init__`; `error` itself is returned if it can't be copied.
+    """
+    try:
+        copied = type(error).__new__(type(error), *error.args)
+        copied.__dict__.update(error.__dict__)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return error
+    copied.args = error.args
+    copied.__cause__ = error.__cause__
+    copied.__suppress_context__ = error.__suppress_context__
+    return copied
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single call.
+
+    The first thread calling `do` for a key runs the function; threads calling `do` with the same key while it runs
+    wait for it to finish and receive the same result, or a copy of the same exception. Nothing is remembered once the
+    call returns, so this complements rather than replaces caching.
+    """
+
+    class _Call:  # pylint: disable=too-few-public-methods
+        __slots__ = ("done", "error", "result")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.error = None
+            self.result = None
+
+    def __init__(self):
+        """Initialize without any call in flight."""
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, copy_error=copy_exception):
+        """Return the result of `func()`, sharing it with every concurrent call for the same `key`.
+
+        Waiting threads raise `copy_error(error)` when `func()` raised `error`.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise copy_error(call.error)
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def __len__(self):
+        """Return the number of calls in flight."""
+        return len(self._calls)
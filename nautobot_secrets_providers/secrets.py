@@ -3,22 +3,47 @@ Secrets Providers published by this module.
 
 The providers are conditionally loaded based on whether their dependent libraries are installed.
 Please see the README for how to install those.
+
+Setting `enabled_providers` in the app settings to a list of provider slugs restricts the providers published to these,
+and the modules of the other providers (and their dependent libraries) are then never imported.
 """
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
 from nautobot_secrets_providers import providers
 
-# Iterate over included secrets providers and only publish them if their `is_available` flag is True
-# (meaning their dependent library is installed).
-secrets_providers = []
 
-for provider_name in providers.__all__:
-    provider = getattr(providers, provider_name)  # pylint: disable=invalid-name
-    # Don't publish multiple times.
-    if provider in secrets_providers:
-        continue
+def get_secrets_providers():
+    """Return the providers to publish: those enabled in the app settings, if installed."""
+    enabled_providers = settings.PLUGINS_CONFIG.get("nautobot_secrets_providers", {}).get("enabled_providers")
+    if enabled_providers is not None:
+        unknown = sorted(set(enabled_providers) - set(providers.PROVIDERS))
+        if unknown:
+            raise ImproperlyConfigured(
+                f"Unknown secrets providers in the enabled_providers setting: {', '.join(unknown)}. "
+                f"Valid providers are: {', '.join(providers.PROVIDERS)}."
+            )
+
+    # Iterate over included secrets providers and only publish them if their `is_available` flag is True
+    # (meaning their dependent library is installed).
+    secrets_providers = []
+    for slug, (_, class_name) in providers.PROVIDERS.items():
+        # Don't even import the module of providers that aren't enabled.
+        if enabled_providers is not None and slug not in enabled_providers:
+            continue
+
+        provider = getattr(providers, class_name)
+        if provider.is_available:
+            secrets_providers.append(provider)
+        elif enabled_providers is not None:
+            raise ImproperlyConfigured(
+                f"The {slug} secrets provider is enabled but its dependencies aren't installed, see the README."
+            )
+    return secrets_providers
+
 
-    if provider.is_available:
-        secrets_providers.append(provider)
+secrets_providers = get_secrets_providers()
 
 if not secrets_providers:
     raise RuntimeError("No secrets providers were published! Did you remember install the dependencies?")
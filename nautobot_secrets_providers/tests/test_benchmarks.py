@@ -0,0 +1,31 @@
+"""Tests running the provider micro-benchmarks, so that they keep working as the providers change."""
+
+import importlib.util
+import io
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import skipUnless
+
+from django.test import TestCase, tag
+
+# The benchmarks are a development script, which isn't part of the installed package.
+BENCHMARK_SCRIPT = Path(__file__).resolve().parents[2] / "development" / "bin" / "benchmark_providers.py"
+
+
+@tag("unit")
+@skipUnless(BENCHMARK_SCRIPT.exists(), "The development scripts are not available")
+class BenchmarkTestCase(TestCase):
+    """Tests for development/bin/benchmark_providers.py."""
+
+    def setUp(self):
+        spec = importlib.util.spec_from_file_location("benchmark_providers", BENCHMARK_SCRIPT)
+        self.benchmarks = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.benchmarks)
+
+    def test_benchmarks(self):
+        """Every benchmark runs and reports its measurements."""
+        for name, benchmark in self.benchmarks.BENCHMARKS.items():
+            with self.subTest(benchmark=name):
+                with redirect_stdout(io.StringIO()) as output:
+                    benchmark(1)
+                self.assertIn("mean", output.getvalue())
@@ -0,0 +1,537 @@
+"""Unit tests for the caching of secret values."""
+
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import boto3
+from django.core.cache import caches
+from django.test import TestCase, tag
+from moto import mock_secretsmanager
+from nautobot.extras.models import Secret
+from nautobot.extras.secrets import exceptions
+from nautobot.extras.secrets.exceptions import SecretValueNotFoundError
+
+from nautobot_secrets_providers.metrics import metric_stale_values
+from nautobot_secrets_providers.providers import AWSSecretsManagerSecretsProvider, aws, cache
+from nautobot_secrets_providers.providers.utils import SingleFlight, copy_exception
+from nautobot_secrets_providers.tests.utils import StubProvider, stub_secret
+
+
+@tag("unit")
+class TTLCacheTestCase(TestCase):
+    """Tests for TTLCache."""
+
+    def test_expiry(self):
+        """Entries expire after their TTL, or never without one."""
+        ttl_cache = cache.TTLCache(max_entries=10)
+        with patch.object(cache.time, "monotonic", return_value=100):
+            ttl_cache.set("a", "value", ttl=10)
+            ttl_cache.set("b", None)
+            self.assertEqual(ttl_cache.get("a"), "value")
+            self.assertIsNone(ttl_cache.get("b"))
+        with patch.object(cache.time, "monotonic", return_value=110):
+            self.assertIs(ttl_cache.get("a"), cache.MISSING)
+            self.assertIsNone(ttl_cache.get("b"))
+
+    def test_stale(self):
+        """Entries set with a stale period are returned by get_stale until it has elapsed."""
+        ttl_cache = cache.TTLCache(max_entries=10)
+        with patch.object(cache.time, "monotonic", return_value=100):
+            ttl_cache.set("a", "value", ttl=10, stale=20)
+        with patch.object(cache.time, "monotonic", return_value=115):
+            self.assertIs(ttl_cache.get("a"), cache.MISSING)
+            self.assertIs(ttl_cache.get_stale("a", 5), cache.MISSING)
+            self.assertEqual(ttl_cache.get_stale("a", 10), "value")
+        with patch.object(cache.time, "monotonic", return_value=130):
+            self.assertIs(ttl_cache.get_stale("a", 60), cache.MISSING)
+        self.assertEqual(len(ttl_cache), 0)
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted once the cache is full."""
+        ttl_cache = cache.TTLCache(max_entries=2)
+        ttl_cache.set("a", 1)
+        ttl_cache.set("b", 2)
+        ttl_cache.get("a")
+        ttl_cache.set("c", 3)
+        self.assertEqual(len(ttl_cache), 2)
+        self.assertIs(ttl_cache.get("b"), cache.MISSING)
+        self.assertEqual(ttl_cache.get("a"), 1)
+        self.assertEqual(ttl_cache.get("c"), 3)
+
+
+@tag("unit")
+class CacheSecretValueTestCase(TestCase):
+    """Tests for the cache_secret_value decorator, using the AWS Secrets Manager provider."""
+
+    provider = AWSSecretsManagerSecretsProvider
+
+    plugins_config = {
+        "nautobot_secrets_providers": {
+            "cache": {
+                "enabled": True,
+                "ttl": 60,
+                "providers": {"aws-sm-parameter-store": {"enabled": False}},
+            },
+        },
+    }
+
+    def setUp(self):
+        cache.clear_cache()
+        aws._clients.clear()
+        self.secret = Secret.objects.create(
+            name="hello-aws",
+            provider=self.provider.slug,
+            parameters={"name": "hello", "region": "us-east-2", "key": "location"},
+        )
+
+    def test_get_cache_settings(self):
+        """Provider overrides take precedence over the global cache settings and the defaults."""
+        self.assertEqual(cache.get_cache_settings(), cache.DEFAULT_CACHE_SETTINGS)
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            self.assertEqual(
+                cache.get_cache_settings("aws-secrets-manager"),
+                {**cache.DEFAULT_CACHE_SETTINGS, "enabled": True, "ttl": 60},
+            )
+            self.assertEqual(
+                cache.get_cache_settings("aws-sm-parameter-store"),
+                {**cache.DEFAULT_CACHE_SETTINGS, "enabled": False, "ttl": 60},
+            )
+
+    @mock_secretsmanager
+    def test_disabled_by_default(self):
+        """Without configuration every lookup reaches the backend."""
+        conn = boto3.client("secretsmanager", region_name="us-east-2")
+        conn.create_secret(Name="hello", SecretString='{"location":"world"}')
+        self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+
+        conn.put_secret_value(SecretId="hello", SecretString='{"location":"moon"}')
+        self.assertEqual(self.provider.get_value_for_secret(self.secret), "moon")
+
+    @mock_secretsmanager
+    def test_cached_until_expiry(self):
+        """Values are served from the cache until their TTL has elapsed."""
+        conn = boto3.client("secretsmanager", region_name="us-east-2")
+        conn.create_secret(Name="hello", SecretString='{"location":"world"}')
+
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            with patch.object(cache.time, "monotonic", return_value=100):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+                conn.put_secret_value(SecretId="hello", SecretString='{"location":"moon"}')
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+
+                # Different rendered parameters are cached separately.
+                self.secret.parameters["key"] = "bogus"
+                with self.assertRaises(Exception):
+                    self.provider.get_value_for_secret(self.secret)
+                self.secret.parameters["key"] = "location"
+
+            with patch.object(cache.time, "monotonic", return_value=160):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "moon")
+
+
+@tag("unit")
+class NegativeCachingTestCase(TestCase):
+    """Tests for the caching of lookups failing because the secret doesn't exist or its parameters are invalid."""
+
+    class Provider(StubProvider):  # pylint: disable=too-few-public-methods
+        """A provider caching its lookups."""
+
+        slug = "failing-provider"
+
+        @classmethod
+        @cache.cache_secret_value
+        def get_value_for_secret(cls, secret, obj=None, **kwargs):
+            """Look the secret up."""
+            return cls.get_value(secret, obj)
+
+        @classmethod
+        @cache.cache_secret_values
+        def get_values_for_secrets(cls, requests):
+            """Look the secrets up one by one."""
+            values, errors = {}, {}
+            for index, (secret, obj) in enumerate(requests):
+                try:
+                    values[index] = cls.get_value(secret, obj)
+                except exceptions.SecretError as err:
+                    errors[index] = err
+            return values, errors
+
+    def setUp(self):
+        cache.clear_cache()
+        self.Provider.calls = 0
+
+    def test_errors_are_cached(self):
+        """Not found and parameters errors are cached for their own TTL, other errors aren't cached."""
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "cache": {"enabled": True, "not_found_ttl": 10, "parameters_error_ttl": 100},
+            },
+        }
+        secrets = {
+            name: stub_secret(error=name)
+            for name in ("SecretValueNotFoundError", "SecretParametersError", "SecretProviderError")
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            for now, expected_calls in ((100, 3), (105, 4), (115, 6), (205, 9)):
+                with patch.object(cache.time, "monotonic", return_value=now):
+                    for name, secret in secrets.items():
+                        with self.assertRaises(getattr(exceptions, name)) as err:
+                            self.Provider.get_value_for_secret(secret)
+                        # Cached errors are raised anew, for the secret being looked up.
+                        self.assertIs(err.exception.secret, secret)
+                self.assertEqual(self.Provider.calls, expected_calls)
+
+            # Batch lookups use and fill the same cache.
+            with patch.object(cache.time, "monotonic", return_value=205):
+                values, errors = self.Provider.get_values_for_secrets(
+                    [
+                        (secrets["SecretValueNotFoundError"], None),
+                        (stub_secret(error="SecretParametersError", n=1), None),
+                    ]
+                )
+                self.assertEqual(values, {})
+                self.assertIsInstance(errors[0], exceptions.SecretValueNotFoundError)
+                self.assertIsInstance(errors[1], exceptions.SecretParametersError)
+                self.assertEqual(self.Provider.calls, 10)
+                with self.assertRaises(exceptions.SecretParametersError):
+                    self.Provider.get_value_for_secret(stub_secret(error="SecretParametersError", n=1))
+                self.assertEqual(self.Provider.calls, 10)
+
+    def test_disabled(self):
+        """Errors aren't cached with caching disabled, or with a TTL of 0."""
+        secret = stub_secret(error="SecretValueNotFoundError")
+        for cache_settings in ({"enabled": False}, {"enabled": True, "not_found_ttl": 0}):
+            with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"cache": cache_settings}}):
+                for _ in range(2):
+                    with self.assertRaises(exceptions.SecretValueNotFoundError):
+                        self.Provider.get_value_for_secret(secret)
+        self.assertEqual(self.Provider.calls, 4)
+
+
+@tag("unit")
+class StaleValuesTestCase(TestCase):
+    """Tests for serving expired values while they are refreshed, or when the backend fails."""
+
+    class Provider(StubProvider):  # pylint: disable=too-few-public-methods
+        """A provider caching its lookups, signalling each of them."""
+
+        slug = "stale-provider"
+        refreshed = threading.Event()
+
+        @classmethod
+        @cache.cache_secret_value
+        def get_value_for_secret(cls, secret, obj=None, **kwargs):
+            """Look the secret up."""
+            try:
+                return cls.get_value(secret, obj)
+            finally:
+                cls.refreshed.set()
+
+    def setUp(self):
+        cache.clear_cache()
+        cache._stale_counts.clear()  # pylint: disable=protected-access
+        self.Provider.value = "old"
+        self.Provider.error = None
+        self.Provider.calls = 0
+        self.secret = stub_secret(name="hello")
+
+    def lookup(self, now):
+        """Look the secret up at the given monotonic time."""
+        with patch.object(cache.time, "monotonic", return_value=now):
+            return self.Provider.get_value_for_secret(self.secret)
+
+    def test_stale_while_revalidate(self):
+        """An expired value is returned while it is refreshed in the background, within the stale period."""
+        plugins_config = {
+            "nautobot_secrets_providers": {"cache": {"enabled": True, "ttl": 10, "stale_while_revalidate": 30}},
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(self.lookup(100), "old")
+            self.Provider.value = "new"
+            self.Provider.refreshed.clear()
+            with patch.object(cache.time, "monotonic", return_value=115):
+                self.assertEqual(self.Provider.get_value_for_secret(self.secret), "old")
+                self.assertTrue(self.Provider.refreshed.wait(5))
+                for _ in range(50):
+                    if not cache._refreshing:  # pylint: disable=protected-access
+                        break
+                    time.sleep(0.01)
+            self.assertEqual(self.Provider.calls, 2)
+            self.assertEqual(self.lookup(116), "new")
+            self.assertEqual(self.Provider.calls, 2)
+
+            # Past the stale period, the lookup waits for the backend.
+            self.Provider.value = "newer"
+            self.assertEqual(self.lookup(200), "newer")
+            self.assertEqual(self.Provider.calls, 3)
+        self.assertEqual(cache.get_stale_counts(), {("stale-provider", "revalidate"): 1})
+
+    def test_refreshes_are_bounded(self):
+        """Refreshes beyond what the refresh threads can keep up with are dropped."""
+        release = threading.Event()
+        fetched = []
+
+        def fetch(index):
+            release.wait(5)
+            fetched.append(index)
+
+        with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"batch_max_workers": 1}}):
+            for index in range(cache.REFRESH_QUEUE_FACTOR + 2):
+                cache.refresh_in_background(("stale-provider", index), functools.partial(fetch, index))
+        self.assertEqual(len(cache._refreshing), cache.REFRESH_QUEUE_FACTOR)  # pylint: disable=protected-access
+        release.set()
+        for _ in range(100):
+            if not cache._refreshing:  # pylint: disable=protected-access
+                break
+            time.sleep(0.01)
+        self.assertEqual(sorted(fetched), list(range(cache.REFRESH_QUEUE_FACTOR)))
+
+    def test_stale_if_error(self):
+        """An expired value is returned when the backend fails, within the stale period, unless the secret is gone."""
+        plugins_config = {"nautobot_secrets_providers": {"cache": {"enabled": True, "ttl": 10, "stale_if_error": 60}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(self.lookup(100), "old")
+            self.Provider.error = exceptions.SecretProviderError
+            with self.assertLogs(cache.logger, "WARNING"):
+                self.assertEqual(self.lookup(120), "old")
+            with self.assertRaises(exceptions.SecretProviderError):
+                self.lookup(200)
+
+            self.Provider.error = exceptions.SecretValueNotFoundError
+            with self.assertRaises(exceptions.SecretValueNotFoundError):
+                self.lookup(130)
+        self.assertEqual(cache.get_stale_counts(), {("stale-provider", "error"): 1})
+
+        metric = next(metric_stale_values())
+        self.assertEqual(
+            [(sample.name, sample.labels, sample.value) for sample in metric.samples],
+            [("nautobot_secrets_providers_stale_values_total", {"provider": "stale-provider", "reason": "error"}, 1)],
+        )
+
+    def test_disabled_by_default(self):
+        """Expired values are never served without a stale period."""
+        with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"cache": {"enabled": True, "ttl": 10}}}):
+            self.assertEqual(self.lookup(100), "old")
+            self.Provider.error = exceptions.SecretProviderError
+            with self.assertRaises(exceptions.SecretProviderError):
+                self.lookup(111)
+        self.assertEqual(cache.get_stale_counts(), {})
+
+
+@tag("unit")
+class SharedCacheTestCase(TestCase):
+    """Tests for the encrypted cache shared by all processes."""
+
+    def setUp(self):
+        self.shared_cache = cache.SharedCache()
+        self.key = ("test-provider", (("name", "hello"),))
+        self.addCleanup(self.shared_cache.pop, self.key)
+
+    def test_entries_are_encrypted(self):
+        """Neither the key nor the value are stored in plaintext."""
+        self.shared_cache.set(self.key, "hunter2", ttl=60)
+        stored_key = self.shared_cache.make_key(self.key)
+        self.assertNotIn("hello", stored_key)
+        self.assertNotIn(b"hunter2", caches["default"].get(stored_key))
+        self.assertEqual(self.shared_cache.get(self.key), "hunter2")
+
+        # Entries encrypted with another key are ignored.
+        self.assertIs(cache.SharedCache(encryption_key="another key").get(self.key), cache.MISSING)
+
+    def test_expiry(self):
+        """The remaining TTL is returned along with the value, and expired entries are ignored."""
+        with patch.object(cache.time, "time", return_value=1000):
+            self.shared_cache.set(self.key, "hunter2", ttl=60)
+        with patch.object(cache.time, "time", return_value=1045):
+            self.assertEqual(self.shared_cache.get_entry(self.key), ("hunter2", 15))
+        with patch.object(cache.time, "time", return_value=1060):
+            self.assertIsNone(self.shared_cache.get_entry(self.key))
+
+    def test_backend_errors_are_cache_misses(self):
+        """An unavailable cache backend doesn't prevent lookups."""
+        with patch.object(cache, "caches", {"default": Mock(**{"get.side_effect": ConnectionError})}):
+            self.assertIs(self.shared_cache.get(self.key), cache.MISSING)
+        with patch.object(cache, "caches", {"default": Mock(**{"set.side_effect": ConnectionError})}):
+            self.shared_cache.set(self.key, "hunter2", ttl=60)
+
+
+@tag("unit")
+class TieredCacheTestCase(TestCase):
+    """Tests for sharing secret values between processes through the shared cache tier."""
+
+    provider = AWSSecretsManagerSecretsProvider
+
+    plugins_config = {"nautobot_secrets_providers": {"cache": {"enabled": True, "ttl": 60, "shared": True}}}
+
+    def setUp(self):
+        cache.clear_cache()
+        aws._clients.clear()
+        self.secret = Secret.objects.create(
+            name="hello-aws",
+            provider=self.provider.slug,
+            parameters={"name": "hello", "region": "us-east-2", "key": "location"},
+        )
+        key = cache.get_cache_key(self.provider.slug, self.secret.rendered_parameters())
+        self.addCleanup(cache.SharedCache().pop, key)
+
+    @mock_secretsmanager
+    def test_shared_between_processes(self):
+        """A value cached by one process is served to another from the shared cache."""
+        conn = boto3.client("secretsmanager", region_name="us-east-2")
+        conn.create_secret(Name="hello", SecretString='{"location":"world"}')
+
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            conn.put_secret_value(SecretId="hello", SecretString='{"location":"moon"}')
+
+            # Emulate another process, which has an empty in-process cache.
+            cache.clear_cache()
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            self.assertEqual(len(cache.get_value_cache()), 1)
+
+        # Without `shared`, the shared cache is ignored.
+        with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"cache": {"enabled": True}}}):
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "moon")
+
+
+class SlowProvider(StubProvider):  # pylint: disable=too-few-public-methods
+    """A provider whose lookups block until released."""
+
+    slug = "slow-provider"
+    entered = threading.Event()
+    release = threading.Event()
+
+    @classmethod
+    @cache.cache_secret_value
+    def get_value_for_secret(cls, secret, obj=None, **kwargs):
+        """Look the secret up once released."""
+        cls.entered.set()
+        cls.release.wait(5)
+        return cls.get_value(secret, obj)
+
+
+@tag("unit")
+class CoalescingTestCase(TestCase):
+    """Tests for coalescing concurrent lookups of the same secret."""
+
+    def setUp(self):
+        cache.clear_cache()
+        SlowProvider.calls = 0
+        SlowProvider.entered.clear()
+        SlowProvider.release.clear()
+
+    def lookup_concurrently(self, secret, count=5):
+        """Look `secret` (or each of a list of secrets) up from `count` threads at once and return their futures."""
+        secrets = secret if isinstance(secret, list) else [secret] * count
+        with ThreadPoolExecutor(max_workers=len(secrets)) as executor:
+            futures = [executor.submit(SlowProvider.get_value_for_secret, secrets[0])]
+            SlowProvider.entered.wait(5)
+            futures += [executor.submit(SlowProvider.get_value_for_secret, secret) for secret in secrets[1:]]
+            # Give the followers time to join the lookup in flight before it completes.
+            time.sleep(0.1)
+            SlowProvider.release.set()
+        return futures
+
+    def test_single_flight(self):
+        """SingleFlight shares the result of a call with concurrent calls, but not with later ones."""
+        single_flight = SingleFlight()
+        self.assertEqual(single_flight.do("key", lambda: 1), 1)
+        self.assertEqual(single_flight.do("key", lambda: 2), 2)
+        self.assertEqual(len(single_flight), 0)
+
+    def test_concurrent_lookups_are_coalesced(self):
+        """Concurrent lookups share a single backend request, without caching enabled."""
+        futures = self.lookup_concurrently(stub_secret(value="hunter2"))
+        self.assertEqual([future.result() for future in futures], ["hunter2"] * 5)
+        self.assertEqual(SlowProvider.calls, 1)
+
+        # Nothing is cached.
+        self.assertEqual(SlowProvider.get_value_for_secret(stub_secret(value="hunter2")), "hunter2")
+        self.assertEqual(SlowProvider.calls, 2)
+
+    def test_exceptions_are_shared(self):
+        """Concurrent lookups share the exception raised by the backend request, each raising it for its own secret."""
+        secrets = [stub_secret(error="SecretValueNotFoundError") for _ in range(5)]
+        futures = self.lookup_concurrently(secrets)
+        errors = [future.exception() for future in futures]
+        for secret, error in zip(secrets, errors):
+            self.assertIsInstance(error, SecretValueNotFoundError)
+            self.assertIs(error.secret, secret)
+        self.assertEqual(len({id(error) for error in errors}), 5)
+        self.assertEqual(SlowProvider.calls, 1)
+
+        # Other exceptions are copied.
+        error = ValueError("Failed")
+        error.detail = "detail"
+        copied = copy_exception(error)
+        self.assertIsNot(copied, error)
+        self.assertIsInstance(copied, ValueError)
+        self.assertEqual((copied.args, copied.detail), (("Failed",), "detail"))
+
+    def test_coalescing_disabled(self):
+        """Every lookup reaches the backend with `coalesce` disabled."""
+        with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"cache": {"coalesce": False}}}):
+            futures = self.lookup_concurrently(stub_secret(value="hunter2"), count=3)
+        self.assertEqual([future.result() for future in futures], ["hunter2"] * 3)
+        self.assertEqual(SlowProvider.calls, 3)
+
+    def test_coalesced_across_processes(self):
+        """A process waiting for the shared lock uses the value cached by the process holding it."""
+        secret = stub_secret(value="hunter2")
+        key = cache.get_cache_key(SlowProvider.slug, secret.parameters)
+        shared_cache = cache.SharedCache()
+        self.addCleanup(shared_cache.pop, key)
+
+        def acquire():
+            # Emulate another process caching the value while this one waits for the lock.
+            shared_cache.set(key, "from another process", ttl=60)
+            return True
+
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "cache": {"enabled": True, "shared": True, "coalesce_across_processes": True},
+            },
+        }
+        lock = Mock(**{"acquire.side_effect": acquire})
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(caches["default"], "lock", return_value=lock, create=True) as lock_factory:
+                self.assertEqual(SlowProvider.get_value_for_secret(secret), "from another process")
+        lock_factory.assert_called_once_with(f"{shared_cache.make_key(key)}:lock", timeout=10, blocking_timeout=10)
+        lock.release.assert_called_once()
+        self.assertEqual(SlowProvider.calls, 0)
+
+
+@tag("unit")
+class CacheSecretValuesTestCase(TestCase):
+    """Tests for the cache_secret_values decorator."""
+
+    class Provider(StubProvider):  # pylint: disable=too-few-public-methods
+        """A provider caching its batch lookups, recording the requests it is passed."""
+
+        slug = "batch-provider"
+        batches = []
+
+        @classmethod
+        @cache.cache_secret_values
+        def get_values_for_secrets(cls, requests):
+            """Look the secrets up in a single batch."""
+            cls.batches.append([secret.parameters["value"] for secret, _ in requests])
+            return super().get_values_for_secrets(requests)
+
+    def setUp(self):
+        cache.clear_cache()
+        self.Provider.batches = []
+
+    def test_only_misses_are_requested(self):
+        """Cached values are returned without being requested again."""
+        secrets = [stub_secret(value=value) for value in ("a", "b", "c")]
+        with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"cache": {"enabled": True}}}):
+            self.assertEqual(self.Provider.get_values_for_secrets([(secrets[1], None)]), ({0: "b"}, {}))
+            self.assertEqual(
+                self.Provider.get_values_for_secrets([(secret, None) for secret in secrets]),
+                ({0: "a", 1: "b", 2: "c"}, {}),
+            )
+        self.assertEqual(self.Provider.batches, [["b"], ["a", "c"]])
@@ -0,0 +1,157 @@
+"""Tests for the circuit breakers failing lookups fast while a secrets backend is unavailable."""
+
+from unittest.mock import patch
+
+from django.test import TestCase, tag
+from nautobot.extras.secrets import exceptions
+
+from nautobot_secrets_providers.providers import (
+    AWSSecretsManagerSecretsProvider,
+    HashiCorpVaultSecretsProvider,
+    circuitbreaker,
+)
+from nautobot_secrets_providers.tests.utils import StubProvider, stub_secret
+
+
+class Provider(StubProvider):  # pylint: disable=too-few-public-methods
+    """A provider whose lookups go through the breaker of the secret's backend."""
+
+    @classmethod
+    @circuitbreaker.circuit_breaker
+    def get_value_for_secret(cls, secret, obj=None, **kwargs):
+        """Look the secret up."""
+        return cls.get_value(secret, obj)
+
+
+@tag("unit")
+class CircuitBreakerTestCase(TestCase):
+    """Tests for the circuit_breaker decorator."""
+
+    plugins_config = {
+        "nautobot_secrets_providers": {
+            "circuit_breaker": {"enabled": True, "failure_threshold": 3, "recovery_timeout": 30},
+        },
+    }
+
+    def setUp(self):
+        circuitbreaker._breakers.clear()  # pylint: disable=protected-access
+        Provider.error = None
+        Provider.calls = 0
+        self.secret = stub_secret(backend="a", value="hunter2")
+
+    def lookup(self, now, secret=None):
+        """Look the secret up at the given monotonic time."""
+        with patch.object(circuitbreaker.time, "monotonic", return_value=now):
+            return Provider.get_value_for_secret(secret or self.secret)
+
+    def open_breaker(self):
+        """Fail lookups of backend a until its breaker opens, at time 100."""
+        Provider.error = exceptions.SecretProviderError
+        with self.assertLogs(circuitbreaker.logger, "WARNING"):
+            for _ in range(3):
+                with self.assertRaises(exceptions.SecretProviderError):
+                    self.lookup(100)
+        self.assertEqual(Provider.calls, 3)
+
+    def test_opens_after_failures(self):
+        """The breaker opens after consecutive failures, then fails fast without reaching the backend."""
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            self.open_breaker()
+            with self.assertRaisesRegex(exceptions.SecretProviderError, "backend a is unavailable.* 20 seconds"):
+                self.lookup(110)
+            self.assertEqual(Provider.calls, 3)
+
+            # Other backends have their own breaker.
+            Provider.error = None
+            self.assertEqual(self.lookup(110, stub_secret(backend="b", value="hunter2")), "hunter2")
+            self.assertEqual(Provider.calls, 4)
+            with self.assertRaisesRegex(exceptions.SecretProviderError, "backend a is unavailable"):
+                self.lookup(110)
+            self.assertEqual(Provider.calls, 4)
+
+    def test_successes_reset_failures(self):
+        """Only consecutive failures open the breaker, and secrets not found are not failures."""
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            for error in (exceptions.SecretProviderError, exceptions.SecretValueNotFoundError) * 3:
+                Provider.error = error
+                with self.assertRaises(error):
+                    self.lookup(100)
+            Provider.error = None
+            self.assertEqual(self.lookup(100), "hunter2")
+            self.assertEqual(Provider.calls, 7)
+
+    def test_half_open(self):
+        """After the recovery timeout, a single probe is let through, closing the breaker or opening it again."""
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            self.open_breaker()
+            with self.assertLogs(circuitbreaker.logger, "WARNING"):
+                with self.assertRaisesRegex(exceptions.SecretProviderError, "Failed"):
+                    self.lookup(130)
+            self.assertEqual(Provider.calls, 4)
+            with self.assertRaisesRegex(exceptions.SecretProviderError, "unavailable"):
+                self.lookup(131)
+            self.assertEqual(Provider.calls, 4)
+
+            Provider.error = None
+            self.assertEqual(self.lookup(160), "hunter2")
+            self.assertEqual(self.lookup(160), "hunter2")
+            self.assertEqual(Provider.calls, 6)
+
+    def test_single_probe(self):
+        """A half-open breaker lets a single call through until its outcome is recorded."""
+        breaker = circuitbreaker.CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        with patch.object(circuitbreaker.time, "monotonic", return_value=100):
+            self.assertTrue(breaker.failed())
+            self.assertFalse(breaker.allow())
+        with patch.object(circuitbreaker.time, "monotonic", return_value=130):
+            self.assertTrue(breaker.allow())
+            self.assertEqual(breaker.state, breaker.HALF_OPEN)
+            self.assertFalse(breaker.allow())
+            breaker.succeeded()
+            self.assertTrue(breaker.allow())
+            self.assertTrue(breaker.allow())
+
+    def test_latency_threshold(self):
+        """Lookups slower than the latency threshold count as failures."""
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "circuit_breaker": {"enabled": True, "failure_threshold": 2, "latency_threshold": 5},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(circuitbreaker.time, "monotonic", side_effect=[100, 101, 200, 210]):
+                self.assertEqual(Provider.get_value_for_secret(self.secret), "hunter2")
+                self.assertEqual(Provider.get_value_for_secret(self.secret), "hunter2")
+            with patch.object(circuitbreaker.time, "monotonic", side_effect=[300, 310, 310]), self.assertLogs(
+                circuitbreaker.logger, "WARNING"
+            ):
+                self.assertEqual(Provider.get_value_for_secret(self.secret), "hunter2")
+            with self.assertRaisesRegex(exceptions.SecretProviderError, "unavailable"):
+                self.lookup(311)
+            self.assertEqual(Provider.calls, 3)
+
+    def test_disabled(self):
+        """Breakers are disabled by default, and can be disabled per provider."""
+        Provider.error = exceptions.SecretProviderError
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "circuit_breaker": {"enabled": True, "providers": {"stub-provider": {"enabled": False}}},
+            },
+        }
+        for config in ({}, plugins_config):
+            with self.settings(PLUGINS_CONFIG=config):
+                for _ in range(10):
+                    with self.assertRaisesRegex(exceptions.SecretProviderError, "Failed"):
+                        self.lookup(100)
+        self.assertEqual(Provider.calls, 20)
+        self.assertEqual(len(circuitbreaker._breakers), 0)  # pylint: disable=protected-access
+
+    def test_circuit_keys(self):
+        """Providers key their breakers on the backend of the secret."""
+        self.assertEqual(
+            AWSSecretsManagerSecretsProvider.get_circuit_key({"name": "hello", "region": "eu-west-3"}),
+            ("secretsmanager", "eu-west-3"),
+        )
+        self.assertEqual(
+            HashiCorpVaultSecretsProvider.get_circuit_key({"path": "hello"}), ("hashicorp-vault", "default")
+        )
@@ -0,0 +1,101 @@
+"""Tests for the parsing and validation of the providers configuration."""
+
+import dataclasses
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, tag
+
+from nautobot_secrets_providers.providers import (
+    AWSSecretsManagerSecretsProvider,
+    AzureKeyVaultSecretsProvider,
+    DelineaSecretServerSecretsProviderId,
+    HashiCorpVaultSecretsProvider,
+    OnePasswordSecretsProvider,
+)
+from nautobot_secrets_providers.providers.config import get_provider_config, load_provider_configs
+
+PROVIDERS = (
+    AWSSecretsManagerSecretsProvider,
+    AzureKeyVaultSecretsProvider,
+    DelineaSecretServerSecretsProviderId,
+    HashiCorpVaultSecretsProvider,
+    OnePasswordSecretsProvider,
+)
+
+
+@tag("unit")
+class ProviderConfigTestCase(TestCase):
+    """Tests for get_provider_config and load_provider_configs."""
+
+    def test_parsed_once(self):
+        """The configuration is parsed on first use, then again only once the settings are changed."""
+        config = get_provider_config(HashiCorpVaultSecretsProvider)
+        self.assertIs(get_provider_config(HashiCorpVaultSecretsProvider), config)
+        self.assertEqual(config.get("default").url, "http://localhost:8200")
+        self.assertIsNone(get_provider_config(AWSSecretsManagerSecretsProvider))
+
+        plugins_config = {"nautobot_secrets_providers": {"hashicorp_vault": {"url": "http://vault", "token": "abc"}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(get_provider_config(HashiCorpVaultSecretsProvider).get("default").url, "http://vault")
+
+    def test_immutable(self):
+        """Configuration objects can't be modified."""
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "hashicorp_vault": {"vaults": {"example": {"url": "http://vault", "token": "abc"}}},
+                "one_password": {"token": "abc", "vaults": {"example": {}}},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            vaults = get_provider_config(HashiCorpVaultSecretsProvider)
+            one_password = get_provider_config(OnePasswordSecretsProvider)
+        for config, field in ((vaults, "multiple"), (vaults.get("example"), "url"), (one_password, "token")):
+            self.assertFalse(hasattr(config, "__dict__"))
+            with self.assertRaises(dataclasses.FrozenInstanceError):
+                setattr(config, field, None)
+        with self.assertRaises(TypeError):
+            vaults.get("example").settings["url"] = "http://changed"
+        with self.assertRaises(TypeError):
+            one_password.vaults["other"] = "abc"
+
+    def test_load_provider_configs(self):
+        """Valid or missing configuration passes, while all the errors of invalid configuration are reported."""
+        load_provider_configs(PROVIDERS)
+
+        with self.settings(PLUGINS_CONFIG={"nautobot_secrets_providers": {"delinea": {"base_url": None}}}):
+            load_provider_configs(PROVIDERS)
+
+        # As in the development configuration, without credentials or vaults.
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "delinea": {"base_url": "https://delinea", "password": "", "token": "", "username": ""},
+                "one_password": {"vaults": {}, "token": None},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            load_provider_configs(PROVIDERS)
+            self.assertIsNone(get_provider_config(DelineaSecretServerSecretsProviderId))
+            self.assertIsNone(get_provider_config(OnePasswordSecretsProvider))
+
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "azure_key_vault": {"credential": "bogus"},
+                "delinea": {"base_url": "https://delinea", "cloud_based": True, "token": "abc"},
+                "hashicorp_vault": {
+                    "vaults": {
+                        "valid": {"url": "http://vault", "token": "abc"},
+                        "example": {"url": "http://vault", "auth_method": "approle"},
+                    },
+                },
+                "one_password": {"vaults": {"example": {}}},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with self.assertRaises(ImproperlyConfigured) as err:
+                load_provider_configs(PROVIDERS)
+        message = str(err.exception)
+        self.assertIn("Azure Key Vault: Azure Key Vault credential bogus is invalid!", message)
+        self.assertIn("Delinea Secret Server Cloud configuration is missing a tenant!", message)
+        self.assertIn("example: HashiCorp Vault configuration is missing a role_id and/or secret_id!", message)
+        self.assertNotIn("valid:", message)
+        self.assertIn("1Password token is not configured for vault example!", message)
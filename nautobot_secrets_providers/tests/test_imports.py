@@ -0,0 +1,120 @@
+"""Tests for the deferred import of the providers and their SDKs."""
+
+import json
+import subprocess
+import sys
+import textwrap
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, tag
+
+from nautobot_secrets_providers import providers, secrets
+from nautobot_secrets_providers.providers.utils import LazyModule, is_installed
+
+# Top-level packages of the SDKs used by the providers.
+SDK_PACKAGES = ("azure", "boto3", "botocore", "delinea", "hvac", "onepassword", "thycotic")
+
+
+@tag("unit")
+class ImportTestCase(TestCase):
+    """Tests for the import of the providers."""
+
+    def start_nautobot(self, code, plugin_settings=None):
+        """Start Nautobot in a new process with the given app settings, run `code` and return what it printed as JSON.
+
+        Tests importing modules must run in another process, as the test runner has already imported everything.
+        """
+        script = textwrap.dedent(
+            f"""
+            import json
+            import sys
+
+            import nautobot
+            from nautobot.core.cli import load_settings
+
+            load_settings({sys.modules["nautobot_config"].__file__!r})
+            import nautobot_config
+
+            nautobot_config.PLUGINS_CONFIG["nautobot_secrets_providers"].update({plugin_settings or {}!r})
+            nautobot.setup()
+            """
+        )
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", script + textwrap.dedent(code)], capture_output=True, check=True, text=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_sdks_not_imported_at_startup(self):
+        """Starting Nautobot and checking the availability of the providers doesn't import any SDK."""
+        output = self.start_nautobot(
+            f"""
+            from nautobot_secrets_providers import providers
+
+            available = {{name: getattr(providers, name).is_available for name in providers.__all__}}
+            imported = sorted({{name.split(".")[0] for name in sys.modules}} & set({SDK_PACKAGES!r}))
+            print(json.dumps({{"available": available, "imported": imported}}))
+            """
+        )
+        self.assertEqual(output["imported"], [])
+        self.assertTrue(output["available"]["HashiCorpVaultSecretsProvider"])
+
+    def test_enabled_providers(self):
+        """Only the modules of the enabled providers are imported and their providers published."""
+        output = self.start_nautobot(
+            """
+            from nautobot.extras.registry import registry
+
+            published = sorted(registry["secrets_providers"])
+            imported = sorted(name for name in sys.modules if name.startswith("nautobot_secrets_providers.providers."))
+            print(json.dumps({"published": published, "imported": imported}))
+            """,
+            plugin_settings={"enabled_providers": ["hashicorp-vault"]},
+        )
+        self.assertIn("hashicorp-vault", output["published"])
+        self.assertNotIn("aws-secrets-manager", output["published"])
+        self.assertIn("nautobot_secrets_providers.providers.hashicorp", output["imported"])
+        for module_name in ("aws", "azure", "delinea", "one_password"):
+            self.assertNotIn(f"nautobot_secrets_providers.providers.{module_name}", output["imported"])
+
+    def test_get_secrets_providers(self):
+        """The enabled providers are validated."""
+        self.assertEqual(len(secrets.get_secrets_providers()), len(providers.PROVIDERS))
+        for slug, (_, class_name) in providers.PROVIDERS.items():
+            self.assertEqual(getattr(providers, class_name).slug, slug)
+
+        plugins_config = {"nautobot_secrets_providers": {"enabled_providers": ["one-password", "azure-key-vault"]}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(
+                secrets.get_secrets_providers(),
+                [providers.AzureKeyVaultSecretsProvider, providers.OnePasswordSecretsProvider],
+            )
+
+        plugins_config = {"nautobot_secrets_providers": {"enabled_providers": ["hashicorp-vault", "bogus"]}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with self.assertRaisesRegex(ImproperlyConfigured, "Unknown secrets providers .*: bogus"):
+                secrets.get_secrets_providers()
+
+        plugins_config = {"nautobot_secrets_providers": {"enabled_providers": ["hashicorp-vault"]}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(providers.HashiCorpVaultSecretsProvider, "is_available", False):
+                with self.assertRaisesRegex(ImproperlyConfigured, "dependencies aren't installed"):
+                    secrets.get_secrets_providers()
+
+    def test_is_installed(self):
+        """Modules are found without importing them or their parent packages."""
+        self.assertTrue(is_installed("json"))
+        self.assertTrue(is_installed("azure.keyvault.secrets"))
+        self.assertFalse(is_installed("nonexistent"))
+        self.assertFalse(is_installed("json.nonexistent"))
+
+    def test_lazy_module(self):
+        """The first installed module is imported on first attribute access."""
+        module = LazyModule("nonexistent", "json")
+        self.assertTrue(module.is_installed)
+        self.assertIs(module.loads, json.loads)
+
+        module = LazyModule("nonexistent")
+        self.assertFalse(module.is_installed)
+        with self.assertRaises(ImportError):
+            module.loads  # noqa: B018  # pylint: disable=pointless-statement
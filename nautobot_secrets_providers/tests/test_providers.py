@@ -1,27 +1,58 @@
 """Unit tests for Secrets Providers."""
 
+import asyncio
+import datetime
+import ipaddress
+import json
 import os
-from unittest.mock import mock_open, patch
+import re
+import ssl
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import ANY, AsyncMock, Mock, mock_open, patch
 
 import boto3
 import requests_mock
+from botocore.exceptions import ClientError
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, tag
 from hvac import Client as HVACClient
 from moto import mock_secretsmanager, mock_ssm
-from nautobot.extras.models import Secret
+from nautobot.extras.choices import SecretsGroupAccessTypeChoices, SecretsGroupSecretTypeChoices
+from nautobot.extras.models import Secret, SecretsGroup, SecretsGroupAssociation
 from nautobot.extras.secrets import exceptions
 
 from nautobot_secrets_providers.providers import (
     AWSSecretsManagerSecretsProvider,
     AWSSystemsManagerParameterStore,
+    AzureKeyVaultSecretsProvider,
+    DelineaSecretServerSecretsProviderId,
+    DelineaSecretServerSecretsProviderPath,
     HashiCorpVaultSecretsProvider,
     OnePasswordSecretsProvider,
+    aws,
+    azure,
+    cache,
+    circuitbreaker,
+    delinea,
+    hashicorp,
+    one_password,
+    ratelimit,
 )
 from nautobot_secrets_providers.providers.choices import HashicorpKVVersionChoices
 from nautobot_secrets_providers.providers.hashicorp import vault_choices
 from nautobot_secrets_providers.providers.one_password import vault_choices as one_password_vault_choices
+from nautobot_secrets_providers.providers.utils import ClientCache
+from nautobot_secrets_providers.tests.utils import StubProvider
 
 # Use the proper swappable User model
 User = get_user_model()
@@ -45,6 +76,95 @@ class SecretsProviderTestCase(TestCase):
         # Force login explicitly with the first-available backend
         self.client.force_login(self.user)
 
+        # Cached values and documents are process-wide.
+        cache.clear_cache()
+        ratelimit._buckets.clear()
+
+
+@tag("unit")
+class ClientCacheTestCase(TestCase):
+    """Tests for the shared ClientCache."""
+
+    def test_get_or_create(self):
+        """The factory is only called once per key."""
+        cache = ClientCache()
+        first = cache.get_or_create("a", object)
+        self.assertIs(cache.get_or_create("a", object), first)
+        self.assertIsNot(cache.get_or_create("b", object), first)
+        self.assertEqual(len(cache), 2)
+
+        self.assertIs(cache.pop("a"), first)
+        self.assertNotIn("a", cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_slow_factory(self):
+        """A slow factory doesn't block other keys, and concurrent calls for its key share the client it creates."""
+        cache = ClientCache()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow_factory():
+            calls.append(None)
+            started.set()
+            release.wait(5)
+            return object()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(cache.get_or_create, "a", slow_factory) for _ in range(2)]
+            self.assertTrue(started.wait(5))
+            cache.get_or_create("b", object)
+            release.set()
+            first, second = (future.result() for future in futures)
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+
+        # Only the client that is still cached is discarded.
+        cache.discard("a", object())
+        self.assertIs(cache.get("a"), first)
+        cache.discard("a", first)
+        self.assertNotIn("a", cache)
+
+    def test_emptied_after_fork(self):
+        """A forked child process never sees the clients of its parent."""
+        cache = ClientCache()
+        cache.get_or_create("a", object)
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            os.write(write_fd, str(len(cache)).encode())
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_fd) as pipe:
+            self.assertEqual(pipe.read(), "0")
+        self.assertEqual(len(cache), 1)
+
+
+@tag("unit")
+class BatchSecretsProviderMixinTestCase(TestCase):
+    """Tests for the default, thread pool based, implementation of get_values_for_secrets."""
+
+    def test_get_values_for_secrets(self):
+        """Values and errors are returned keyed on the position of their request."""
+        secrets = [
+            Secret(name="one", provider=StubProvider.slug, parameters={"value": "{{ obj }}"}),
+            Secret(name="two", provider=StubProvider.slug, parameters={"error": "SecretValueNotFoundError"}),
+            Secret(name="three", provider=StubProvider.slug, parameters={}),
+        ]
+        values, errors = StubProvider.get_values_for_secrets(
+            [(secrets[0], "hello"), (secrets[1], None), (secrets[2], None)]
+        )
+        self.assertEqual(values, {0: "hello"})
+        self.assertEqual(set(errors), {1, 2})
+        self.assertIsInstance(errors[1], exceptions.SecretValueNotFoundError)
+        # Other exceptions are wrapped in a SecretError, like Secret.get_value() does.
+        self.assertIsInstance(errors[2], exceptions.SecretError)
+        self.assertIsInstance(errors[2].__cause__, KeyError)
+
+        self.assertEqual(StubProvider.get_values_for_secrets([]), ({}, {}))
+
 
 class AWSSecretsManagerSecretsProviderTestCase(SecretsProviderTestCase):
     """Tests for AWSSecretsManagerSecretsProvider."""
@@ -53,6 +173,8 @@ class AWSSecretsManagerSecretsProviderTestCase(SecretsProviderTestCase):
 
     def setUp(self):
         super().setUp()
+        aws._clients.clear()
+        aws._sessions.clear()
 
         # The secret we be using.
         self.secret = Secret.objects.create(
@@ -107,6 +229,169 @@ class AWSSecretsManagerSecretsProviderTestCase(SecretsProviderTestCase):
         exc = err.exception
         self.assertIn(self.secret.parameters["key"], exc.message)
 
+    @mock_secretsmanager
+    def test_client_is_pooled(self):
+        """Repeated lookups reuse a single session and client."""
+        conn = boto3.client("secretsmanager", region_name=self.secret.parameters["region"])
+        conn.create_secret(Name="hello", SecretString='{"location":"world"}')
+
+        with patch.object(aws.boto3.session, "Session", wraps=aws.boto3.session.Session) as session:
+            for _ in range(3):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+        session.assert_called_once()
+        self.assertIs(
+            aws.get_client("secretsmanager", "us-east-2"),
+            aws.get_client("secretsmanager", "us-east-2"),
+        )
+        self.assertIsNot(
+            aws.get_client("secretsmanager", "us-east-2"),
+            aws.get_client("secretsmanager", "eu-west-3"),
+        )
+        self.assertIsNot(aws.get_client("secretsmanager", "us-east-2"), aws.get_client("ssm", "us-east-2"))
+
+    def test_clients_are_created_one_at_a_time(self):
+        """Clients for different services and regions are never created concurrently from the shared session."""
+        active, concurrency = [], []
+        active_lock = threading.Lock()
+        create_client = aws.boto3.session.Session.client
+
+        def client(session, *args, **kwargs):
+            with active_lock:
+                active.append(None)
+                concurrency.append(len(active))
+            try:
+                time.sleep(0.01)
+                return create_client(session, *args, **kwargs)
+            finally:
+                with active_lock:
+                    active.pop()
+
+        services = ("secretsmanager", "ssm")
+        regions = ("us-east-1", "us-east-2", "eu-west-1", "eu-west-3")
+        with patch.object(aws.boto3.session.Session, "client", client):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(aws.get_client, sorted(services * 4), regions * 2))
+        self.assertEqual(len(concurrency), 8)
+        self.assertEqual(max(concurrency), 1)
+
+    @mock_secretsmanager
+    def test_document_is_cached(self):
+        """Sibling keys of the same AWS secret are served from a single request when caching is enabled."""
+        conn = boto3.client("secretsmanager", region_name=self.secret.parameters["region"])
+        conn.create_secret(Name="hello", SecretString='{"location":"world","planet":"earth"}')
+        secrets = [
+            Secret(name=f"hello-{key}", provider=self.provider.slug, parameters={**self.secret.parameters, "key": key})
+            for key in ("location", "planet", "moon")
+        ]
+
+        client = aws.get_client("secretsmanager", "us-east-2")
+        plugins_config = {"nautobot_secrets_providers": {"cache": {"enabled": True}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(client, "get_secret_value", wraps=client.get_secret_value) as get_secret_value:
+                self.assertEqual(self.provider.get_value_for_secret(secrets[0]), "world")
+                self.assertEqual(self.provider.get_value_for_secret(secrets[1]), "earth")
+                self.assertEqual(get_secret_value.call_count, 1)
+
+                # A key missing from the cached document is looked up again, in case it was added since.
+                conn.put_secret_value(SecretId="hello", SecretString='{"location":"world","moon":"luna"}')
+                self.assertEqual(self.provider.get_value_for_secret(secrets[2]), "luna")
+                self.assertEqual(get_secret_value.call_count, 2)
+
+    @mock_secretsmanager
+    def test_pinned_version(self):
+        """A pinned version is retrieved, and cached without expiry even though caching is disabled."""
+        conn = boto3.client("secretsmanager", region_name=self.secret.parameters["region"])
+        version_id = conn.create_secret(Name="hello", SecretString='{"location":"world"}')["VersionId"]
+        conn.put_secret_value(SecretId="hello", SecretString='{"location":"moon"}')
+        pinned = Secret(
+            name="hello-pinned",
+            provider=self.provider.slug,
+            parameters={**self.secret.parameters, "version_id": version_id},
+        )
+
+        client = aws.get_client("secretsmanager", "us-east-2")
+        with patch.object(client, "get_secret_value", wraps=client.get_secret_value) as get_secret_value:
+            with patch.object(cache.time, "monotonic", return_value=100):
+                self.assertEqual(self.provider.get_value_for_secret(pinned), "world")
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "moon")
+            with patch.object(cache.time, "monotonic", return_value=100000):
+                self.assertEqual(self.provider.get_value_for_secret(pinned), "world")
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "moon")
+        get_secret_value.assert_any_call(SecretId="hello", VersionId=version_id)
+        self.assertEqual(get_secret_value.call_count, 3)
+
+    def test_get_values_for_secrets(self):
+        """Secrets are retrieved with BatchGetSecretValue, once per AWS secret."""
+        other = Secret.objects.create(
+            name="hello-aws-2",
+            provider=self.provider.slug,
+            parameters={"name": "hello", "region": "us-east-2", "key": "planet"},
+        )
+        missing = Secret.objects.create(
+            name="hello-aws-3",
+            provider=self.provider.slug,
+            parameters={"name": "missing", "region": "us-east-2", "key": "location"},
+        )
+        response = {
+            "SecretValues": [
+                {
+                    "ARN": "arn:aws:secretsmanager:us-east-2:123456789012:secret:hello-AbCdEf",
+                    "Name": "hello",
+                    "SecretString": '{"location": "world", "planet": "earth"}',
+                },
+            ],
+            "Errors": [
+                {"SecretId": "missing", "ErrorCode": "ResourceNotFoundException", "ErrorMessage": "Not found"},
+            ],
+        }
+        client = aws.get_client("secretsmanager", "us-east-2")
+        with patch.object(client, "batch_get_secret_value", return_value=response) as batch_get_secret_value:
+            values, errors = self.provider.get_values_for_secrets([(self.secret, None), (other, None), (missing, None)])
+
+        batch_get_secret_value.assert_called_once_with(SecretIdList=["hello", "missing"])
+        self.assertEqual(values, {0: "world", 1: "earth"})
+        self.assertEqual(list(errors), [2])
+        self.assertIsInstance(errors[2], exceptions.SecretValueNotFoundError)
+
+    @mock_secretsmanager
+    def test_get_values_for_secrets_without_batch_api(self):
+        """Secrets are retrieved one by one with botocore releases lacking BatchGetSecretValue."""
+        conn = boto3.client("secretsmanager", region_name=self.secret.parameters["region"])
+        conn.create_secret(Name="hello", SecretString='{"location":"world"}')
+        client = Mock(
+            spec=["get_secret_value", "meta"], meta=conn.meta, **{"get_secret_value.side_effect": conn.get_secret_value}
+        )
+
+        with patch.object(aws, "get_client", return_value=client):
+            values, errors = self.provider.get_values_for_secrets([(self.secret, None)] * 3)
+        self.assertEqual(values, {0: "world", 1: "world", 2: "world"})
+        self.assertEqual(errors, {})
+
+    @mock_secretsmanager
+    def test_get_values_for_secrets_batch_denied(self):
+        """Secrets are retrieved one by one when the credentials aren't allowed to call BatchGetSecretValue."""
+        conn = boto3.client("secretsmanager", region_name=self.secret.parameters["region"])
+        requests = []
+        for number in range(25):
+            conn.create_secret(Name=f"hello{number}", SecretString=f'{{"location":"world {number}"}}')
+            requests.append(
+                (
+                    Secret(name=f"hello{number}", provider=self.provider.slug, parameters={**self.secret.parameters}),
+                    None,
+                )
+            )
+            requests[-1][0].parameters["name"] = f"hello{number}"
+        denied = ClientError(
+            {"Error": {"Code": "AccessDeniedException", "Message": "Not authorized"}}, "BatchGetSecretValue"
+        )
+
+        client = aws.get_client("secretsmanager", self.secret.parameters["region"])
+        with patch.object(client, "batch_get_secret_value", side_effect=denied) as batch_get_secret_value:
+            values, errors = self.provider.get_values_for_secrets(requests)
+        batch_get_secret_value.assert_called_once()
+        self.assertEqual(values, {number: f"world {number}" for number in range(25)})
+        self.assertEqual(errors, {})
+
 
 class HashiCorpVaultSecretsProviderTestCase(SecretsProviderTestCase):
     """Tests for HashiCorpVaultSecretsProvider."""
@@ -179,6 +464,8 @@ class HashiCorpVaultSecretsProviderTestCase(SecretsProviderTestCase):
 
     def setUp(self):
         super().setUp()
+        hashicorp._clients.clear()
+        hashicorp._versions.clear()
 
         # The secret we be using.
         self.secret = Secret.objects.create(
@@ -295,6 +582,70 @@ class HashiCorpVaultSecretsProviderTestCase(SecretsProviderTestCase):
         response = self.provider.get_value_for_secret(self.secret)
         self.assertEqual(self.mock_response["data"]["data"]["location"], response)
 
+    @requests_mock.Mocker()
+    def test_document_is_cached(self, requests_mocker):
+        """Sibling keys share a single read of the KV secret, until a new version of it is read."""
+
+        def response(version, **data):
+            metadata = {**self.mock_response["data"]["metadata"], "version": version}
+            return {"json": {**self.mock_response, "data": {"data": data, "metadata": metadata}}}
+
+        requests_mocker.register_uri(
+            method="GET",
+            url=self.test_path,
+            response_list=[
+                response(2, location="world", planet="earth"),
+                response(3, location="moon", planet="mars", star="sun"),
+            ],
+        )
+        requests_mocker.register_uri(method="GET", url=self.test_mountpoint_path, **response(1, location="mount"))
+        planet, star = (
+            Secret(name=f"hello-{key}", provider=self.provider.slug, parameters={**self.secret.parameters, "key": key})
+            for key in ("planet", "star")
+        )
+        other_mount = Secret(
+            name="hello-mount",
+            provider=self.provider.slug,
+            parameters={**self.secret.parameters, "mount_point": "mymount"},
+        )
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                **settings.PLUGINS_CONFIG["nautobot_secrets_providers"],
+                "cache": {"enabled": True},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            self.assertEqual(self.provider.get_value_for_secret(planet), "earth")
+            self.assertEqual(self.provider.get_value_for_secret(other_mount), "mount")
+            self.assertEqual(requests_mocker.call_count, 2)
+
+            # The key is missing from the cached document, so the secret is read again and has a new version.
+            self.assertEqual(self.provider.get_value_for_secret(star), "sun")
+            self.assertEqual(requests_mocker.call_count, 3)
+
+            # The values cached from the previous version have been invalidated, but not those of the same path on
+            # another mount point.
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "moon")
+            self.assertEqual(self.provider.get_value_for_secret(planet), "mars")
+            self.assertEqual(self.provider.get_value_for_secret(other_mount), "mount")
+            self.assertEqual(requests_mocker.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_pinned_version(self, requests_mocker):
+        """A pinned KV v2 version is read, and cached without expiry even though caching is disabled."""
+        requests_mocker.register_uri(method="GET", url=f"{self.test_path}?version=1", json=self.mock_response)
+        self.secret.parameters["version"] = "1"
+
+        for _ in range(3):
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+        self.assertEqual(requests_mocker.call_count, 1)
+        self.assertEqual(requests_mocker.last_request.qs, {"version": ["1"]})
+
+        self.secret.parameters["kv_version"] = HashicorpKVVersionChoices.KV_VERSION_1
+        with self.assertRaises(exceptions.SecretParametersError):
+            self.provider.get_value_for_secret(self.secret)
+
     @requests_mock.Mocker()
     def test_retrieve_mount_point_success(self, requests_mocker):
         """Retrieve a secret successfully using a custom `mount_point`."""
@@ -628,6 +979,75 @@ class HashiCorpVaultSecretsProviderTestCase(SecretsProviderTestCase):
                 'SecretProviderError: Secret "hello-hashicorp" (provider "HashiCorpVaultSecretsProvider"): HashiCorp Vault Login failed (auth_method: aws). Error: , on post http://localhost:8200/v1/auth/aws/login',
             )
 
+    @requests_mock.Mocker()
+    def test_client_is_cached(self, requests_mocker):
+        """Repeated lookups reuse one login, renewing and replacing the token as it approaches expiry."""
+        vault_url = "http://localhost:8200"
+        approle_plugins_config = {
+            "nautobot_secrets_providers": {
+                "hashicorp_vault": {
+                    "url": vault_url,
+                    "auth_method": "approle",
+                    "role_id": "role",
+                    "secret_id": "secret",  # nosec B105
+                },
+            },
+        }
+        login = requests_mocker.register_uri(
+            method="POST",
+            url=f"{vault_url}/v1/auth/approle/login",
+            json={"auth": {"client_token": "first", "lease_duration": 100, "renewable": True}},
+        )
+        renew = requests_mocker.register_uri(
+            method="POST",
+            url=f"{vault_url}/v1/auth/token/renew-self",
+            json={"auth": {"client_token": "first", "lease_duration": 100, "renewable": True}},
+        )
+        requests_mocker.register_uri(method="GET", url=self.test_path, json=self.mock_response)
+
+        now = 1000.0
+        with self.settings(PLUGINS_CONFIG=approle_plugins_config), patch.object(
+            hashicorp.time, "monotonic", side_effect=lambda: now
+        ):
+            for _ in range(3):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            self.assertEqual(login.call_count, 1)
+            self.assertEqual(renew.call_count, 0)
+
+            # Past the renewal threshold, the token is renewed rather than replaced.
+            now += 80
+            self.provider.get_value_for_secret(self.secret)
+            self.assertEqual(login.call_count, 1)
+            self.assertEqual(renew.call_count, 1)
+
+            # Once the token nears its maximum TTL, renewals get shorter and a new login is performed instead.
+            now += 80
+            requests_mocker.register_uri(
+                method="POST",
+                url=f"{vault_url}/v1/auth/token/renew-self",
+                json={"auth": {"client_token": "first", "lease_duration": 5, "renewable": True}},
+            )
+            self.provider.get_value_for_secret(self.secret)
+            self.assertEqual(login.call_count, 2)
+
+        # Changing the configuration drops the cached clients.
+        self.assertEqual(len(hashicorp._clients), 0)
+
+    @requests_mock.Mocker()
+    def test_client_relogin_on_forbidden(self, requests_mocker):
+        """A revoked token is replaced by a new login."""
+        requests_mocker.register_uri(method="GET", url=self.test_path, json=self.mock_response)
+        self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+        cached_client = self.provider.get_cached_client(self.secret, "default")
+
+        requests_mocker.register_uri(
+            method="GET",
+            url=self.test_path,
+            response_list=[{"status_code": 403}, {"json": self.mock_response}],
+        )
+        self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+        self.assertIsNot(self.provider.get_cached_client(self.secret, "default"), cached_client)
+
     def test_vault_choices(self):
         choices = vault_choices()
         self.assertEqual(choices, [("default", "Default")])
@@ -653,6 +1073,8 @@ class AWSSystemsManagerParameterStoreTestCase(SecretsProviderTestCase):
 
     def setUp(self):
         super().setUp()
+        aws._clients.clear()
+        aws._sessions.clear()
         self.secret = Secret.objects.create(
             name="hello-aws-parameterstore",
             provider=self.provider.slug,
@@ -712,6 +1134,600 @@ class AWSSystemsManagerParameterStoreTestCase(SecretsProviderTestCase):
         exc = err.exception
         self.assertIn("ParameterVersionNotFound", exc.message)
 
+    @mock_ssm
+    def test_get_values_for_secrets(self):
+        """Parameters are retrieved with GetParameters, 10 at a time."""
+        region = self.secret.parameters["region"]
+        conn = boto3.client("ssm", region_name=region)
+        requests = []
+        for number in range(12):
+            conn.put_parameter(Name=f"/hello/{number}", Value=f'{{"location": "world {number}"}}', Type="SecureString")
+            secret = Secret(
+                name=f"hello-ssm-{number}",
+                provider=self.provider.slug,
+                parameters={"name": f"/hello/{number}", "region": region, "key": "location"},
+            )
+            requests.append((secret, None))
+        requests.append((self.secret, None))
+
+        client = aws.get_client("ssm", region)
+        with patch.object(client, "get_parameters", wraps=client.get_parameters) as get_parameters:
+            values, errors = self.provider.get_values_for_secrets(requests)
+
+        self.assertEqual(get_parameters.call_count, 2)
+        self.assertEqual(values, {number: f"world {number}" for number in range(12)})
+        self.assertEqual(list(errors), [12])
+        self.assertIsInstance(errors[12], exceptions.SecretParametersError)
+
+    @mock_ssm
+    def test_throttled(self):
+        """Throttled requests slow the rate limiter down and are retried, up to the configured number of times."""
+        conn = boto3.client("ssm", region_name=self.secret.parameters["region"])
+        conn.put_parameter(Name="hello", Type="SecureString", Value='{"location":"world"}')
+        client = aws.get_client("ssm", self.secret.parameters["region"])
+        response = client.get_parameter(Name="hello", WithDecryption=True)
+        throttled = ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "GetParameter")
+
+        plugins_config = {"nautobot_secrets_providers": {"rate_limit": {"enabled": True}}}
+        with patch.object(aws.time, "sleep"), patch.object(aws, "get_backoff", return_value=0.1) as get_backoff:
+            with self.settings(PLUGINS_CONFIG=plugins_config):
+                with patch.object(
+                    client, "get_parameter", side_effect=[throttled, throttled, response]
+                ) as get_parameter:
+                    self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+                bucket = ratelimit.get_token_bucket("ssm", ("ssm", self.secret.parameters["region"], None))
+            self.assertEqual(get_parameter.call_count, 3)
+            self.assertEqual(get_backoff.call_count, 2)
+            self.assertLess(bucket.rate, 40)
+
+            plugins_config = {"nautobot_secrets_providers": {"rate_limit": {"enabled": True, "max_retries": 1}}}
+            with self.settings(PLUGINS_CONFIG=plugins_config):
+                with patch.object(client, "get_parameter", side_effect=throttled) as get_parameter:
+                    with self.assertRaises(exceptions.SecretProviderError) as err:
+                        self.provider.get_value_for_secret(self.secret)
+            self.assertEqual(get_parameter.call_count, 2)
+            self.assertIn("ThrottlingException", err.exception.message)
+
+    @mock_ssm
+    def test_document_is_cached(self):
+        """Sibling keys of the same parameter are served from a single request when caching is enabled."""
+        region = self.secret.parameters["region"]
+        conn = boto3.client("ssm", region_name=region)
+        conn.put_parameter(Name="hello", Type="SecureString", Value='{"location":"world","planet":"earth"}')
+        planet = Secret(name="hello-planet", provider=self.provider.slug, parameters={**self.secret.parameters})
+        planet.parameters["key"] = "planet"
+
+        client = aws.get_client("ssm", region)
+        plugins_config = {"nautobot_secrets_providers": {"cache": {"enabled": True}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(client, "get_parameter", wraps=client.get_parameter) as get_parameter:
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+                self.assertEqual(self.provider.get_value_for_secret(planet), "earth")
+        get_parameter.assert_called_once_with(Name="hello", WithDecryption=True)
+
+    @mock_ssm
+    def test_prefetch_path(self):
+        """A hierarchy of parameters is retrieved with paginated GetParametersByPath calls and cached."""
+        region = self.secret.parameters["region"]
+        conn = boto3.client("ssm", region_name=region)
+        secrets = []
+        for number in range(12):
+            name = f"/nautobot/devices/{number % 2}/{number}"
+            conn.put_parameter(Name=name, Value=f'{{"location": "world {number}"}}', Type="SecureString")
+            secrets.append(
+                Secret(
+                    name=f"hello-ssm-{number}",
+                    provider=self.provider.slug,
+                    parameters={"name": name, "region": region, "key": "location"},
+                )
+            )
+        conn.put_parameter(Name="/nautobot/devices/plain", Value="Non Valid JSON", Type="String")
+        conn.put_parameter(Name="/elsewhere", Value='{"location": "world"}', Type="String")
+
+        # Nothing is retrieved unless caching is enabled, and the region of the secrets is required.
+        self.assertEqual(self.provider.prefetch_path("/nautobot", region), 0)
+        with self.assertRaises(TypeError):
+            self.provider.prefetch_path("/nautobot")  # pylint: disable=no-value-for-parameter
+
+        client = aws.get_client("ssm", region)
+        plugins_config = {"nautobot_secrets_providers": {"cache": {"enabled": True}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(client, "get_parameters_by_path", wraps=client.get_parameters_by_path) as by_path:
+                self.assertEqual(self.provider.prefetch_path("/nautobot", region_name=region), 12)
+            self.assertEqual(by_path.call_count, 2)
+            by_path.assert_called_with(Path="/nautobot", Recursive=True, WithDecryption=True, NextToken=ANY)
+
+            with patch.object(client, "get_parameter") as get_parameter:
+                for number, secret in enumerate(secrets):
+                    self.assertEqual(self.provider.get_value_for_secret(secret), f"world {number}")
+            get_parameter.assert_not_called()
+
+
+class AzureKeyVaultSecretsProviderTestCase(SecretsProviderTestCase):
+    """Tests for AzureKeyVaultSecretsProvider."""
+
+    provider = AzureKeyVaultSecretsProvider
+
+    def setUp(self):
+        super().setUp()
+        azure._credentials.clear()
+        azure._clients.clear()
+
+        self.secret = Secret.objects.create(
+            name="hello-azure",
+            provider=self.provider.slug,
+            parameters={"vault_url": "https://hello.vault.azure.net", "secret_name": "location"},
+        )
+
+    @patch.object(azure.azure_keyvault_secrets, "SecretClient")
+    def test_retrieve_success(self, secret_client):
+        """Retrieve a secret successfully, reusing the credential and client."""
+        secret_client.return_value.get_secret.return_value.value = "world"
+        credential_class = Mock()
+
+        with patch.object(azure.azure_identity, "DefaultAzureCredential", credential_class):
+            for _ in range(3):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+
+        credential_class.assert_called_once_with()
+        secret_client.assert_called_once_with(
+            vault_url="https://hello.vault.azure.net", credential=credential_class.return_value
+        )
+        secret_client.return_value.get_secret.assert_called_with("location")
+
+    @patch.object(azure.azure_keyvault_secrets, "SecretClient")
+    def test_pinned_version(self, secret_client):
+        """A pinned version is retrieved, and cached without expiry even though caching is disabled."""
+        secret_client.return_value.get_secret.return_value.value = "world"
+        self.secret.parameters["version"] = "0123456789abcdef"
+
+        with patch.object(azure.azure_identity, "DefaultAzureCredential"):
+            for _ in range(3):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+
+        secret_client.return_value.get_secret.assert_called_once_with("location", version="0123456789abcdef")
+
+    @patch.object(azure.azure_keyvault_secrets, "SecretClient")
+    def test_retrieve_failure(self, secret_client):
+        """Errors raised by the Azure SDK are reported as provider errors."""
+        secret_client.return_value.get_secret.side_effect = Exception("SecretNotFound")
+
+        with patch.object(azure.azure_identity, "DefaultAzureCredential"):
+            with self.assertRaises(exceptions.SecretProviderError) as err:
+                self.provider.get_value_for_secret(self.secret)
+        self.assertIn("SecretNotFound", err.exception.message)
+
+    @patch.object(azure.azure_keyvault_secrets, "SecretClient")
+    def test_secret_not_found(self, secret_client):
+        """A secret missing from the Key Vault is reported as not found, which doesn't open the circuit breaker."""
+        secret_client.return_value.get_secret.side_effect = azure.azure_core_exceptions.ResourceNotFoundError(
+            "(SecretNotFound) A secret with (name/id) location was not found in this key vault."
+        )
+        plugins_config = {"nautobot_secrets_providers": {"circuit_breaker": {"enabled": True, "failure_threshold": 1}}}
+
+        with patch.object(azure.azure_identity, "DefaultAzureCredential"), self.settings(PLUGINS_CONFIG=plugins_config):
+            for _ in range(2):
+                with self.assertRaisesRegex(exceptions.SecretValueNotFoundError, "was not found"):
+                    self.provider.get_value_for_secret(self.secret)
+        self.assertEqual(secret_client.return_value.get_secret.call_count, 2)
+
+    @patch.object(azure.azure_keyvault_secrets, "SecretClient")
+    def test_pinned_credential(self, secret_client):
+        """A configured credential type is used instead of DefaultAzureCredential."""
+        secret_client.return_value.get_secret.return_value.value = "world"
+        default_credential, managed_identity_credential = Mock(), Mock()
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                "azure_key_vault": {"credential": "managed_identity", "credential_kwargs": {"client_id": "abc"}},
+            },
+        }
+
+        with patch.multiple(
+            azure.azure_identity,
+            DefaultAzureCredential=default_credential,
+            ManagedIdentityCredential=managed_identity_credential,
+        ):
+            with self.settings(PLUGINS_CONFIG=plugins_config):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+
+            plugins_config = {"nautobot_secrets_providers": {"azure_key_vault": {"credential": "bogus"}}}
+            with self.settings(PLUGINS_CONFIG=plugins_config):
+                with self.assertRaises(exceptions.SecretProviderError) as err:
+                    self.provider.get_credential(self.secret)
+                self.assertIn("Azure Key Vault credential bogus is invalid!", err.exception.message)
+
+        default_credential.assert_not_called()
+        managed_identity_credential.assert_called_once_with(client_id="abc")
+
+
+class DelineaSecretServerSecretsProviderTestCase(SecretsProviderTestCase):
+    """Tests for the Delinea Secret Server providers."""
+
+    provider = DelineaSecretServerSecretsProviderId
+
+    base_url = "https://pw.example.local/SecretServer"
+    plugins_config = {
+        "nautobot_secrets_providers": {
+            "delinea": {
+                "base_url": base_url,
+                "ca_bundle_path": None,
+                "cloud_based": False,
+                "domain": None,
+                "password": "password",
+                "tenant": None,
+                "token": None,
+                "username": "nautobot",
+            },
+        },
+    }
+
+    # Mock API response
+    mock_secret = {
+        "id": 1234,
+        "folderId": 1,
+        "secretTemplateId": 1,
+        "siteId": 1,
+        "active": True,
+        "checkedOut": False,
+        "checkOutEnabled": False,
+        "name": "hello",
+        "secretTemplateName": "Password",
+        "lastHeartBeatStatus": "Success",
+        "lastHeartBeatCheck": "2024-01-01T00:00:00",
+        "lastPasswordChangeAttempt": "2024-01-01T00:00:00",
+        "items": [
+            {
+                "itemId": index,
+                "fieldId": index,
+                "fileAttachmentId": None,
+                "fieldDescription": "",
+                "fieldName": slug.title(),
+                "filename": None,
+                "itemValue": value,
+                "slug": slug,
+            }
+            for index, (slug, value) in enumerate((("username", "admin"), ("password", "world")))
+        ],
+    }
+
+    def setUp(self):
+        super().setUp()
+        delinea._clients.clear()
+
+        self.secret = Secret.objects.create(
+            name="hello-delinea",
+            provider=self.provider.slug,
+            parameters={"secret_id": "1234", "secret_selected_value": "password"},
+        )
+
+    @requests_mock.Mocker()
+    def test_retrieve_success(self, requests_mocker):
+        """Retrieve a secret successfully, requesting a single OAuth token."""
+        token = requests_mocker.register_uri(
+            method="POST",
+            url=f"{self.base_url}/oauth2/token",
+            json={"access_token": "token", "expires_in": 1200},
+        )
+        requests_mocker.register_uri(method="GET", url=f"{self.base_url}/api/v1/secrets/1234", json=self.mock_secret)
+
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            for _ in range(3):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+        self.assertEqual(token.call_count, 1)
+        self.assertEqual(requests_mocker.last_request.headers["Authorization"], "Bearer token")
+
+    @requests_mock.Mocker()
+    def test_retrieve_does_not_exist(self, requests_mocker):
+        """Try and fail to retrieve a secret that doesn't exist."""
+        requests_mocker.register_uri(
+            method="POST", url=f"{self.base_url}/oauth2/token", json={"access_token": "token", "expires_in": 1200}
+        )
+        requests_mocker.register_uri(
+            method="GET",
+            url=f"{self.base_url}/api/v1/secrets/1234",
+            status_code=404,
+            json={"message": "Secret not found"},
+        )
+
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            with self.assertRaises(exceptions.SecretValueNotFoundError):
+                self.provider.get_value_for_secret(self.secret)
+
+    @requests_mock.Mocker()
+    def test_retrieve_server_error(self, requests_mocker):
+        """A server error is a provider failure, opening the circuit breaker, for which the stale value is served."""
+        requests_mocker.register_uri(
+            method="POST", url=f"{self.base_url}/oauth2/token", json={"access_token": "token", "expires_in": 1200}
+        )
+        requests_mocker.register_uri(method="GET", url=f"{self.base_url}/api/v1/secrets/1234", json=self.mock_secret)
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                **self.plugins_config["nautobot_secrets_providers"],
+                "cache": {"enabled": True, "ttl": 10, "stale_if_error": 60},
+                "circuit_breaker": {"enabled": True, "failure_threshold": 2, "recovery_timeout": 30},
+            },
+        }
+        circuitbreaker._breakers.clear()  # pylint: disable=protected-access
+        self.addCleanup(circuitbreaker._breakers.clear)  # pylint: disable=protected-access
+
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            with patch.object(cache.time, "monotonic", return_value=100):
+                self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+
+            get_secret = requests_mocker.register_uri(
+                method="GET", url=f"{self.base_url}/api/v1/secrets/1234", status_code=500, text="Internal Server Error"
+            )
+            with patch.object(cache.time, "monotonic", return_value=120), self.assertLogs(cache.logger, "WARNING"):
+                for _ in range(3):
+                    self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            # The breaker opened after two failures, so the third lookup didn't reach Secret Server.
+            self.assertEqual(get_secret.call_count, 2)
+
+            # Without a stale value, the failure is raised as such.
+            with patch.object(cache.time, "monotonic", return_value=200):
+                with self.assertRaises(exceptions.SecretProviderError) as err:
+                    self.provider.get_value_for_secret(self.secret)
+            self.assertNotIsInstance(err.exception, exceptions.SecretValueNotFoundError)
+
+    @requests_mock.Mocker()
+    def test_token_refresh_is_thread_safe(self, requests_mocker):
+        """Concurrent lookups share one token request, and an expired token is replaced."""
+        token = requests_mocker.register_uri(
+            method="POST",
+            url=f"{self.base_url}/oauth2/token",
+            json={"access_token": "token", "expires_in": 1200},
+        )
+        requests_mocker.register_uri(method="GET", url=f"{self.base_url}/api/v1/secrets/1234", json=self.mock_secret)
+
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda _: self.provider.get_value_for_secret(self.secret), range(16)))
+            self.assertEqual(results, ["world"] * 16)
+            self.assertEqual(token.call_count, 1)
+
+            now = time.monotonic()
+            with patch.object(delinea.time, "monotonic", return_value=now + 1200):
+                self.provider.get_value_for_secret(self.secret)
+            self.assertEqual(token.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_secret_is_cached(self, requests_mocker):
+        """Values selected from the same secret are served from a single request when caching is enabled."""
+        requests_mocker.register_uri(
+            method="POST", url=f"{self.base_url}/oauth2/token", json={"access_token": "token", "expires_in": 1200}
+        )
+        get_secret = requests_mocker.register_uri(
+            method="GET", url=f"{self.base_url}/api/v1/secrets/1234", json=self.mock_secret
+        )
+        username = Secret(
+            name="hello-delinea-username",
+            provider=self.provider.slug,
+            parameters={"secret_id": "1234", "secret_selected_value": "username"},
+        )
+
+        plugins_config = {
+            "nautobot_secrets_providers": {
+                **self.plugins_config["nautobot_secrets_providers"],
+                "cache": {"enabled": True},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            self.assertEqual(self.provider.get_value_for_secret(username), "admin")
+            self.assertEqual(get_secret.call_count, 1)
+
+        # Without caching, every lookup retrieves the secret.
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "world")
+            self.assertEqual(self.provider.get_value_for_secret(username), "admin")
+            self.assertEqual(get_secret.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_path_is_resolved_once(self, requests_mocker):
+        """A secret path is resolved to an ID by the first lookup, then resolved again once that ID is not found."""
+        requests_mocker.register_uri(
+            method="POST", url=f"{self.base_url}/oauth2/token", json={"access_token": "token", "expires_in": 1200}
+        )
+        by_path = requests_mocker.register_uri(
+            method="GET", url=f"{self.base_url}/api/v1/secrets/0", json=self.mock_secret
+        )
+        by_id = requests_mocker.register_uri(
+            method="GET", url=f"{self.base_url}/api/v1/secrets/1234", json=self.mock_secret
+        )
+        secret = Secret(
+            name="hello-delinea-path",
+            provider=DelineaSecretServerSecretsProviderPath.slug,
+            parameters={"secret_path": "/Nautobot/hello", "secret_selected_value": "password"},
+        )
+
+        with self.settings(PLUGINS_CONFIG=self.plugins_config):
+            for _ in range(3):
+                self.assertEqual(DelineaSecretServerSecretsProviderPath.get_value_for_secret(secret), "world")
+            self.assertEqual(by_path.call_count, 1)
+            # The path is sent as given.
+            self.assertEqual(by_path.last_request.qs, {"secretpath": ["/nautobot/hello"]})
+            self.assertEqual(by_id.call_count, 2)
+
+            # The secret was replaced by another one under the same path.
+            requests_mocker.register_uri(
+                method="GET",
+                url=f"{self.base_url}/api/v1/secrets/1234",
+                status_code=404,
+                json={"message": "Secret not found"},
+            )
+            by_path = requests_mocker.register_uri(
+                method="GET", url=f"{self.base_url}/api/v1/secrets/0", json={**self.mock_secret, "id": 5678}
+            )
+            by_new_id = requests_mocker.register_uri(
+                method="GET", url=f"{self.base_url}/api/v1/secrets/5678", json={**self.mock_secret, "id": 5678}
+            )
+            for _ in range(2):
+                self.assertEqual(DelineaSecretServerSecretsProviderPath.get_value_for_secret(secret), "world")
+            self.assertEqual(by_path.call_count, 1)
+            self.assertEqual(by_new_id.call_count, 1)
+
+    def test_ca_bundle_is_per_client(self):
+        """Concurrent lookups from Secret Servers trusting different certificates don't affect each other."""
+        with tempfile.TemporaryDirectory() as directory:
+            servers = [FakeSecretServer(directory, name) for name in ("first", "second")]
+            try:
+
+                def lookup(index):
+                    server = servers[index % 2]
+                    secret_id = 1000 + index
+                    value = delinea.DelineaSecretServerSecretsProviderBase.query_delinea_secret_server(
+                        secret=self.secret,
+                        base_url=server.base_url,
+                        ca_bundle_path=server.ca_bundle_path,
+                        password="password",
+                        secret_id=secret_id,
+                        secret_selected_value="password",
+                        username="nautobot",
+                        caller_class=self.provider,
+                    )
+                    return value == f"{server.name}-{secret_id}"
+
+                original_env = os.environ.get("REQUESTS_CA_BUNDLE")
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    results = list(executor.map(lookup, range(64)))
+                self.assertEqual(results, [True] * 64)
+                self.assertEqual(os.environ.get("REQUESTS_CA_BUNDLE"), original_env)
+                for server in servers:
+                    self.assertEqual(server.token_requests, 1)
+
+                # A server isn't trusted by a client trusting the certificate of another.
+                with self.assertRaises(delinea.requests.exceptions.SSLError):
+                    delinea.DelineaSecretServerSecretsProviderBase.query_delinea_secret_server(
+                        secret=self.secret,
+                        base_url=servers[0].base_url,
+                        ca_bundle_path=servers[1].ca_bundle_path,
+                        token="token",
+                        secret_id=1000,
+                        secret_selected_value="password",
+                        caller_class=self.provider,
+                    )
+            finally:
+                for server in servers:
+                    server.close()
+
+    def test_revoked_token(self):
+        """A shared access token rejected by Secret Server is replaced by a new one."""
+        with tempfile.TemporaryDirectory() as directory:
+            server = FakeSecretServer(directory, "server")
+            try:
+
+                def lookup(secret_id):
+                    return delinea.DelineaSecretServerSecretsProviderBase.query_delinea_secret_server(
+                        secret=self.secret,
+                        base_url=server.base_url,
+                        ca_bundle_path=server.ca_bundle_path,
+                        password="password",
+                        secret_id=secret_id,
+                        secret_selected_value="password",
+                        username="nautobot",
+                        caller_class=self.provider,
+                    )
+
+                self.assertEqual(lookup(1), "server-1")
+                server.access_token = None
+                self.assertEqual(lookup(2), "server-2")
+                self.assertEqual(lookup(3), "server-3")
+                self.assertEqual(server.token_requests, 2)
+            finally:
+                server.close()
+
+
+class FakeSecretServer:
+    """A local HTTPS stand-in for Secret Server, with its own self-signed certificate.
+
+    The password of each secret is the name of the server followed by the ID of the secret.
+    """
+
+    def __init__(self, directory, name):
+        """Start serving in a thread, writing the certificate to `directory`."""
+        self.name = name
+        self.token_requests = 0
+        self.access_token = None
+        self.ca_bundle_path = os.path.join(directory, f"{name}.pem")
+        key_path = os.path.join(directory, f"{name}.key")
+        self.write_certificate(self.ca_bundle_path, key_path)
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.ca_bundle_path, key_path)
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.get_handler())
+        self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self.base_url = f"https://127.0.0.1:{self.httpd.server_address[1]}/SecretServer"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def write_certificate(cert_path, key_path):
+        """Write a new self-signed certificate for 127.0.0.1 and its key."""
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), False)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(key, hashes.SHA256())
+        )
+        with open(cert_path, "wb") as cert_file:
+            cert_file.write(certificate.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, "wb") as key_file:
+            key_file.write(
+                key.private_bytes(
+                    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+                )
+            )
+
+    def get_handler(self):
+        """Return the request handler class of the server."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answer token and secret requests."""
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+            def send_json(self, data):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                self.rfile.read(int(self.headers["Content-Length"]))
+                server.token_requests += 1
+                server.access_token = f"{server.name}-token-{server.token_requests}"
+                self.send_json({"access_token": server.access_token, "expires_in": 1200})
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                secret_id = int(re.search(r"/secrets/(\d+)$", self.path).group(1))
+                if server.access_token is None or self.headers["Authorization"] != f"Bearer {server.access_token}":
+                    self.send_error(401)
+                    return
+                secret = dict(DelineaSecretServerSecretsProviderTestCase.mock_secret, id=secret_id)
+                secret["items"] = [dict(item, itemValue=f"{server.name}-{secret_id}") for item in secret["items"]]
+                self.send_json(secret)
+
+        return Handler
+
+    def close(self):
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
 
 class OnePasswordSecretsProviderTestCase(SecretsProviderTestCase):
     """Tests for OnePasswordSecretsProvider."""
@@ -754,15 +1770,287 @@ class OnePasswordSecretsProviderTestCase(SecretsProviderTestCase):
             }
         }
 
-    @patch("nautobot_secrets_providers.providers.one_password.get_secret_from_vault", return_value="world")
-    def test_retrieve_success(self, get_secret_from_vault):
+    @staticmethod
+    def mock_resolve_all(errors=None):
+        """Return a mock of `Secrets.resolve_all` resolving references to their last part, or to their given error."""
+        errors = errors or {}
+        return AsyncMock(
+            side_effect=lambda references: SimpleNamespace(
+                individual_responses={
+                    reference: SimpleNamespace(
+                        content=SimpleNamespace(secret=reference.split("/")[-1]), error=errors.get(reference)
+                    )
+                    for reference in references
+                }
+            )
+        )
+
+    @patch("nautobot_secrets_providers.providers.one_password.resolve_secrets")
+    def test_retrieve_success(self, resolve_secrets):
         """Retrieve a secret successfully."""
-        with get_secret_from_vault:
-            with self.settings(PLUGINS_CONFIG=self.plugin_config):
-                response = self.provider.get_value_for_secret(self.secret)
-                self.assertEqual("world", response)
-                response2 = self.provider.get_value_for_secret(self.secret2)
-                self.assertEqual("world", response2)
+        resolve_secrets.side_effect = lambda references, token: dict.fromkeys(references, "world")
+        with self.settings(PLUGINS_CONFIG=self.plugin_config):
+            response = self.provider.get_value_for_secret(self.secret)
+            self.assertEqual("world", response)
+            response2 = self.provider.get_value_for_secret(self.secret2)
+            self.assertEqual("world", response2)
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_retrieve_errors(self, client_class):
+        """Lookups raise the same errors whether or not the secret shares a secrets group with other secrets."""
+        one_password._clients.clear()
+        missing = "op://example/location/section/value"
+        client_class.authenticate = AsyncMock()
+        client_class.authenticate.return_value.secrets.resolve_all = self.mock_resolve_all(
+            {missing: SimpleNamespace(type=SimpleNamespace(value="itemNotFound"))}
+        )
+        secrets_group = SecretsGroup.objects.create(name="device-credentials")
+        with self.settings(PLUGINS_CONFIG=self.plugin_config):
+            with self.assertRaises(exceptions.SecretValueNotFoundError):
+                self.provider.get_value_for_secret(self.secret)
+            SecretsGroupAssociation.objects.create(
+                secrets_group=secrets_group,
+                secret=self.secret,
+                access_type=SecretsGroupAccessTypeChoices.TYPE_GENERIC,
+                secret_type=SecretsGroupSecretTypeChoices.TYPE_PASSWORD,
+            )
+            SecretsGroupAssociation.objects.create(
+                secrets_group=secrets_group,
+                secret=Secret.objects.create(
+                    name="device-username",
+                    provider=self.provider.slug,
+                    parameters={"vault": "example", "item": "device", "field": "username"},
+                ),
+                access_type=SecretsGroupAccessTypeChoices.TYPE_GENERIC,
+                secret_type=SecretsGroupSecretTypeChoices.TYPE_USERNAME,
+            )
+            with self.assertRaises(exceptions.SecretValueNotFoundError):
+                self.provider.get_value_for_secret(self.secret)
+
+            client_class.authenticate.side_effect = Exception("Unauthorized")
+            one_password._clients.clear()
+            with self.assertRaisesRegex(exceptions.SecretError, "Unauthorized"):
+                self.provider.get_value_for_secret(self.secret2)
+
+    def resolve(self, reference, token):
+        """Resolve `reference` with `token` on the provider's event loop, as lookups do."""
+        return self.provider.event_loop.run(one_password.resolve_secrets([reference], token))[reference]
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_client_is_reused(self, client_class):
+        """Lookups with the same token share one authenticated client."""
+        one_password._clients.clear()
+        client = client_class.authenticate = AsyncMock()
+        client.return_value.secrets = SimpleNamespace(resolve=AsyncMock(return_value="world"))
+
+        for _ in range(3):
+            self.assertEqual(self.resolve("op://example/location/value", "nautobot"), "world")
+        client.assert_awaited_once()
+        client.return_value.secrets.resolve.assert_awaited_with("op://example/location/value")
+
+        self.resolve("op://example/location/section/value", "another")
+        self.assertEqual(client.await_count, 2)
+        client.return_value.secrets.resolve.assert_awaited_with("op://example/location/section/value")
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_failed_authentication_is_not_cached(self, client_class):
+        """A failed authentication is retried by the next lookup."""
+        one_password._clients.clear()
+        authenticated_client = Mock(secrets=SimpleNamespace(resolve=AsyncMock(return_value="world")))
+        client = client_class.authenticate = AsyncMock(side_effect=[Exception("Unauthorized"), authenticated_client])
+
+        with self.assertRaises(Exception):
+            self.resolve("op://example/location/value", "nautobot")
+        self.assertNotIn("nautobot", one_password._clients)
+        self.resolve("op://example/location/value", "nautobot")
+        self.assertEqual(client.await_count, 2)
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_concurrent_lookups(self, client_class):
+        """Lookups from many threads are resolved concurrently on the provider's event loop."""
+        one_password._clients.clear()
+        in_flight = []
+        all_in_flight = {}
+        loop_threads = set()
+
+        async def resolve(reference):
+            loop_threads.add(threading.current_thread().name)
+            event = all_in_flight.setdefault("event", asyncio.Event())
+            in_flight.append(reference)
+            if len(in_flight) == 8:
+                event.set()
+            # Only returns once all the lookups are in flight together.
+            await asyncio.wait_for(event.wait(), timeout=5)
+            return "world"
+
+        client_class.authenticate = AsyncMock()
+        client_class.authenticate.return_value.secrets = SimpleNamespace(resolve=resolve)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(
+                executor.map(
+                    lambda index: self.resolve(f"op://example/item{index}/value", "nautobot"),
+                    range(8),
+                )
+            )
+        self.assertEqual(results, ["world"] * 8)
+        self.assertEqual(loop_threads, {self.provider.event_loop.name})
+        client_class.authenticate.assert_awaited_once()
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_async_lookup(self, client_class):
+        """Asynchronous callers await lookups on the provider's event loop, sharing its clients."""
+        one_password._clients.clear()
+        client_class.authenticate = AsyncMock()
+        resolve_all = client_class.authenticate.return_value.secrets.resolve_all = self.mock_resolve_all()
+
+        with self.settings(PLUGINS_CONFIG=self.plugin_config):
+            self.assertEqual(asyncio.run(self.provider.aget_value_for_secret(self.secret)), "value")
+            self.assertEqual(asyncio.run(self.provider.aget_value_for_secret(self.secret)), "value")
+            self.assertEqual(self.provider.get_value_for_secret(self.secret), "value")
+        client_class.authenticate.assert_awaited_once()
+        resolve_all.assert_awaited_with(["op://example/location/section/value"])
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_secrets_group(self, client_class):
+        """The secrets of a secrets group are resolved together by the lookup of the first one."""
+        one_password._clients.clear()
+        resolve_all = self.mock_resolve_all()
+        client_class.authenticate = AsyncMock()
+        client_class.authenticate.return_value.secrets.resolve = AsyncMock()
+        client_class.authenticate.return_value.secrets.resolve_all = resolve_all
+
+        secrets_group = SecretsGroup.objects.create(name="device-credentials")
+        for field in ("username", "password"):
+            SecretsGroupAssociation.objects.create(
+                secrets_group=secrets_group,
+                secret=Secret.objects.create(
+                    name=f"device-{field}",
+                    provider=self.provider.slug,
+                    parameters={"vault": "example", "item": "device", "field": field},
+                ),
+                access_type=SecretsGroupAccessTypeChoices.TYPE_GENERIC,
+                secret_type=field,
+            )
+
+        plugin_config = {
+            "nautobot_secrets_providers": {
+                **self.plugin_config["nautobot_secrets_providers"],
+                "cache": {"enabled": True},
+            },
+        }
+        with self.settings(PLUGINS_CONFIG=plugin_config):
+            for _ in range(2):
+                for secret_type in (
+                    SecretsGroupSecretTypeChoices.TYPE_USERNAME,
+                    SecretsGroupSecretTypeChoices.TYPE_PASSWORD,
+                ):
+                    self.assertEqual(
+                        secrets_group.get_secret_value(SecretsGroupAccessTypeChoices.TYPE_GENERIC, secret_type),
+                        secret_type,
+                    )
+            resolve_all.assert_awaited_once()
+            self.assertCountEqual(
+                resolve_all.await_args.args[0], ["op://example/device/username", "op://example/device/password"]
+            )
+            client_class.authenticate.return_value.secrets.resolve.assert_not_awaited()
+
+            # Siblings whose value is already cached are left out.
+            cache.get_document_cache().clear()
+            cache.invalidate_values(self.provider.slug, lambda parameters: parameters["field"] == "password")
+            secrets_group.get_secret_value(
+                SecretsGroupAccessTypeChoices.TYPE_GENERIC, SecretsGroupSecretTypeChoices.TYPE_PASSWORD
+            )
+            self.assertEqual(resolve_all.await_count, 2)
+            resolve_all.assert_awaited_with(["op://example/device/password"])
+
+            # The resolved values are dropped along with the rest of the cache.
+            cache.clear_cache()
+            secrets_group.get_secret_value(
+                SecretsGroupAccessTypeChoices.TYPE_GENERIC, SecretsGroupSecretTypeChoices.TYPE_PASSWORD
+            )
+            self.assertEqual(resolve_all.await_count, 3)
+
+        # Without caching, for every provider or for 1Password only, siblings aren't resolved nor values kept.
+        disabled = {
+            "nautobot_secrets_providers": {
+                **plugin_config["nautobot_secrets_providers"],
+                "cache": {"enabled": True, "providers": {self.provider.slug: {"enabled": False}}},
+            },
+        }
+        for config in (self.plugin_config, disabled):
+            with self.settings(PLUGINS_CONFIG=config):
+                for _ in range(2):
+                    secrets_group.get_secret_value(
+                        SecretsGroupAccessTypeChoices.TYPE_GENERIC, SecretsGroupSecretTypeChoices.TYPE_USERNAME
+                    )
+                resolve_all.assert_awaited_with(["op://example/device/username"])
+        self.assertEqual(resolve_all.await_count, 7)
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_secret_not_found(self, client_class):
+        """Missing items are reported as not found by SDKs with or without `resolve_all`, without opening the breaker."""
+        one_password._clients.clear()
+        client = Mock()
+        client.secrets = Mock(spec=["resolve"])
+        client.secrets.resolve = AsyncMock(
+            side_effect=Exception("error resolving secret reference: no item matched the secret reference query")
+        )
+        client_class.authenticate = AsyncMock(return_value=client)
+        plugin_config = {
+            "nautobot_secrets_providers": {
+                **self.plugin_config["nautobot_secrets_providers"],
+                "circuit_breaker": {"enabled": True, "failure_threshold": 1},
+            },
+        }
+
+        with self.settings(PLUGINS_CONFIG=plugin_config):
+            for _ in range(2):
+                with self.assertRaisesRegex(exceptions.SecretValueNotFoundError, "no item matched"):
+                    self.provider.get_value_for_secret(self.secret)
+            self.assertEqual(client.secrets.resolve.await_count, 2)
+
+            client.secrets = SimpleNamespace(
+                resolve_all=self.mock_resolve_all(
+                    {"op://example/location/section/value": SimpleNamespace(type=SimpleNamespace(value="itemNotFound"))}
+                )
+            )
+            for _ in range(2):
+                with self.assertRaisesRegex(exceptions.SecretValueNotFoundError, "itemNotFound"):
+                    self.provider.get_value_for_secret(self.secret)
+
+    @patch.object(one_password.onepassword_client, "Client")
+    def test_get_values_for_secrets(self, client_class):
+        """Secrets are resolved with a single resolve_all call per token."""
+        one_password._clients.clear()
+        resolve_all = AsyncMock(
+            side_effect=lambda references: SimpleNamespace(
+                individual_responses={
+                    reference: SimpleNamespace(content=SimpleNamespace(secret=f"{reference} value"), error=None)
+                    for reference in references
+                }
+            )
+        )
+        client_class.authenticate = AsyncMock()
+        client_class.authenticate.return_value.secrets.resolve_all = resolve_all
+        missing = Secret(name="missing", provider=self.provider.slug, parameters={"vault": "example", "item": "item"})
+
+        with self.settings(PLUGINS_CONFIG=self.plugin_config):
+            values, errors = self.provider.get_values_for_secrets(
+                [(self.secret, None), (self.secret2, None), (self.secret, None), (missing, None)]
+            )
+
+        self.assertEqual(
+            values,
+            {
+                0: "op://example/location/section/value value",
+                1: "op://example_2/location/value value",
+                2: "op://example/location/section/value value",
+            },
+        )
+        self.assertEqual(list(errors), [3])
+        self.assertEqual(resolve_all.await_count, 2)
+        resolve_all.assert_any_await(["op://example/location/section/value"])
 
     def test_multiple_valid_settings(self):
         # Test with a configuration passed in
@@ -0,0 +1,116 @@
+"""Tests for the rate limiting of requests to the secrets backends."""
+
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase, tag
+
+from nautobot_secrets_providers.providers import ratelimit
+
+
+@tag("unit")
+class TokenBucketTestCase(TestCase):
+    """Tests for TokenBucket."""
+
+    def test_acquire(self):
+        """Tokens are taken without waiting until the bucket is empty, then at the bucket's rate."""
+        with patch.object(ratelimit.time, "monotonic", return_value=100), patch.object(
+            ratelimit.time, "sleep"
+        ) as sleep:
+            bucket = ratelimit.TokenBucket(rate=2)
+            bucket.acquire()
+            bucket.acquire()
+            sleep.assert_not_called()
+            bucket.acquire()
+            sleep.assert_called_once_with(0.5)
+            bucket.acquire()
+            sleep.assert_called_with(1.0)
+
+    def test_adaptive_rate(self):
+        """The rate is halved when throttled, down to the minimum rate, and recovers with successful requests."""
+        bucket = ratelimit.TokenBucket(rate=40, min_rate=4)
+        bucket.throttled()
+        self.assertEqual(bucket.rate, 20)
+        for _ in range(5):
+            bucket.throttled()
+        self.assertEqual(bucket.rate, 4)
+
+        for _ in range(10):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 24)
+        for _ in range(10):
+            bucket.succeeded()
+        self.assertEqual(bucket.rate, 40)
+
+    def test_get_token_bucket(self):
+        """Buckets are created per key for the services with a rate, once rate limiting is enabled."""
+        self.assertIsNone(ratelimit.get_token_bucket("ssm", ("ssm", "us-east-1", None)))
+
+        plugins_config = {"nautobot_secrets_providers": {"rate_limit": {"enabled": True}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            bucket = ratelimit.get_token_bucket("ssm", ("ssm", "us-east-1", None))
+            self.assertIsInstance(bucket, ratelimit.TokenBucket)
+            self.assertEqual(bucket.rate, 40)
+            self.assertIs(ratelimit.get_token_bucket("ssm", ("ssm", "us-east-1", None)), bucket)
+            self.assertIsNot(ratelimit.get_token_bucket("ssm", ("ssm", "eu-west-3", None)), bucket)
+            self.assertIsNone(ratelimit.get_token_bucket("sts", ("sts", "us-east-1", None)))
+
+        plugins_config = {"nautobot_secrets_providers": {"rate_limit": {"enabled": True, "rates": {"ssm": 100}}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            self.assertEqual(ratelimit.get_token_bucket("ssm", ("ssm", "us-east-1", None)).rate, 100)
+            self.assertEqual(ratelimit.get_token_bucket("secretsmanager", ("secretsmanager",)).rate, 10000)
+
+
+@tag("unit")
+class SharedTokenBucketTestCase(TestCase):
+    """Tests for SharedTokenBucket."""
+
+    def setUp(self):
+        caches["default"].clear()
+
+        # fakeredis doesn't run the Lua script used by django-redis to increment keys.
+        def incr(key, delta=1):
+            value = caches["default"].get(key) + delta
+            caches["default"].set(key, value)
+            return value
+
+        patcher = patch.object(caches["default"], "incr", side_effect=incr)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_acquire(self):
+        """Requests are counted across buckets sharing a key, waiting for the next window once the rate is reached."""
+        buckets = [ratelimit.SharedTokenBucket("ssm:us-east-1", rate=3) for _ in range(2)]
+        with patch.object(ratelimit, "time") as mock_time:
+            mock_time.time.side_effect = [100.25, 100.5, 100.75, 100.8, 101.1]
+            buckets[0].acquire()
+            buckets[1].acquire()
+            buckets[0].acquire()
+            mock_time.sleep.assert_not_called()
+            buckets[1].acquire()
+        mock_time.sleep.assert_called_once()
+        self.assertAlmostEqual(mock_time.sleep.call_args.args[0], 0.2)
+
+    def test_throttled(self):
+        """Throttling halves the rate shared by all buckets, until it recovers."""
+        buckets = [ratelimit.SharedTokenBucket("ssm:us-east-1", rate=40, min_rate=15) for _ in range(2)]
+        buckets[0].throttled()
+        self.assertEqual(caches["default"].get(f"{buckets[1].key}:rate"), 20)
+        buckets[1].throttled()
+        self.assertEqual(caches["default"].get(f"{buckets[0].key}:rate"), 15)
+
+    def test_fallback(self):
+        """The bucket limits the current process if the shared cache is unavailable."""
+        bucket = ratelimit.SharedTokenBucket("ssm:us-east-1", rate=1)
+        with patch.object(caches["default"], "incr", side_effect=ConnectionError):
+            with patch.object(ratelimit.TokenBucket, "acquire") as acquire:
+                bucket.acquire()
+        acquire.assert_called_once()
+
+    def test_get_token_bucket(self):
+        """Buckets are shared when enabled in the settings."""
+        plugins_config = {"nautobot_secrets_providers": {"rate_limit": {"enabled": True, "shared": True}}}
+        with self.settings(PLUGINS_CONFIG=plugins_config):
+            bucket = ratelimit.get_token_bucket("ssm", ("ssm", "us-east-1", None))
+        self.assertIsInstance(bucket, ratelimit.SharedTokenBucket)
+        self.assertEqual(bucket.key, "nautobot_secrets_providers:ratelimit:ssm:us-east-1:None")
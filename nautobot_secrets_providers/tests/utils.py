@@ -0,0 +1,47 @@
+"""Helpers shared by the tests of the secrets providers."""
+
+from types import SimpleNamespace
+
+from nautobot.extras.secrets import exceptions
+
+from nautobot_secrets_providers.providers.batch import BatchSecretsProviderMixin
+
+
+def stub_secret(**parameters):
+    """Return an object quacking like a `Secret` with the given parameters."""
+    return SimpleNamespace(name="stub", parameters=parameters, rendered_parameters=lambda obj=None: parameters)
+
+
+class StubProvider(BatchSecretsProviderMixin):
+    """A provider looking secrets up from their own parameters, counting how many lookups reach the backend.
+
+    A lookup raises the provider's `error`, or the error named by the `error` parameter, if any. Otherwise it returns
+    the provider's `value`, or the `value` parameter. Tests subclass it to wrap `get_value` with the decorators they
+    exercise.
+    """
+
+    slug = "stub-provider"
+    name = "Stub Provider"
+    value = None
+    error = None
+    calls = 0
+
+    @classmethod
+    def get_circuit_key(cls, parameters):
+        """Return the backend named by the `backend` parameter."""
+        return ("stub", parameters.get("backend"))
+
+    @classmethod
+    def get_value(cls, secret, obj=None):
+        """Raise the error of the provider or of the secret, or return the value of the provider or of the secret."""
+        cls.calls += 1
+        parameters = secret.rendered_parameters(obj=obj)
+        error = cls.error or getattr(exceptions, parameters.get("error", ""), None)
+        if error:
+            raise error(secret, cls, "Failed")
+        return parameters["value"] if cls.value is None else cls.value
+
+    @classmethod
+    def get_value_for_secret(cls, secret, obj=None, **kwargs):
+        """Look the secret up."""
+        return cls.get_value(secret, obj)